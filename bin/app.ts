@@ -50,6 +50,8 @@ const bedrockKbStack = new BedrockKbStack(app, 'BedrockRagKbStack', {
 const apiStack = new ApiStack(app, 'BedrockRagApiStack', {
   env,
   knowledgeBaseId: bedrockKbStack.knowledgeBaseId,
+  dataSourceId: bedrockKbStack.dataSourceId,
+  syncStateBucketName: bedrockKbStack.syncStateBucketName,
 });
 
 // [학습] addDependency로 스택 배포 순서를 강제합니다.
@@ -8,6 +8,7 @@ RAG 기반 답변을 대화형 UI로 표시합니다.
 두 가지 RAG 엔드포인트를 선택할 수 있습니다:
 - /query: 관리형 retrieve_and_generate (간단하지만 대화 이력 미지원)
 - /converse: 워크숍 패턴 retrieve + converse (대화 이력 지원, 프롬프트 커스터마이징 가능)
+  (선택) 스트리밍 Function URL을 사용하면 converse_stream으로 토큰을 실시간 표시합니다.
 
 참조: workshop/completed/rag_chatbot/rag_chatbot_app.py
 """
@@ -47,20 +48,36 @@ with st.sidebar:
         ],
     )
 
+    # [학습] 스트리밍 응답 설정 (/converse 전용)
+    # CDK 배포 출력의 ConverseStreamUrl(Function URL)을 입력하면
+    # 답변 토큰이 생성되는 즉시 화면에 표시됩니다 (Server-Sent Events).
+    use_streaming = st.checkbox(
+        "스트리밍 응답 사용 (/converse)",
+        value=False,
+        disabled=endpoint_mode != "/converse",
+    )
+    stream_endpoint = st.text_input(
+        "스트리밍 Function URL",
+        placeholder="https://xxxxxxxxxx.lambda-url.us-east-1.on.aws/",
+        help="CDK 배포 출력의 ConverseStreamUrl을 입력하세요.",
+        disabled=not use_streaming,
+    )
+
     if st.button("대화 초기화"):
         st.session_state.chat_history = []
-        st.session_state.conversation_history = []
+        st.session_state.session_id = None
         st.rerun()
 
 # [학습] st.session_state는 Streamlit의 상태 관리 메커니즘입니다.
 # Streamlit은 사용자 상호작용마다 전체 스크립트를 재실행하므로,
 # 대화 이력을 유지하려면 session_state에 저장해야 합니다.
 # chat_history: UI 표시용 대화 기록
-# conversation_history: /converse API에 전달할 대화 기록
+# session_id: /converse 대화 세션 ID (대화 이력은 서버의 세션 저장소에 보관)
+# 매 요청마다 전체 이력을 보내지 않고 새 질문과 session_id만 보내므로 요청 크기가 대화 길이와 무관합니다.
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
-if "conversation_history" not in st.session_state:
-    st.session_state.conversation_history = []
+if "session_id" not in st.session_state:
+    st.session_state.session_id = None
 
 # [학습] 채팅 컨테이너: 대화 메시지가 표시되는 영역
 chat_container = st.container()
@@ -76,12 +93,51 @@ for message in st.session_state.chat_history:
                 for i, citation in enumerate(message["citations"], 1):
                     st.markdown(f"**[출처 {i}]** {citation}")
 
+def iter_sse_events(response):
+    """
+    [학습] Server-Sent Events 파서
+    "event: <이름>" / "data: <JSON>" 줄을 모아 빈 줄을 만나면 (이름, 데이터) 한 건을 반환합니다.
+    """
+    event_name, data_lines = None, []
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event_name = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+        elif not line and event_name:
+            yield event_name, json.loads("\n".join(data_lines) or "{}")
+            event_name, data_lines = None, []
+
+
+def stream_converse_answer(url, payload, sources):
+    """
+    [학습] 스트리밍 엔드포인트 호출 제너레이터
+    st.write_stream()에 전달하면 yield한 텍스트 조각이 도착하는 대로 화면에 이어서 표시됩니다.
+    contexts 이벤트는 답변보다 먼저 오므로 sources 리스트에 담아두었다가 답변 아래에 표시합니다.
+    서버가 새 세션을 만들면 contexts 이벤트의 session_id를 저장해 다음 요청에 사용합니다.
+    """
+    with requests.post(url, json=payload, stream=True, timeout=(5, 60)) as response:
+        response.raise_for_status()
+        for event_name, data in iter_sse_events(response):
+            if event_name == "contexts":
+                sources.extend(data.get("contexts", []))
+                if data.get("session_id"):
+                    st.session_state.session_id = data["session_id"]
+            elif event_name == "delta":
+                yield data.get("text", "")
+            elif event_name == "error":
+                raise RuntimeError(data.get("error", "스트리밍 오류"))
+
+
 # [학습] st.chat_input: 채팅 입력창을 화면 하단에 고정 표시합니다.
 # 사용자가 엔터를 치면 입력값이 반환됩니다.
 user_input = st.chat_input("질문을 입력하세요")
 
 if user_input:
-    if not api_endpoint:
+    streaming = endpoint_mode == "/converse" and use_streaming
+    if streaming and not stream_endpoint:
+        st.error("사이드바에서 스트리밍 Function URL을 입력해주세요.")
+    elif not streaming and not api_endpoint:
         st.error("사이드바에서 API Gateway 엔드포인트 URL을 입력해주세요.")
     else:
         # [학습] 사용자 메시지 표시
@@ -89,75 +145,98 @@ if user_input:
             st.markdown(user_input)
         st.session_state.chat_history.append({"role": "user", "content": user_input})
 
-        # [학습] st.spinner: API 호출 중 로딩 표시
-        with chat_container.chat_message("assistant"):
-            with st.spinner("Working..."):
+        # [학습] 스트리밍 모드: 스피너 없이 토큰이 도착하는 대로 렌더링합니다.
+        if streaming:
+            with chat_container.chat_message("assistant"):
                 try:
-                    # [학습] 엔드포인트에 따라 다른 요청 형식 사용
-                    url = f"{api_endpoint.rstrip('/')}{endpoint_mode}"
-
-                    if endpoint_mode == "/converse":
-                        # /converse: 대화 이력을 함께 전송
-                        payload = {
-                            "query": user_input,
-                            "conversation_history": st.session_state.conversation_history,
-                        }
-                    else:
-                        # /query: 단일 질문만 전송
-                        payload = {"query": user_input}
-
-                    # [학습] requests.post로 API Gateway 호출
-                    # timeout: 30초 후 타임아웃 (Lambda 실행 시간 고려)
-                    response = requests.post(
-                        url,
-                        json=payload,
-                        headers={"Content-Type": "application/json"},
-                        timeout=30,
-                    )
-                    response.raise_for_status()
-                    data = response.json()
-
-                    answer = data.get("answer", "답변을 받지 못했습니다.")
-                    st.markdown(answer)
-
-                    # [학습] 인용/검색 결과 표시
-                    # /query 응답: citations 필드
-                    # /converse 응답: contexts 필드
-                    citations = data.get("citations", [])
-                    contexts = data.get("contexts", [])
                     display_sources = []
-
-                    if citations:
-                        display_sources = [c.get("text", "") for c in citations if c.get("text")]
-                    elif contexts:
-                        display_sources = contexts
+                    payload = {
+                        "query": user_input,
+                        "session_id": st.session_state.session_id,
+                    }
+                    answer = st.write_stream(stream_converse_answer(stream_endpoint, payload, display_sources))
 
                     if display_sources:
                         with st.expander("검색 결과 보기"):
                             for i, source in enumerate(display_sources, 1):
                                 st.markdown(f"**[출처 {i}]** {source}")
 
-                    # [학습] 대화 이력 업데이트
                     st.session_state.chat_history.append({
                         "role": "assistant",
                         "content": answer,
                         "citations": display_sources,
                     })
 
-                    # /converse 모드일 때 API 전달용 이력도 업데이트
-                    if endpoint_mode == "/converse":
-                        st.session_state.conversation_history.append(
-                            {"role": "user", "content": user_input}
-                        )
-                        st.session_state.conversation_history.append(
-                            {"role": "assistant", "content": answer}
-                        )
-
-                except requests.exceptions.ConnectionError:
-                    st.error("API 서버에 연결할 수 없습니다. 엔드포인트 URL을 확인해주세요.")
-                except requests.exceptions.Timeout:
-                    st.error("요청 시간이 초과되었습니다. 잠시 후 다시 시도해주세요.")
-                except requests.exceptions.HTTPError as e:
-                    st.error(f"API 오류: {e.response.status_code} - {e.response.text}")
+                except requests.exceptions.RequestException as e:
+                    st.error(f"스트리밍 요청 오류: {str(e)}")
                 except Exception as e:
                     st.error(f"오류가 발생했습니다: {str(e)}")
+
+        else:
+            # [학습] st.spinner: API 호출 중 로딩 표시
+            with chat_container.chat_message("assistant"):
+                with st.spinner("Working..."):
+                    try:
+                        # [학습] 엔드포인트에 따라 다른 요청 형식 사용
+                        url = f"{api_endpoint.rstrip('/')}{endpoint_mode}"
+
+                        if endpoint_mode == "/converse":
+                            # /converse: 새 질문과 세션 ID만 전송 (첫 요청은 None → 서버가 새 세션 생성)
+                            payload = {
+                                "query": user_input,
+                                "session_id": st.session_state.session_id,
+                            }
+                        else:
+                            # /query: 단일 질문만 전송
+                            payload = {"query": user_input}
+
+                        # [학습] requests.post로 API Gateway 호출
+                        # timeout: 30초 후 타임아웃 (Lambda 실행 시간 고려)
+                        response = requests.post(
+                            url,
+                            json=payload,
+                            headers={"Content-Type": "application/json"},
+                            timeout=30,
+                        )
+                        response.raise_for_status()
+                        data = response.json()
+
+                        answer = data.get("answer", "답변을 받지 못했습니다.")
+                        st.markdown(answer)
+
+                        # [학습] 인용/검색 결과 표시
+                        # /query 응답: citations 필드
+                        # /converse 응답: contexts 필드
+                        citations = data.get("citations", [])
+                        contexts = data.get("contexts", [])
+                        display_sources = []
+
+                        if citations:
+                            display_sources = [c.get("text", "") for c in citations if c.get("text")]
+                        elif contexts:
+                            display_sources = contexts
+
+                        if display_sources:
+                            with st.expander("검색 결과 보기"):
+                                for i, source in enumerate(display_sources, 1):
+                                    st.markdown(f"**[출처 {i}]** {source}")
+
+                        # [학습] 대화 이력 업데이트
+                        st.session_state.chat_history.append({
+                            "role": "assistant",
+                            "content": answer,
+                            "citations": display_sources,
+                        })
+
+                        # /converse 모드일 때 서버가 돌려준 세션 ID를 저장합니다.
+                        if endpoint_mode == "/converse" and data.get("session_id"):
+                            st.session_state.session_id = data["session_id"]
+
+                    except requests.exceptions.ConnectionError:
+                        st.error("API 서버에 연결할 수 없습니다. 엔드포인트 URL을 확인해주세요.")
+                    except requests.exceptions.Timeout:
+                        st.error("요청 시간이 초과되었습니다. 잠시 후 다시 시도해주세요.")
+                    except requests.exceptions.HTTPError as e:
+                        st.error(f"API 오류: {e.response.status_code} - {e.response.text}")
+                    except Exception as e:
+                        st.error(f"오류가 발생했습니다: {str(e)}")
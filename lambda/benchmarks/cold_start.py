@@ -0,0 +1,166 @@
+"""
+[학습] Lambda cold start 벤치마크 - import부터 첫 응답까지의 시간 측정
+
+Lambda의 cold start는 "새 Python 인터프리터가 뜨고 → index.py를 import하고 → 첫 요청을 처리"하는 과정입니다.
+이 스크립트는 매 샘플마다 새 Python 프로세스를 띄워 같은 과정을 재현하고,
+botocore Stubber로 Bedrock 응답을 가짜로 만들어 네트워크 없이 초기화 비용만 측정합니다.
+
+측정 항목 (단위: ms):
+- import_ms: index.py import 시간 (boto3 로딩 + 클라이언트 prewarm 포함 = Lambda INIT 단계)
+- first_response_ms: 첫 handler 호출 시간 (Stubber 응답이므로 순수 코드 오버헤드)
+- total_ms: 프로세스 시작 후 첫 응답까지의 전체 시간
+
+사용법 (boto3가 설치된 환경에서 저장소 루트 기준):
+    python3 lambda/benchmarks/cold_start.py --function rag-converse --runs 30
+    python3 lambda/benchmarks/cold_start.py --function all --label v1.2.0 --output cold_start.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYER_DIR = os.path.join(LAMBDA_DIR, 'layers', 'rag-common', 'python')
+
+# [학습] 각 Lambda별로 Stubber에 등록할 (서비스, 오퍼레이션, 응답)과 테스트 이벤트
+SCENARIOS = {
+    'rag-query': {
+        'stubs': [
+            ('bedrock-agent-runtime', 'retrieve_and_generate', {
+                'output': {'text': 'stub answer'},
+                'sessionId': 'stub-session',
+            }),
+        ],
+        'event': {'body': json.dumps({'query': 'What is Amazon Bedrock?'})},
+    },
+    'rag-converse': {
+        'stubs': [
+            ('bedrock-agent-runtime', 'retrieve', {
+                'retrievalResults': [{'content': {'text': 'Amazon Bedrock is a fully managed service.'}}],
+            }),
+            ('bedrock-runtime', 'converse', {
+                'output': {'message': {'role': 'assistant', 'content': [{'text': 'stub answer'}]}},
+                'stopReason': 'end_turn',
+                'usage': {'inputTokens': 10, 'outputTokens': 5, 'totalTokens': 15},
+                'metrics': {'latencyMs': 1},
+            }),
+        ],
+        'event': {'body': json.dumps({'query': 'What is Amazon Bedrock?', 'conversation_history': []})},
+    },
+}
+
+# [학습] 자식 프로세스에서 실행되는 측정 코드
+# 프로세스 시작 직후 시각을 기록하고, import → Stubber 설정 → handler 호출 순으로 측정합니다.
+# Stubber 설정 시간은 실제 Lambda에는 없는 비용이므로 측정 구간에서 제외합니다.
+CHILD_SCRIPT = r'''
+import time
+t_start = time.perf_counter()
+import json, sys, importlib.util
+args = json.loads(sys.argv[1])
+sys.path.insert(0, args['layer_dir'])
+sys.path.insert(0, args['function_dir'])
+
+t0 = time.perf_counter()
+spec = importlib.util.spec_from_file_location('index', args['function_dir'] + '/index.py')
+index = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(index)
+import_ms = (time.perf_counter() - t0) * 1000
+
+from botocore.stub import Stubber
+from rag_common import get_client
+stubbers = {}
+for service_name, operation, response in args['stubs']:
+    if service_name not in stubbers:
+        stubbers[service_name] = Stubber(get_client(service_name))
+    stubbers[service_name].add_response(operation, response)
+for stubber in stubbers.values():
+    stubber.activate()
+
+t1 = time.perf_counter()
+result = index.handler(args['event'], None)
+first_response_ms = (time.perf_counter() - t1) * 1000
+print(json.dumps({
+    'status_code': result['statusCode'],
+    'import_ms': import_ms,
+    'first_response_ms': first_response_ms,
+    'total_ms': (t0 - t_start) * 1000 + import_ms + first_response_ms,
+}))
+'''
+
+
+def percentile(values, pct):
+    """
+    [학습] nearest-rank 방식 백분위수 (p50 = 중앙값, p99 = 상위 1% 지연)
+    """
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def run_sample(function_name):
+    scenario = SCENARIOS[function_name]
+    env = dict(os.environ)
+    # [학습] 가짜 자격 증명/리전을 주입하여 자격 증명 탐색(IMDS 호출 등)이 측정에 섞이지 않게 합니다.
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    env.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    env.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    env.setdefault('KNOWLEDGE_BASE_ID', 'STUBKBID01')
+    env.setdefault('GENERATION_MODEL_ID', 'us.amazon.nova-lite-v1:0')
+    env.setdefault('MODEL_ARN', 'arn:aws:bedrock:us-east-1::foundation-model/us.amazon.nova-lite-v1:0')
+    args = {
+        'layer_dir': LAYER_DIR,
+        'function_dir': os.path.join(LAMBDA_DIR, function_name),
+        'stubs': scenario['stubs'],
+        'event': scenario['event'],
+    }
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT, json.dumps(args)],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    # handler의 print 출력 뒤 마지막 줄이 측정 결과입니다.
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(samples):
+    summary = {}
+    for key in ('import_ms', 'first_response_ms', 'total_ms'):
+        values = [s[key] for s in samples]
+        summary[key] = {
+            'p50': round(percentile(values, 50), 2),
+            'p99': round(percentile(values, 99), 2),
+            'mean': round(statistics.mean(values), 2),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RAG Lambda cold start benchmark (stubbed Bedrock)')
+    parser.add_argument('--function', choices=sorted(SCENARIOS) + ['all'], default='all')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--label', default='local', help='릴리스 태그 등 결과를 구분할 이름')
+    parser.add_argument('--output', help='결과를 저장할 JSON 파일 경로')
+    args = parser.parse_args()
+
+    functions = sorted(SCENARIOS) if args.function == 'all' else [args.function]
+    report = {'label': args.label, 'python': sys.version.split()[0], 'runs': args.runs, 'functions': {}}
+
+    for function_name in functions:
+        samples = [run_sample(function_name) for _ in range(args.runs)]
+        failed = [s for s in samples if s['status_code'] != 200]
+        if failed:
+            raise SystemExit(f"{function_name}: handler returned {failed[0]['status_code']}")
+        report['functions'][function_name] = summarize(samples)
+        stats = report['functions'][function_name]
+        print(f"{function_name:>14}  import p50={stats['import_ms']['p50']}ms p99={stats['import_ms']['p99']}ms  "
+              f"first_response p50={stats['first_response_ms']['p50']}ms  total p99={stats['total_ms']['p99']}ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+"""
+[학습] RAG Lambda 공통 레이어 (rag_common)
+
+세 Lambda(rag-query, rag-converse, sync-knowledge-base)가 공유하는 코드를 Lambda Layer로 배포합니다.
+Lambda Layer의 python/ 디렉터리는 런타임의 sys.path에 자동으로 추가되므로
+각 Lambda에서 `from rag_common import get_client`처럼 바로 import할 수 있습니다.
+"""
+from .clients import build_config, get_client, prewarm
+from .settings import Settings, get_settings
+
+__all__ = [
+    'Settings',
+    'build_config',
+    'get_client',
+    'get_settings',
+    'prewarm',
+]
@@ -0,0 +1,81 @@
+"""
+[학습] 적응형 검색 개수(numberOfResults) 정책
+
+모든 질문에 numberOfResults=4를 쓰면 단순한 질문은 필요 없는 청크까지 받아 입력 토큰을 낭비하고,
+여러 가지를 묻는 질문은 청크가 모자라 일부 질문에만 답하게 됩니다.
+이 정책은 적게 시작해서 필요할 때만 넓힙니다:
+
+1. 시작 개수: 기본 initial_k(3). 여러 부분으로 된 질문이면 처음부터 2배로 시작 (추가 왕복 없이)
+2. 넓히기: 최고 점수가 low_score 미만이면 관련 청크를 못 찾은 것으로 보고 2배로 한 번 더 검색
+3. 상한: max_k와 컨텍스트 토큰 예산으로 계산한 개수 중 작은 값
+   (예산 2000 / 청크 512토큰 ≈ 4개가 들어가고, 점수 필터/중복 제거로 일부가 빠지므로 2배인 8개까지)
+
+검색은 점수 순 top-k를 돌려주므로 더 큰 k로 다시 검색하면 이전 결과를 포함하는 상위 집합을 받습니다.
+"""
+import math
+import re
+import time
+
+# [학습] 여러 부분으로 된 질문의 신호: 물음표 여러 개, 비교/나열 표현, 번호 목록
+_MULTI_PART_PATTERNS = [
+    re.compile(r'\?.+\?', re.S),
+    re.compile(r'\b(and also|as well as|compare|comparison|difference between|versus|vs\.?)\b', re.I),
+    re.compile(r'(그리고|또한|비교|차이|각각|및)'),
+    re.compile(r'(^|\n)\s*(\d+[.)]|[-*•])\s+\S', re.M),
+]
+_LIST_SEPARATORS = re.compile(r',|、| and | or ')
+
+
+def is_multi_part(query):
+    """
+    [학습] 질문이 여러 부분으로 되어 있는지 가볍게 추정합니다 (정규식만 사용, 모델 호출 없음).
+    """
+    if any(pattern.search(query) for pattern in _MULTI_PART_PATTERNS):
+        return True
+    return len(_LIST_SEPARATORS.findall(query)) >= 2
+
+
+def budget_cap(context_token_budget, chunk_tokens):
+    """
+    [학습] 컨텍스트 예산에 들어가는 청크 수의 2배 (후처리에서 절반가량이 빠지는 것을 감안)
+    """
+    return max(1, math.ceil(context_token_budget / max(1, chunk_tokens)) * 2)
+
+
+def adaptive_retrieve(query, retrieve_fn, initial_k=3, max_k=10, low_score=0.5,
+                      context_token_budget=2000, chunk_tokens=512):
+    """
+    [학습] retrieve_fn(k) → [{'text', 'score', ...}]를 정책에 따라 한 번 또는 두 번 호출합니다.
+    반환값: (검색 결과, 결정 내역 dict)
+    """
+    cap = min(max_k, budget_cap(context_token_budget, chunk_tokens))
+    multi_part = is_multi_part(query)
+    k = min(cap, initial_k * 2 if multi_part else initial_k)
+
+    rounds = []
+    started = time.perf_counter()
+    results = retrieve_fn(k)
+    rounds.append({'k': k, 'returned': len(results), 'ms': round((time.perf_counter() - started) * 1000, 2)})
+
+    top_score = max((r['score'] for r in results if r.get('score') is not None), default=None)
+    reason = 'multi_part' if multi_part else 'simple'
+
+    # [학습] 최고 점수가 낮고, 결과가 k개 꽉 찼고(더 있을 수 있음), 상한까지 여유가 있을 때만 넓힙니다.
+    if top_score is not None and top_score < low_score and len(results) >= k and k < cap:
+        k = min(cap, k * 2)
+        started = time.perf_counter()
+        results = retrieve_fn(k)
+        rounds.append({'k': k, 'returned': len(results), 'ms': round((time.perf_counter() - started) * 1000, 2)})
+        top_score = max((r['score'] for r in results if r.get('score') is not None), default=None)
+        reason = 'low_score'
+
+    decision = {
+        'number_of_results': k,
+        'reason': reason,
+        'multi_part': multi_part,
+        'cap': cap,
+        'top_score': round(top_score, 4) if top_score is not None else None,
+        'rounds': rounds,
+        'retrieve_ms': round(sum(r['ms'] for r in rounds), 2),
+    }
+    return results, decision
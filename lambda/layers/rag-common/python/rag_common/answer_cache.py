@@ -0,0 +1,176 @@
+"""
+[학습] RAG 답변 캐시 - 자주 묻는 질문의 답변을 재사용
+
+FAQ 성격의 트래픽은 같은(또는 거의 같은) 질문이 반복됩니다.
+매번 retrieve_and_generate()를 호출하면 수 초의 지연과 모델 토큰 비용이 발생하므로,
+이 모듈은 Lambda 컨테이너 메모리에 답변을 캐시하여 반복 질문을 수 ms 안에 응답합니다.
+
+캐시 조회 순서:
+1. 정확 일치(exact): 정규화된 질문 텍스트가 같은 항목
+2. 의미 일치(semantic): 질문 임베딩의 코사인 유사도가 임계값 이상인 항목 (선택 기능)
+
+캐시 무효화:
+- TTL: 항목마다 생성 시각을 기록하고 ttl_seconds가 지나면 만료
+- LRU: 최대 항목 수를 넘으면 가장 오래 사용되지 않은 항목부터 제거
+- 세대(generation): KB 수집 작업(ingestion job) ID가 바뀌면 문서가 갱신된 것이므로 전체 삭제
+
+[학습] 캐시는 컨테이너별 메모리에 있으므로 동시에 실행 중인 Lambda 인스턴스끼리 공유되지 않습니다.
+"""
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_WHITESPACE = re.compile(r'\s+')
+_TRAILING_PUNCTUATION = re.compile(r'[\s?!.。？！]+$')
+
+
+def normalize_query(text):
+    """
+    [학습] 캐시 키용 질문 정규화
+    유니코드 정규화(NFKC) → 소문자 → 연속 공백 축약 → 끝 문장부호 제거 순으로 처리하여
+    "What is Bedrock?"과 "what is  bedrock"을 같은 키로 만듭니다.
+    """
+    text = unicodedata.normalize('NFKC', text).lower()
+    text = _WHITESPACE.sub(' ', text).strip()
+    return _TRAILING_PUNCTUATION.sub('', text)
+
+
+def cosine_similarity(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(y * y for y in b))
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+class MemoryAnswerCache:
+    """
+    [학습] 메모리 기반 TTL + LRU 답변 캐시
+    OrderedDict는 삽입/접근 순서를 유지하므로 move_to_end()와 popitem(last=False)만으로
+    LRU(Least Recently Used) 정책을 구현할 수 있습니다.
+
+    embed_fn을 전달하면 정확 일치가 없을 때 임베딩 유사도로 가장 비슷한 질문을 찾습니다.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=3600, similarity_threshold=0.0, embed_fn=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn if similarity_threshold > 0 else None
+        self.generation = None
+        self.stats = {'hits': 0, 'semantic_hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def set_generation(self, generation):
+        """
+        [학습] 세대(KB ingestion job ID)가 바뀌면 이전 문서 기준 답변을 모두 버립니다.
+        """
+        if generation is None or generation == self.generation:
+            return
+        with self._lock:
+            if self.generation is not None and self._entries:
+                self.stats['invalidations'] += 1
+            self._entries.clear()
+            self.generation = generation
+
+    def get(self, query):
+        """
+        [학습] (value, match_type, embedding)을 반환합니다.
+        match_type은 'exact', 'semantic' 또는 None(미스)입니다.
+        미스일 때 계산한 임베딩을 돌려주어 put()에서 다시 계산하지 않도록 합니다.
+        임베딩 계산이 실패하면 예외를 삼키고 (None, None, None)을 반환합니다.
+        """
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry['value'], 'exact', entry['embedding']
+
+        embedding = None
+        if self.embed_fn is not None:
+            # [학습] 임베딩 호출 실패(스로틀링, 타임아웃 등)로 요청 전체가 500이 되지 않도록
+            # 의미 검색만 건너뛰고 캐시 미스로 처리합니다. 응답은 원래 경로로 생성됩니다.
+            try:
+                embedding = self.embed_fn(key)
+            except Exception as e:
+                print(f"Answer cache embedding failed: {str(e)}")
+                with self._lock:
+                    self.stats['misses'] += 1
+                return None, None, None
+            best_key, best_score = None, self.similarity_threshold
+            with self._lock:
+                for candidate_key, entry in self._entries.items():
+                    if entry['embedding'] is None:
+                        continue
+                    score = cosine_similarity(embedding, entry['embedding'])
+                    if score >= best_score:
+                        best_key, best_score = candidate_key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.stats['hits'] += 1
+                    self.stats['semantic_hits'] += 1
+                    return self._entries[best_key]['value'], 'semantic', embedding
+
+        with self._lock:
+            self.stats['misses'] += 1
+        return None, None, embedding
+
+    def put(self, query, value, embedding=None):
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = {'value': value, 'created_at': time.time(), 'embedding': embedding}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _expire(self, now):
+        expired = [k for k, e in self._entries.items() if now - e['created_at'] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+
+class NullAnswerCache(MemoryAnswerCache):
+    """
+    [학습] 캐시 비활성화용 구현 (ANSWER_CACHE_BACKEND=none)
+    같은 인터페이스를 유지하므로 핸들러 코드는 캐시 사용 여부와 무관하게 동일합니다.
+    """
+
+    def get(self, query):
+        with self._lock:
+            self.stats['misses'] += 1
+        return None, None, None
+
+    def put(self, query, value, embedding=None):
+        return
+
+
+BACKENDS = {
+    'memory': MemoryAnswerCache,
+    'none': NullAnswerCache,
+}
+
+
+def create_answer_cache(backend='memory', **kwargs):
+    """
+    [학습] 백엔드 이름으로 캐시 구현을 선택합니다 (새 백엔드는 BACKENDS에 등록).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown answer cache backend: {backend}")
+    return BACKENDS[backend](**kwargs)
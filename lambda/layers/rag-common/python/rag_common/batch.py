@@ -0,0 +1,144 @@
+"""
+[학습] 배치 실행기 - 한 번의 Lambda 호출에서 여러 질문을 동시에 처리
+
+야간 평가/백필 작업이 질문마다 HTTP 요청을 보내면, 질문 수만큼
+API Gateway 왕복, JSON 파싱, (확장 시) cold start 비용을 반복해서 냅니다.
+배치 모드는 질문 목록을 한 번에 받아 Lambda 안에서 병렬 처리합니다:
+
+1. 중복 제거: key_fn이 같은 값을 반환하는 항목은 한 번만 실행하고 결과를 공유
+2. 동시 실행 제한: 최대 max_concurrency개만 동시에 실행 (Bedrock 스로틀링 방지)
+3. 항목별 결과: 한 항목이 실패해도 나머지는 계속 처리하고, 실패 항목에는 error를 담음
+4. 시간 예산: 남은 시간이 항목 하나의 최악 소요 시간(reserve_ms)보다 적으면 새 항목을 시작하지 않고 skipped로 표시
+
+[학습] 남은 시간은 Lambda 남은 시간과 budget_ms(API Gateway 통합 제한 29초) 중 작은 값입니다.
+Lambda 제한 시간(30초)만 보면 API Gateway가 먼저 504를 반환해 완료된 결과까지 모두 잃습니다.
+항목 하나는 Bedrock을 여러 번 순서대로 호출하고(calls_per_item), 호출마다 재시도 횟수만큼 read_timeout을 기다릴 수 있으므로
+reserve_ms = calls_per_item × max_attempts × (connect_timeout + read_timeout) + 여유 시간입니다.
+배치 항목에는 짧은 read_timeout(BATCH_READ_TIMEOUT)과 재시도 없는 클라이언트(BATCH_MAX_ATTEMPTS=1)를 적용해
+이 값을 줄이고, 항목 안에서 스레드 풀에 넘기는 작업도 bind_client_scope()로 같은 클라이언트를 쓰게 합니다.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .clients import client_scope
+from .settings import get_settings
+
+# [학습] 항목 완료 후 응답 직렬화/반환에 남겨 두는 시간
+_RESPONSE_MARGIN_MS = 1000
+
+
+def item_reserve_ms(read_timeout=None, max_attempts=None, calls=1):
+    """
+    [학습] 항목 하나의 최악 소요 시간(ms): 순차 호출 수 × 시도 횟수 × (연결 + 응답 대기) + 여유 시간
+    """
+    settings = get_settings()
+    if read_timeout is None:
+        read_timeout = settings.read_timeout
+    if max_attempts is None:
+        max_attempts = settings.max_attempts
+    return int(calls * max_attempts * (settings.connect_timeout + read_timeout) * 1000) + _RESPONSE_MARGIN_MS
+
+
+def run_batch(items, fn, key_fn=None, max_concurrency=4, remaining_ms_fn=None, reserve_ms=None,
+              budget_ms=None, read_timeout=None, max_attempts=None, calls_per_item=1):
+    """
+    [학습] items의 각 항목에 fn을 적용합니다.
+    - read_timeout/max_attempts: 항목 실행 중 get_client()가 사용할 read_timeout(초)과 시도 횟수
+    - calls_per_item: 항목 하나가 순서대로 하는 Bedrock 호출 수의 최댓값 (병렬 호출은 하나로 셈)
+    - reserve_ms: 새 항목을 시작하는 데 필요한 남은 시간 (생략하면 item_reserve_ms()로 계산)
+    - budget_ms: run_batch 시작 시점부터의 전체 시간 상한 (API Gateway 제한)
+    반환값: (outcomes, stats)
+    - outcomes: items와 같은 순서의 {'status': 'ok'|'error'|'skipped', 'value'|'error', 'duplicate_of'?}
+    - stats: 처리 건수와 처리량(items_per_second)
+    """
+    started = time.perf_counter()
+    key_fn = key_fn or (lambda item: item)
+    if reserve_ms is None:
+        reserve_ms = item_reserve_ms(read_timeout, max_attempts, calls_per_item)
+
+    def remaining_ms():
+        remaining = []
+        if remaining_ms_fn is not None:
+            remaining.append(remaining_ms_fn())
+        if budget_ms is not None:
+            remaining.append(budget_ms - (time.perf_counter() - started) * 1000)
+        return min(remaining) if remaining else None
+
+    def run_item(item):
+        if read_timeout is None and max_attempts is None:
+            return fn(item)
+        with client_scope(read_timeout, max_attempts):
+            return fn(item)
+
+    # [학습] 키별 첫 번째 항목만 실행하고, 나머지는 그 결과를 참조합니다.
+    first_index = {}
+    duplicates = {}
+    for index, item in enumerate(items):
+        key = key_fn(item)
+        if key in first_index:
+            duplicates[index] = first_index[key]
+        else:
+            first_index[key] = index
+    unique_indexes = list(first_index.values())
+
+    outcomes = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix='rag-batch') as executor:
+        pending = {}
+        queue = iter(unique_indexes)
+        exhausted = False
+
+        while pending or not exhausted:
+            # 실행 중인 작업이 max_concurrency보다 적으면 다음 항목을 시작합니다.
+            while not exhausted and len(pending) < max_concurrency:
+                index = next(queue, None)
+                if index is None:
+                    exhausted = True
+                    break
+                remaining = remaining_ms()
+                if remaining is not None and remaining < reserve_ms:
+                    outcomes[index] = {'status': 'skipped', 'error': '실행 시간 예산이 부족하여 건너뛰었습니다.'}
+                    continue
+                pending[executor.submit(run_item, items[index])] = index
+
+            if not pending:
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    outcomes[index] = {'status': 'ok', 'value': future.result()}
+                except Exception as e:
+                    outcomes[index] = {'status': 'error', 'error': str(e)}
+
+    for index, source in duplicates.items():
+        outcomes[index] = dict(outcomes[source], duplicate_of=source)
+
+    elapsed = time.perf_counter() - started
+    processed = sum(1 for i in unique_indexes if outcomes[i]['status'] != 'skipped')
+    stats = {
+        'items': len(items),
+        'unique': len(unique_indexes),
+        'succeeded': sum(1 for o in outcomes if o['status'] == 'ok'),
+        'failed': sum(1 for o in outcomes if o['status'] == 'error'),
+        'skipped': sum(1 for o in outcomes if o['status'] == 'skipped'),
+        'elapsed_ms': round(elapsed * 1000, 2),
+        'items_per_second': round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+    return outcomes, stats
+
+
+def batch_results(queries, outcomes):
+    """
+    [학습] 응답용 항목별 결과: 성공 항목은 결과 필드를 펼치고, 실패/건너뜀 항목은 error를 담습니다.
+    """
+    results = []
+    for index, (query, outcome) in enumerate(zip(queries, outcomes)):
+        result = {'index': index, 'query': query, 'status': outcome['status']}
+        if outcome['status'] == 'ok':
+            result.update(outcome['value'])
+        else:
+            result['error'] = outcome['error']
+        if 'duplicate_of' in outcome:
+            result['duplicate_of'] = outcome['duplicate_of']
+        results.append(result)
+    return results
@@ -0,0 +1,126 @@
+"""
+[학습] Lambda 공통 boto3 클라이언트 풀
+
+boto3.client()는 생성 시 botocore가 서비스 모델(JSON)을 읽어 파싱하므로 수십~수백 ms가 걸립니다.
+이 모듈은 다음 방식으로 그 비용을 줄입니다:
+- 하나의 boto3.Session을 공유하여 엔드포인트/파티션 데이터 로딩을 한 번만 수행
+- (서비스, read_timeout, max_attempts) 조합별로 클라이언트를 한 번만 만들고 warm start에서 재사용
+- client_scope()로 현재 스레드의 기본 read_timeout/max_attempts를 바꿔 배치 항목이 짧은 타임아웃 클라이언트를 쓰도록 함
+  (스레드 풀에 넘기는 함수는 bind_client_scope()로 감싸야 작업 스레드에도 같은 값이 적용됨)
+- botocore Config로 커넥션 풀, TCP keep-alive, adaptive 재시도, 타임아웃을 조정
+
+[학습] prewarm()을 모듈 최상단에서 호출하면 클라이언트 생성이 Lambda INIT 단계에서 일어납니다.
+INIT 단계는 요청 처리 시간(Duration)과 분리되어 첫 요청의 지연 시간을 줄여줍니다.
+"""
+import threading
+from contextlib import contextmanager
+
+import boto3
+from botocore.config import Config
+
+from .settings import get_settings
+
+_lock = threading.Lock()
+_session = None
+_clients = {}
+_local = threading.local()
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        _session = boto3.Session()
+    return _session
+
+
+def build_config(read_timeout=None, max_attempts=None):
+    """
+    [학습] botocore Config 생성
+    - max_pool_connections: 동시에 재사용할 HTTP 커넥션 수 (배치/병렬 호출 대비)
+    - tcp_keepalive: 유휴 커넥션이 NAT/LB에서 끊기지 않도록 keep-alive 패킷 전송
+    - retries.mode='adaptive': 스로틀링 발생 시 클라이언트 측 속도 제한까지 적용하는 재시도 모드
+    - connect_timeout/read_timeout: Lambda 제한 시간(30초) 안에 실패를 감지하기 위한 호출별 타임아웃
+    - total_max_attempts: 첫 시도를 포함한 전체 시도 횟수 (botocore의 max_attempts는 재시도 횟수라 1회가 더 붙음)
+    """
+    settings = get_settings()
+    return Config(
+        max_pool_connections=settings.max_pool_connections,
+        tcp_keepalive=True,
+        connect_timeout=settings.connect_timeout,
+        read_timeout=read_timeout if read_timeout is not None else settings.read_timeout,
+        retries={'mode': 'adaptive',
+                 'total_max_attempts': max_attempts if max_attempts is not None else settings.max_attempts},
+    )
+
+
+def get_client(service_name, read_timeout=None, max_attempts=None):
+    """
+    [학습] 지연 초기화(lazy initialization) 클라이언트 조회
+    처음 요청된 시점에 클라이언트를 만들고, 이후에는 캐시된 객체를 반환합니다.
+    boto3 클라이언트는 스레드 안전하므로 여러 스레드에서 공유해도 됩니다.
+    read_timeout/max_attempts를 생략하면 client_scope()로 지정한 값(없으면 설정값)을 사용합니다.
+    """
+    scope = getattr(_local, 'scope', None) or {}
+    if read_timeout is None:
+        read_timeout = scope.get('read_timeout')
+    if max_attempts is None:
+        max_attempts = scope.get('max_attempts')
+    key = (service_name, read_timeout, max_attempts)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _get_session().client(service_name, config=build_config(read_timeout, max_attempts))
+            _clients[key] = client
+    return client
+
+
+@contextmanager
+def client_scope(read_timeout=None, max_attempts=None):
+    """
+    [학습] with 블록 안에서 현재 스레드의 get_client() 기본 read_timeout/max_attempts를 바꿉니다.
+    배치 항목처럼 호출 경로 전체에 타임아웃 인자를 넘기기 어려운 곳에서 사용합니다.
+    """
+    previous = getattr(_local, 'scope', None)
+    _local.scope = {'read_timeout': read_timeout, 'max_attempts': max_attempts}
+    try:
+        yield
+    finally:
+        _local.scope = previous
+
+
+def bind_client_scope(fn):
+    """
+    [학습] 현재 스레드의 client_scope() 값을 기억해 두었다가 fn을 실행하는 스레드에도 적용합니다.
+    스레드 로컬 값은 스레드 풀 작업 스레드로 전달되지 않으므로 executor.submit()에 넘기기 전에 감쌉니다.
+    """
+    scope = getattr(_local, 'scope', None)
+    if scope is None:
+        return fn
+
+    def scoped(*args, **kwargs):
+        with client_scope(**scope):
+            return fn(*args, **kwargs)
+    return scoped
+
+
+def prewarm(*service_names):
+    """
+    [학습] 지정한 서비스 클라이언트를 미리 생성합니다 (Lambda INIT 단계용).
+    """
+    for service_name in service_names:
+        get_client(service_name)
+
+
+def reset():
+    """
+    [학습] 캐시된 세션/클라이언트를 모두 버립니다 (벤치마크와 로컬 실행용).
+    """
+    global _session
+    with _lock:
+        _clients.clear()
+        _session = None
+    get_settings.cache_clear()
@@ -0,0 +1,22 @@
+"""
+[학습] Titan Text Embeddings V2 호출 헬퍼
+
+Knowledge Base가 내부적으로 사용하는 임베딩 모델을 Lambda에서도 직접 호출합니다.
+Titan V2는 출력 차원(256/512/1024)과 정규화(normalize) 옵션을 지원하므로,
+캐시 유사도 비교처럼 정밀도가 덜 중요한 용도에는 256차원으로 비용과 메모리를 줄입니다.
+"""
+import json
+
+from .clients import get_client
+from .settings import get_settings
+
+
+def embed_text(text, dimensions=256, normalize=True):
+    settings = get_settings()
+    response = get_client('bedrock-runtime').invoke_model(
+        modelId=settings.embedding_model_id,
+        body=json.dumps({'inputText': text, 'dimensions': dimensions, 'normalize': normalize}),
+        accept='application/json',
+        contentType='application/json',
+    )
+    return json.loads(response['body'].read())['embedding']
@@ -0,0 +1,84 @@
+"""
+[학습] 토큰 예산 기반 대화 이력 윈도우
+
+메시지 개수(MAX_MESSAGES)로 이력을 자르면 긴 답변이 이어질 때는 입력 토큰이 너무 많아지고,
+짧은 대화에서는 쓸 수 있는 컨텍스트를 버리게 됩니다.
+이 모듈은 "입력 토큰 예산"을 기준으로 이력을 고릅니다:
+
+    입력 예산 = 검색 컨텍스트(rag_content) + 지시문 + 질문 + [대화 이력]
+                                                        └ 남은 예산 안에서 최신 턴부터 채움
+
+- 메시지별 토큰 수는 텍스트 기준으로 캐시하여, 같은 이력이 매 턴 다시 전송되어도 한 번만 계산합니다.
+- user+assistant 턴 단위로 잘라 Converse API의 "첫 메시지는 user" 규칙과 대화 흐름을 유지합니다.
+- (선택) 잘려나간 앞부분을 짧게 요약하여 첫 user 메시지 앞에 붙입니다.
+"""
+import functools
+import hashlib
+
+from .tokens import estimate_tokens
+
+# [학습] 메시지 구조(role, content 블록)에 드는 토큰 오버헤드 추정치
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@functools.lru_cache(maxsize=4096)
+def _cached_text_tokens(text):
+    return estimate_tokens(text)
+
+
+def message_tokens(message):
+    """
+    [학습] Converse 형식 메시지 하나의 토큰 수 (텍스트 블록별 결과는 lru_cache로 재사용)
+    """
+    return MESSAGE_OVERHEAD_TOKENS + sum(
+        _cached_text_tokens(block['text']) for block in message['content'] if 'text' in block
+    )
+
+
+def select_window(history, budget_tokens):
+    """
+    [학습] 예산 안에 들어가는 최신 턴만 남깁니다.
+    반환값: (남길 메시지 리스트, 잘려나간 앞부분 메시지 리스트, 남긴 이력 토큰 수)
+
+    뒤에서부터 user 메시지를 만날 때마다 "턴"이 완성되므로, 턴 전체가 예산에 들어가면 채택합니다.
+    한 턴이라도 넘치면 그보다 오래된 턴은 모두 버립니다(중간을 건너뛰면 문맥이 어긋나므로).
+    """
+    kept_start = len(history)
+    used = 0
+    turn_tokens = 0
+
+    for i in range(len(history) - 1, -1, -1):
+        turn_tokens += message_tokens(history[i])
+        if history[i]['role'] != 'user':
+            continue
+        if used + turn_tokens > budget_tokens:
+            break
+        used += turn_tokens
+        turn_tokens = 0
+        kept_start = i
+
+    return history[kept_start:], history[:kept_start], used
+
+
+def evicted_digest(messages):
+    """
+    [학습] 잘려나간 이력의 해시 - 같은 앞부분에 대한 요약을 재사용하기 위한 캐시 키
+    """
+    digest = hashlib.sha256()
+    for message in messages:
+        digest.update(message['role'].encode('utf-8'))
+        for block in message['content']:
+            digest.update(block.get('text', '').encode('utf-8'))
+    return digest.hexdigest()
+
+
+def prepend_summary(window, summary):
+    """
+    [학습] 요약을 첫 user 메시지의 첫 content 블록으로 붙입니다.
+    별도 user/assistant 메시지를 만들지 않으므로 user/assistant 교대 규칙이 깨지지 않습니다.
+    """
+    if not window or not summary:
+        return window
+    first = window[0]
+    summary_block = {'text': f"Summary of the earlier conversation:\n{summary}"}
+    return [{'role': first['role'], 'content': [summary_block] + list(first['content'])}] + window[1:]
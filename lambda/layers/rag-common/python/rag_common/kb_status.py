@@ -0,0 +1,107 @@
+"""
+[학습] Knowledge Base 수집(ingestion) 상태 조회
+
+sync-knowledge-base Lambda가 start_ingestion_job()으로 시작한 작업의 ID는
+"지금 KB에 들어 있는 문서의 버전"으로 볼 수 있습니다.
+쿼리 Lambda는 최신 작업 ID가 바뀌었는지 확인하여 답변 캐시를 무효화합니다.
+
+[학습] 준비 상태(readiness):
+sync-knowledge-base는 수집 진행 상황을 상태 버킷의 상태 문서(sync/status.json)에 기록합니다.
+문서에는 수집 완료 여부(ready)와 문서 버전(generation: job ID 또는 매니페스트 해시)이 들어 있어,
+문서 단위 수집(job ID 없음)도 버전 변경으로 인식할 수 있습니다.
+상태 버킷이 설정되지 않았으면 최신 ingestion job의 상태로 판단합니다.
+
+list_ingestion_jobs()/get_object() 호출도 비용이 있으므로 결과를 ttl_seconds 동안 캐시합니다.
+"""
+import json
+import threading
+import time
+
+from .clients import get_client
+from .settings import get_settings
+
+_lock = threading.Lock()
+_cached = {'checked_at': 0.0, 'job': None}
+_status_cached = {'checked_at': 0.0, 'status': None}
+
+
+def get_latest_ingestion_job(ttl_seconds=60):
+    """
+    [학습] 가장 최근에 시작된 ingestion job 요약을 반환합니다.
+    반환값: {'ingestion_job_id': ..., 'status': ...} 또는 None (DATA_SOURCE_ID 미설정/조회 실패)
+    조회에 실패해도 요청 처리를 막지 않도록 예외를 삼키고 이전 값을 유지합니다.
+    """
+    settings = get_settings()
+    if not settings.knowledge_base_id or not settings.data_source_id:
+        return None
+
+    now = time.time()
+    if now - _cached['checked_at'] < ttl_seconds:
+        return _cached['job']
+
+    with _lock:
+        if now - _cached['checked_at'] < ttl_seconds:
+            return _cached['job']
+        try:
+            response = get_client('bedrock-agent').list_ingestion_jobs(
+                knowledgeBaseId=settings.knowledge_base_id,
+                dataSourceId=settings.data_source_id,
+                sortBy={'attribute': 'STARTED_AT', 'order': 'DESCENDING'},
+                maxResults=1,
+            )
+            summaries = response.get('ingestionJobSummaries', [])
+            if summaries:
+                _cached['job'] = {
+                    'ingestion_job_id': summaries[0].get('ingestionJobId', ''),
+                    'status': summaries[0].get('status', ''),
+                }
+        except Exception as e:
+            print(f"Ingestion job lookup failed: {str(e)}")
+        _cached['checked_at'] = now
+    return _cached['job']
+
+
+def get_sync_status(ttl_seconds=60):
+    """
+    [학습] sync-knowledge-base가 기록한 상태 문서를 반환합니다.
+    반환값: {'ready': ..., 'generation': ..., 'statistics': {...}, ...} 또는 None (상태 버킷 미설정/문서 없음)
+    조회에 실패해도 요청 처리를 막지 않도록 예외를 삼키고 이전 값을 유지합니다.
+    """
+    settings = get_settings()
+    if not settings.sync_state_bucket:
+        return None
+
+    now = time.time()
+    if now - _status_cached['checked_at'] < ttl_seconds:
+        return _status_cached['status']
+
+    with _lock:
+        if now - _status_cached['checked_at'] < ttl_seconds:
+            return _status_cached['status']
+        try:
+            response = get_client('s3').get_object(
+                Bucket=settings.sync_state_bucket,
+                Key=settings.sync_status_key,
+            )
+            _status_cached['status'] = json.loads(response['Body'].read())
+        except Exception as e:
+            print(f"Sync status lookup failed: {str(e)}")
+        _status_cached['checked_at'] = now
+    return _status_cached['status']
+
+
+def get_kb_readiness(ttl_seconds=60):
+    """
+    [학습] {'ready': 수집 완료 여부, 'generation': 문서 버전}을 반환합니다.
+    상태 문서가 있으면 그 값을, 없으면 최신 ingestion job의 상태와 ID를 사용합니다.
+    수집이 실패(FAILED/STOPPED)했으면 ready=False입니다 - 실패한 수집 결과로 캐시를 채우지 않습니다.
+    둘 다 조회할 수 없으면 None입니다.
+    """
+    status = get_sync_status(ttl_seconds)
+    if status is not None:
+        return {'ready': bool(status.get('ready')), 'generation': status.get('generation')}
+
+    job = get_latest_ingestion_job(ttl_seconds)
+    if job is not None:
+        return {'ready': job['status'] == 'COMPLETE', 'generation': job['ingestion_job_id']}
+    return None
@@ -0,0 +1,230 @@
+"""
+[학습] 검색 후처리(post-retrieval) - 모델에 보내기 전에 검색 결과를 다듬습니다.
+
+Knowledge Base는 문서를 512토큰 청크로 나누면서 20%씩 겹치게(overlap) 저장하므로,
+같은 문서의 인접 청크가 함께 검색되면 겹친 문장이 rag_content에 두 번 들어갑니다.
+점수가 낮은 결과까지 그대로 보내면 입력 토큰(비용, 지연)만 늘고 답변 품질은 좋아지지 않습니다.
+
+처리 순서:
+1. 점수 임계값: score < min_score인 결과 제거
+2. 중복 제거: 포함 관계/거의 같은 청크는 점수가 높은 쪽만 남기고,
+   같은 문서(location)의 앞 청크 끝과 뒤 청크 시작이 겹치면(청크 오버랩) 하나로 이어 붙임
+3. (선택) 재정렬: 벡터 점수와 질문 단어 일치도(어휘 점수)를 섞어 순서를 다시 정함
+4. 토큰 예산: 순서대로 담다가 예산을 넘으면 마지막 청크는 문장 경계에서 자르고 나머지는 버림
+
+검색 결과는 {'text', 'score', 'location'} dict 목록으로 다룹니다.
+"""
+import json
+import math
+import re
+
+from .tokens import estimate_tokens
+
+_WORD = re.compile(r'\w+')
+_SPACES = re.compile(r'[^\S\n]+')
+_LINE_BREAK = re.compile(r' ?\n ?')
+_BLANK_LINES = re.compile(r'\n{3,}')
+_SENTENCE_END = re.compile(r'[.!?。？！]\s|\n')
+
+# [학습] 청크 오버랩으로 판단할 최소 겹침 길이(문자). 너무 짧으면 우연히 같은 구절도 합쳐집니다.
+MIN_OVERLAP_CHARS = 40
+# [학습] 5단어 shingle 자카드 유사도가 이 값 이상이면 거의 같은 청크로 봅니다.
+NEAR_DUPLICATE_JACCARD = 0.8
+# [학습] 예산 끝에서 잘라 넣을 최소 토큰 수 (이보다 적게 남으면 잘라 넣지 않음)
+MIN_PARTIAL_TOKENS = 64
+
+
+def _normalize(text):
+    """
+    [학습] 줄 안의 연속 공백은 하나로 줄이되 줄바꿈/문단 구분(빈 줄 하나)은 남깁니다.
+    truncate_to_tokens()가 줄바꿈을 문장 경계로 사용하기 때문입니다.
+    """
+    text = _LINE_BREAK.sub('\n', _SPACES.sub(' ', text))
+    return _BLANK_LINES.sub('\n\n', text).strip()
+
+
+def _source(result):
+    """
+    [학습] 청크가 나온 문서 식별값 (location이 없으면 None - 출처를 모르면 이어 붙이지 않음)
+    """
+    location = result.get('location')
+    return json.dumps(location, sort_keys=True) if location else None
+
+
+def _shingles(text, size=5):
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _suffix_prefix_overlap(left, right):
+    """
+    [학습] left의 끝과 right의 시작이 겹치는 길이 (없으면 0)
+    right의 앞부분(MIN_OVERLAP_CHARS)을 left에서 찾아 그 위치부터 끝까지가 right의 접두어인지 확인합니다.
+    """
+    probe = right[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    position = left.find(probe)
+    while position != -1:
+        tail = left[position:]
+        if right.startswith(tail):
+            return len(tail)
+        position = left.find(probe, position + 1)
+    return 0
+
+
+def filter_by_score(results, min_score):
+    if min_score <= 0:
+        return list(results)
+    return [r for r in results if r.get('score') is None or r['score'] >= min_score]
+
+
+def dedupe_chunks(results):
+    """
+    [학습] 중복/겹침 청크 정리. 점수가 높은 결과부터 채택하므로 남는 쪽은 항상 더 관련성 높은 청크입니다.
+    반환값: (정리된 결과 목록, 병합 횟수, 제거 횟수)
+    """
+    kept = []
+    merged = removed = 0
+    for result in sorted(results, key=lambda r: r.get('score') or 0.0, reverse=True):
+        text = _normalize(result['text'])
+        shingles = _shingles(text)
+        source = _source(result)
+        absorbed = False
+        for existing in kept:
+            if text in existing['text'] or _jaccard(shingles, existing['_shingles']) >= NEAR_DUPLICATE_JACCARD:
+                removed += 1
+                absorbed = True
+                break
+            if existing['text'] in text:
+                # 새 청크가 기존 청크를 포함하면 더 긴 쪽으로 바꿉니다.
+                existing['text'], existing['_shingles'] = text, shingles
+                removed += 1
+                absorbed = True
+                break
+            # 청크 오버랩: 기존 청크 뒤에 이어지거나(기존 끝 = 새 시작), 앞에 이어지는(새 끝 = 기존 시작) 경우
+            # 다른 문서의 청크가 우연히 같은 구절로 끝나고 시작할 수 있으므로 같은 문서끼리만 잇습니다.
+            if source is None or source != _source(existing):
+                continue
+            overlap = _suffix_prefix_overlap(existing['text'], text)
+            if overlap:
+                existing['text'] = existing['text'] + text[overlap:]
+            else:
+                overlap = _suffix_prefix_overlap(text, existing['text'])
+                if overlap:
+                    existing['text'] = text + existing['text'][overlap:]
+            if overlap:
+                existing['_shingles'] = _shingles(existing['text'])
+                merged += 1
+                absorbed = True
+                break
+        if not absorbed:
+            kept.append(dict(result, text=text, _shingles=shingles))
+
+    for result in kept:
+        del result['_shingles']
+    return kept, merged, removed
+
+
+def lexical_scores(query, results):
+    """
+    [학습] 가벼운 로컬 재정렬 점수 - 질문 단어가 청크에 얼마나 나오는지 (IDF 가중 단어 일치율)
+    검색 결과 몇 개 안에서만 계산하므로 별도 모델 호출 없이 수십 µs 안에 끝납니다.
+    """
+    query_terms = set(_WORD.findall(query.lower()))
+    if not query_terms or not results:
+        return [0.0] * len(results)
+
+    documents = [set(_WORD.findall(r['text'].lower())) for r in results]
+    idf = {
+        term: math.log(1 + len(documents) / (1 + sum(1 for d in documents if term in d)))
+        for term in query_terms
+    }
+    total = sum(idf.values()) or 1.0
+    return [sum(idf[t] for t in query_terms if t in d) / total for d in documents]
+
+
+def rerank(query, results, lexical_weight=0.3):
+    """
+    [학습] 최종 점수 = (1 - w) × 벡터 점수 + w × 어휘 점수
+    벡터 검색이 놓치는 고유명사/모델 ID 같은 정확한 단어 일치를 보완합니다.
+    """
+    lexical = lexical_scores(query, results)
+    scored = []
+    for result, lexical_score in zip(results, lexical):
+        combined = (1 - lexical_weight) * (result.get('score') or 0.0) + lexical_weight * lexical_score
+        scored.append(dict(result, rerank_score=round(combined, 4)))
+    return sorted(scored, key=lambda r: r['rerank_score'], reverse=True)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    [학습] 텍스트를 토큰 예산에 맞게 자르되, 가능하면 마지막 문장 경계에서 자릅니다.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    cut = text[:low]
+    boundaries = [m.end() for m in _SENTENCE_END.finditer(cut)]
+    if boundaries and boundaries[-1] > len(cut) // 2:
+        cut = cut[:boundaries[-1]]
+    return cut.rstrip()
+
+
+def trim_to_budget(results, budget_tokens):
+    """
+    [학습] 순서대로 예산 안에 담습니다. 반환값: (담은 결과 목록, 사용한 토큰 수)
+    """
+    kept = []
+    used = 0
+    for result in results:
+        tokens = estimate_tokens(result['text'])
+        if used + tokens <= budget_tokens:
+            kept.append(result)
+            used += tokens
+            continue
+        remaining = budget_tokens - used
+        if remaining >= MIN_PARTIAL_TOKENS:
+            text = truncate_to_tokens(result['text'], remaining)
+            kept.append(dict(result, text=text, truncated=True))
+            used += estimate_tokens(text)
+        break
+    return kept, used
+
+
+def refine_results(query, results, min_score=0.0, use_rerank=False, budget_tokens=2000):
+    """
+    [학습] 후처리 전체 단계를 실행합니다.
+    반환값: (최종 결과 목록, 단계별 개수와 토큰 수를 담은 report)
+    """
+    input_tokens = sum(estimate_tokens(r['text']) for r in results)
+    passed = filter_by_score(results, min_score)
+    deduped, merged, removed = dedupe_chunks(passed)
+    ordered = rerank(query, deduped) if use_rerank else deduped
+    final, context_tokens = trim_to_budget(ordered, budget_tokens)
+
+    report = {
+        'retrieved': len(results),
+        'below_threshold': len(results) - len(passed),
+        'merged_overlaps': merged,
+        'removed_duplicates': removed,
+        'reranked': use_rerank,
+        'kept': len(final),
+        'context_tokens': context_tokens,
+        'saved_tokens': max(0, input_tokens - context_tokens),
+    }
+    return final, report
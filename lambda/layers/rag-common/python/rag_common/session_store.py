@@ -0,0 +1,209 @@
+"""
+[학습] 서버 측 대화 세션 저장소 - 클라이언트는 새 질문과 session_id만 보냅니다.
+
+이전에는 프론트엔드가 매 요청마다 전체 conversation_history를 다시 보냈기 때문에,
+대화가 길어질수록 요청 크기와 API Gateway/Lambda의 JSON 파싱 시간이 선형으로 늘었습니다.
+이 모듈은 대화 이력을 session_id 기준으로 서버에 저장합니다.
+
+저장 형식(compact encoding):
+- 메시지를 [역할 1글자, 텍스트] 배열로 바꾸고 공백 없는 JSON으로 직렬화합니다.
+- 일정 크기 이상이면 zlib으로 압축합니다. 첫 바이트(b'j' / b'z')로 형식을 구분합니다.
+
+세션별 정리(eviction):
+- 세션마다 최대 메시지 수(max_messages)를 넘으면 가장 오래된 user+assistant 턴부터 삭제
+- 마지막 사용 후 ttl_seconds가 지나면 만료
+- (memory/sqlite) 세션 수가 max_sessions를 넘으면 가장 오래 사용되지 않은 세션부터 삭제
+
+백엔드:
+- memory: 컨테이너 메모리 (로컬 실행/테스트용, 컨테이너끼리 공유되지 않음)
+- sqlite: 로컬 파일 (로컬 실행/테스트용)
+- dynamodb: 배포 환경 기본값 (모든 Lambda 인스턴스가 같은 세션을 공유)
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+_ROLE_CODES = {'user': 'u', 'assistant': 'a'}
+_CODE_ROLES = {code: role for role, code in _ROLE_CODES.items()}
+
+# [학습] 이보다 짧은 이력은 압축 헤더 비용이 더 크므로 그대로 저장합니다.
+COMPRESS_MIN_BYTES = 512
+
+
+def encode_messages(messages):
+    """
+    [학습] [{'role': 'user', 'content': '...'}] → bytes
+    """
+    compact = [[_ROLE_CODES[m['role']], m['content']] for m in messages]
+    raw = json.dumps(compact, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        return b'z' + zlib.compress(raw)
+    return b'j' + raw
+
+
+def decode_messages(data):
+    if not data:
+        return []
+    data = bytes(data)
+    raw = zlib.decompress(data[1:]) if data[:1] == b'z' else data[1:]
+    return [{'role': _CODE_ROLES[code], 'content': text} for code, text in json.loads(raw)]
+
+
+def trim_turns(messages, max_messages):
+    """
+    [학습] 최대 메시지 수를 넘으면 앞에서부터 잘라내되, 남은 이력이 항상 user 메시지로 시작하도록 합니다.
+    """
+    if max_messages <= 0 or len(messages) <= max_messages:
+        return messages
+    start = len(messages) - max_messages
+    while start < len(messages) and messages[start]['role'] != 'user':
+        start += 1
+    return messages[start:]
+
+
+class MemorySessionStore:
+    """
+    [학습] 메모리 기반 세션 저장소 (OrderedDict로 세션 단위 LRU)
+    값은 인코딩된 bytes로 보관하여 DynamoDB/SQLite 백엔드와 같은 저장 형식을 사용합니다.
+    """
+
+    def __init__(self, max_sessions=1000, max_messages=100, ttl_seconds=86400):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            data, updated_at = entry
+            if time.time() - updated_at > self.ttl_seconds:
+                del self._sessions[session_id]
+                return []
+            self._sessions.move_to_end(session_id)
+        return decode_messages(data)
+
+    def save(self, session_id, messages):
+        data = encode_messages(trim_turns(messages, self.max_messages))
+        with self._lock:
+            self._sessions[session_id] = (data, time.time())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore:
+    """
+    [학습] SQLite 파일 기반 세션 저장소 (로컬 실행/테스트용)
+    path=':memory:'면 파일 없이 동작합니다. 스레드 간 연결 공유를 위해 Lock으로 직렬화합니다.
+    """
+
+    def __init__(self, path=':memory:', max_sessions=1000, max_messages=100, ttl_seconds=86400):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            'session_id TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions(updated_at)')
+        self._conn.commit()
+
+    def load(self, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data, updated_at FROM sessions WHERE session_id = ?', (session_id,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            return []
+        return decode_messages(row[0])
+
+    def save(self, session_id, messages):
+        data = encode_messages(trim_turns(messages, self.max_messages))
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)',
+                (session_id, data, now),
+            )
+            # [학습] 만료된 세션과 max_sessions를 넘는 오래된 세션을 함께 정리합니다.
+            self._conn.execute('DELETE FROM sessions WHERE updated_at < ?', (now - self.ttl_seconds,))
+            self._conn.execute(
+                'DELETE FROM sessions WHERE session_id NOT IN ('
+                'SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT ?)',
+                (self.max_sessions,),
+            )
+
+    def delete(self, session_id):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+
+class DynamoDBSessionStore:
+    """
+    [학습] DynamoDB 세션 저장소 (배포 환경)
+    파티션 키 session_id, 이력은 Binary 속성, expires_at은 DynamoDB TTL 속성으로
+    만료된 세션을 DynamoDB가 자동 삭제합니다. (TTL 삭제는 지연될 수 있어 load에서도 확인)
+    """
+
+    def __init__(self, table_name, max_messages=100, ttl_seconds=86400, client=None):
+        if not table_name:
+            raise ValueError('SESSION_TABLE_NAME이 필요합니다.')
+        self.table_name = table_name
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+        if client is None:
+            from .clients import get_client
+            client = get_client('dynamodb')
+        self._client = client
+
+    def load(self, session_id):
+        response = self._client.get_item(
+            TableName=self.table_name,
+            Key={'session_id': {'S': session_id}},
+        )
+        item = response.get('Item')
+        if not item or int(item['expires_at']['N']) < time.time():
+            return []
+        return decode_messages(item['data']['B'])
+
+    def save(self, session_id, messages):
+        self._client.put_item(
+            TableName=self.table_name,
+            Item={
+                'session_id': {'S': session_id},
+                'data': {'B': encode_messages(trim_turns(messages, self.max_messages))},
+                'expires_at': {'N': str(int(time.time() + self.ttl_seconds))},
+            },
+        )
+
+    def delete(self, session_id):
+        self._client.delete_item(TableName=self.table_name, Key={'session_id': {'S': session_id}})
+
+
+BACKENDS = {
+    'memory': MemorySessionStore,
+    'sqlite': SQLiteSessionStore,
+    'dynamodb': DynamoDBSessionStore,
+}
+
+
+def create_session_store(backend='memory', **kwargs):
+    """
+    [학습] 백엔드 이름으로 세션 저장소 구현을 선택합니다 (새 백엔드는 BACKENDS에 등록).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown session store backend: {backend}")
+    return BACKENDS[backend](**kwargs)
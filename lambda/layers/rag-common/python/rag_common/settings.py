@@ -0,0 +1,150 @@
+"""
+[학습] Lambda 공통 설정 캐시
+
+Lambda 컨테이너는 한 번 초기화(cold start)되면 여러 요청(warm start)을 처리합니다.
+환경변수는 컨테이너 수명 동안 바뀌지 않으므로, 최초 1회만 파싱하고
+이후 요청에서는 모듈 수준에 캐시된 Settings 객체를 그대로 재사용합니다.
+"""
+import functools
+import os
+from dataclasses import dataclass
+
+
+def _env_int(name, default):
+    value = os.environ.get(name, '')
+    return int(value) if value else default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name, '')
+    return float(value) if value else default
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    [학습] 세 Lambda가 사용하는 환경변수를 한 곳에 모은 불변(frozen) 설정 객체
+    각 Lambda는 자신에게 필요한 필드만 사용하며, 주입되지 않은 값은 빈 문자열입니다.
+    """
+    knowledge_base_id: str
+    data_source_id: str
+    generation_model_id: str
+    model_arn: str
+    embedding_model_id: str
+    guardrail_id: str
+    guardrail_version: str
+    # [학습] botocore 연결 설정 (환경변수로 덮어쓸 수 있음)
+    # 호출 하나의 최악 소요 시간 = max_attempts × (connect_timeout + read_timeout)이 API Gateway 29초 제한
+    # (Lambda 제한 시간 30초) 안에 들어가도록 기본값을 2회 × (2초 + 12초) = 28초로 둡니다.
+    max_pool_connections: int
+    connect_timeout: float
+    read_timeout: float
+    max_attempts: int
+    # [학습] rag-query 답변 캐시 설정 (similarity_threshold=0이면 의미 일치 비활성화)
+    answer_cache_backend: str
+    answer_cache_max_entries: int
+    answer_cache_ttl_seconds: int
+    answer_cache_similarity_threshold: float
+    kb_status_ttl_seconds: int
+    # [학습] rag-converse 입력 토큰 예산 (컨텍스트 + 질문 + 대화 이력)
+    input_token_budget: int
+    history_summary: bool
+    # [학습] rag-converse 대화 세션 저장소 (memory | sqlite | dynamodb)
+    session_store_backend: str
+    session_table_name: str
+    session_store_path: str
+    session_max_sessions: int
+    session_max_messages: int
+    session_ttl_seconds: int
+    # [학습] 배치 모드 ("queries" 목록) 최대 항목 수와 동시 실행 수
+    batch_max_items: int
+    batch_max_concurrency: int
+    # [학습] 배치 항목별 Bedrock read_timeout(초)/시도 횟수와 배치 전체 시간 상한(ms, API Gateway 29초 제한)
+    batch_read_timeout: float
+    batch_max_attempts: int
+    batch_time_budget_ms: int
+    # [학습] rag-converse 검색 후처리 (min_score=0이면 점수 필터 비활성화)
+    context_min_score: float
+    context_token_budget: int
+    context_rerank: bool
+    # [학습] rag-converse 적응형 numberOfResults (chunk_max_tokens는 KB 청킹 설정과 같은 값)
+    retrieval_initial_k: int
+    retrieval_max_k: int
+    retrieval_low_score: float
+    chunk_max_tokens: int
+    # [학습] 구조화된 추적 로그 (EMF 네임스페이스, 이벤트 덤프 opt-in/샘플링 비율)
+    trace_namespace: str
+    log_events: bool
+    event_log_sample_rate: float
+    # [학습] sync-knowledge-base 매니페스트 기반 증분 동기화
+    # (변경 문서가 sync_direct_max_documents 이하면 문서 단위 수집, 초과하면 ingestion job)
+    document_bucket_name: str
+    document_prefix: str
+    sync_state_bucket: str
+    sync_manifest_key: str
+    sync_direct_max_documents: int
+    local_s3_root: str
+    # [학습] 수집 진행 추적 (지수 백오프 폴링, 상태 문서는 쿼리 Lambda도 읽음)
+    sync_status_key: str
+    sync_wait_seconds: int
+    sync_poll_initial_seconds: float
+    sync_poll_max_seconds: float
+
+
+@functools.lru_cache(maxsize=1)
+def get_settings():
+    """
+    [학습] 환경변수를 한 번만 읽어 Settings로 반환합니다.
+    lru_cache(maxsize=1) 덕분에 두 번째 호출부터는 dict 조회 비용만 듭니다.
+    """
+    return Settings(
+        knowledge_base_id=os.environ.get('KNOWLEDGE_BASE_ID', ''),
+        data_source_id=os.environ.get('DATA_SOURCE_ID', ''),
+        generation_model_id=os.environ.get('GENERATION_MODEL_ID', ''),
+        model_arn=os.environ.get('MODEL_ARN', ''),
+        embedding_model_id=os.environ.get('EMBEDDING_MODEL_ID', 'amazon.titan-embed-text-v2:0'),
+        guardrail_id=os.environ.get('GUARDRAIL_ID', ''),
+        guardrail_version=os.environ.get('GUARDRAIL_VERSION', 'DRAFT'),
+        max_pool_connections=_env_int('BEDROCK_MAX_POOL_CONNECTIONS', 10),
+        connect_timeout=_env_float('BEDROCK_CONNECT_TIMEOUT', 2.0),
+        read_timeout=_env_float('BEDROCK_READ_TIMEOUT', 12.0),
+        max_attempts=_env_int('BEDROCK_MAX_ATTEMPTS', 2),
+        answer_cache_backend=os.environ.get('ANSWER_CACHE_BACKEND', 'memory'),
+        answer_cache_max_entries=_env_int('ANSWER_CACHE_MAX_ENTRIES', 256),
+        answer_cache_ttl_seconds=_env_int('ANSWER_CACHE_TTL_SECONDS', 3600),
+        answer_cache_similarity_threshold=_env_float('ANSWER_CACHE_SIMILARITY_THRESHOLD', 0.0),
+        kb_status_ttl_seconds=_env_int('KB_STATUS_TTL_SECONDS', 60),
+        input_token_budget=_env_int('INPUT_TOKEN_BUDGET', 6000),
+        history_summary=os.environ.get('HISTORY_SUMMARY', '').lower() == 'true',
+        session_store_backend=os.environ.get('SESSION_STORE_BACKEND', 'memory'),
+        session_table_name=os.environ.get('SESSION_TABLE_NAME', ''),
+        session_store_path=os.environ.get('SESSION_STORE_PATH', '/tmp/rag-sessions.db'),
+        session_max_sessions=_env_int('SESSION_MAX_SESSIONS', 1000),
+        session_max_messages=_env_int('SESSION_MAX_MESSAGES', 100),
+        session_ttl_seconds=_env_int('SESSION_TTL_SECONDS', 86400),
+        batch_max_items=_env_int('BATCH_MAX_ITEMS', 50),
+        batch_max_concurrency=_env_int('BATCH_MAX_CONCURRENCY', 4),
+        batch_read_timeout=_env_float('BATCH_READ_TIMEOUT', 6.0),
+        batch_max_attempts=_env_int('BATCH_MAX_ATTEMPTS', 1),
+        batch_time_budget_ms=_env_int('BATCH_TIME_BUDGET_MS', 29000),
+        context_min_score=_env_float('CONTEXT_MIN_SCORE', 0.0),
+        context_token_budget=_env_int('CONTEXT_TOKEN_BUDGET', 2000),
+        context_rerank=os.environ.get('CONTEXT_RERANK', '').lower() == 'true',
+        retrieval_initial_k=_env_int('RETRIEVAL_INITIAL_K', 3),
+        retrieval_max_k=_env_int('RETRIEVAL_MAX_K', 10),
+        retrieval_low_score=_env_float('RETRIEVAL_LOW_SCORE', 0.5),
+        chunk_max_tokens=_env_int('CHUNK_MAX_TOKENS', 512),
+        trace_namespace=os.environ.get('TRACE_NAMESPACE', 'BedrockRag'),
+        log_events=os.environ.get('LOG_EVENTS', '').lower() == 'true',
+        event_log_sample_rate=_env_float('EVENT_LOG_SAMPLE_RATE', 0.0),
+        document_bucket_name=os.environ.get('DOCUMENT_BUCKET_NAME', ''),
+        document_prefix=os.environ.get('DOCUMENT_PREFIX', ''),
+        sync_state_bucket=os.environ.get('SYNC_STATE_BUCKET', ''),
+        sync_manifest_key=os.environ.get('SYNC_MANIFEST_KEY', 'sync/manifest.json'),
+        sync_direct_max_documents=_env_int('SYNC_DIRECT_MAX_DOCUMENTS', 50),
+        local_s3_root=os.environ.get('LOCAL_S3_ROOT', ''),
+        sync_status_key=os.environ.get('SYNC_STATUS_KEY', 'sync/status.json'),
+        sync_wait_seconds=_env_int('SYNC_WAIT_SECONDS', 240),
+        sync_poll_initial_seconds=_env_float('SYNC_POLL_INITIAL_SECONDS', 2.0),
+        sync_poll_max_seconds=_env_float('SYNC_POLL_MAX_SECONDS', 30.0),
+    )
@@ -0,0 +1,40 @@
+"""
+[학습] 단계별 소요 시간 측정
+
+RAG 요청은 검색 → 프롬프트 조립 → 생성처럼 여러 단계로 나뉩니다.
+StageTimer는 각 단계의 소요 시간(ms)을 기록하며, 스레드 풀에서 병렬로 실행되는 단계도
+같은 타이머에 안전하게 기록할 수 있도록 Lock으로 보호합니다.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+
+    def __init__(self):
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self.timings[name] = self.timings.get(name, 0.0) + elapsed_ms
+
+    def wrap(self, name, fn):
+        """
+        [학습] 함수를 단계 측정으로 감싸 반환합니다 (executor.submit()에 넘길 때 사용).
+        """
+        def timed(*args, **kwargs):
+            with self.stage(name):
+                return fn(*args, **kwargs)
+        return timed
+
+    def as_dict(self):
+        with self._lock:
+            return {name: round(ms, 2) for name, ms in self.timings.items()}
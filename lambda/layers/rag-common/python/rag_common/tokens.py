@@ -0,0 +1,19 @@
+"""
+[학습] 토큰 수 추정
+
+정확한 토큰 수는 모델별 토크나이저가 있어야 알 수 있지만, Lambda에 토크나이저를 넣으면
+패키지 크기와 cold start가 커집니다. 대신 문자 종류별 평균 비율로 빠르게 추정합니다:
+- ASCII(영문/숫자/공백): 약 4글자 = 1토큰
+- 그 외(한글 등): 약 1글자 = 1토큰 (한글은 영문보다 글자당 토큰이 많음)
+예산 계산용 추정치이므로 실제보다 약간 크게 잡히는 쪽이 안전합니다.
+"""
+import math
+
+
+def estimate_tokens(text):
+    if not text:
+        return 0
+    # encode('ascii', 'ignore')는 C 구현이라 문자 단위 파이썬 루프보다 훨씬 빠릅니다.
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    other_chars = len(text) - ascii_chars
+    return math.ceil(ascii_chars / 4) + other_chars
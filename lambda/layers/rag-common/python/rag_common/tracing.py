@@ -0,0 +1,113 @@
+"""
+[학습] 구조화된 지연 시간/토큰 추적 - CloudWatch EMF(Embedded Metric Format) 로그
+
+X-Ray 없이도 "시간이 어디에 쓰였는지"를 대시보드로 보려면, 요청마다 단계별 소요 시간과
+토큰 사용량을 한 줄의 JSON 로그로 남기면 됩니다. 로그가 EMF 형식이면 CloudWatch가
+별도 API 호출(PutMetricData) 없이 로그에서 지표를 자동으로 추출합니다.
+
+    {"_aws": {"Timestamp": ..., "CloudWatchMetrics": [{"Namespace": "BedrockRag",
+              "Dimensions": [["FunctionName"]], "Metrics": [{"Name": "retrieve_ms", "Unit": "Milliseconds"}, ...]}]},
+     "FunctionName": "rag-converse", "retrieve_ms": 182.4, "input_tokens": 1830, "request_id": "...", ...}
+
+- 단계 시간: Trace는 StageTimer를 확장하므로 prepare_request(timer)처럼 기존 코드에 그대로 넘길 수 있습니다.
+- 토큰 사용량: Converse 응답의 usage(inputTokens, outputTokens, totalTokens)를 누적합니다.
+- 이벤트 덤프: 매 요청 json.dumps(event)는 비용이 크므로 LOG_EVENTS=true이거나
+  EVENT_LOG_SAMPLE_RATE 확률로 샘플링될 때만 출력합니다.
+"""
+import json
+import random
+import time
+
+from .settings import get_settings
+from .timing import StageTimer
+
+# [학습] Converse usage 필드 → 지표 이름
+_USAGE_METRICS = {
+    'inputTokens': 'input_tokens',
+    'outputTokens': 'output_tokens',
+    'totalTokens': 'total_tokens',
+}
+
+
+class Trace(StageTimer):
+    """
+    [학습] 요청 하나의 추적 정보 (단계 시간 + 토큰 사용량 + 검색용 속성)
+    emit()을 호출하면 EMF 로그 한 줄을 출력합니다.
+    """
+
+    def __init__(self, function_name, context=None):
+        super().__init__()
+        self.function_name = function_name
+        self.usage = {}
+        self.counts = {}
+        self.properties = {}
+        if context is not None:
+            self.properties['request_id'] = getattr(context, 'aws_request_id', None)
+
+    def add_usage(self, usage):
+        if not usage:
+            return
+        with self._lock:
+            for field, metric in _USAGE_METRICS.items():
+                if field in usage:
+                    self.usage[metric] = self.usage.get(metric, 0) + usage[field]
+
+    def merge_timings(self, timings):
+        """
+        [학습] 다른 타이머의 단계 시간(ms)을 더합니다 (배치 항목별 타이머 → 호출 전체 trace).
+        """
+        with self._lock:
+            for name, ms in timings.items():
+                self.timings[name] = self.timings.get(name, 0.0) + ms
+
+    def count(self, name, value=1):
+        """
+        [학습] 개수 지표 (예: 배치 항목 수, 검색 결과 수)
+        """
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def set(self, **properties):
+        """
+        [학습] 지표가 아닌 검색용 속성 (예: cache_hit, mode). CloudWatch Logs Insights로 필터링합니다.
+        """
+        with self._lock:
+            self.properties.update(properties)
+
+    def to_emf(self):
+        settings = get_settings()
+        with self._lock:
+            timings = {f'{name}_ms': round(ms, 2) for name, ms in self.timings.items()}
+            counts = dict(self.usage, **self.counts)
+            properties = dict(self.properties)
+
+        metrics = [{'Name': name, 'Unit': 'Milliseconds'} for name in timings]
+        metrics += [{'Name': name, 'Unit': 'Count'} for name in counts]
+        record = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': settings.trace_namespace,
+                    'Dimensions': [['FunctionName']],
+                    'Metrics': metrics,
+                }],
+            },
+            'FunctionName': self.function_name,
+        }
+        record.update(properties)
+        record.update(timings)
+        record.update(counts)
+        return record
+
+    def emit(self):
+        print(json.dumps(self.to_emf(), ensure_ascii=False, default=str))
+
+
+def log_event(event):
+    """
+    [학습] 요청 이벤트 덤프 (opt-in 또는 샘플링)
+    기본값(LOG_EVENTS 미설정, EVENT_LOG_SAMPLE_RATE=0)에서는 json.dumps 비용을 전혀 쓰지 않습니다.
+    """
+    settings = get_settings()
+    if settings.log_events or (settings.event_log_sample_rate > 0 and random.random() < settings.event_log_sample_rate):
+        print(f"Event: {json.dumps(event)}")
@@ -16,126 +16,545 @@
 환경변수:
 - KNOWLEDGE_BASE_ID: Bedrock Knowledge Base ID
 - GENERATION_MODEL_ID: Converse API에 사용할 LLM 모델 ID
+- BEDROCK_CONNECT_TIMEOUT / BEDROCK_READ_TIMEOUT / BEDROCK_MAX_ATTEMPTS: (선택) botocore 연결 설정
+- GUARDRAIL_ID / GUARDRAIL_VERSION: (선택) 설정 시 검색과 병렬로 apply_guardrail() 입력 검사
+- INPUT_TOKEN_BUDGET: 컨텍스트 + 질문 + 대화 이력에 쓸 입력 토큰 예산 (기본 6000)
+- HISTORY_SUMMARY: (선택) true면 예산 밖으로 밀려난 이력을 요약하여 유지
+- SESSION_STORE_BACKEND: 대화 세션 저장소 (dynamodb | sqlite | memory, 기본 memory)
+- SESSION_TABLE_NAME / SESSION_TTL_SECONDS / SESSION_MAX_MESSAGES: 세션 저장소 설정
+- BATCH_MAX_ITEMS / BATCH_MAX_CONCURRENCY: 배치 모드 최대 질문 수 / 동시 실행 수
+- CONTEXT_MIN_SCORE / CONTEXT_TOKEN_BUDGET / CONTEXT_RERANK: 검색 후처리 (점수 임계값, 컨텍스트 토큰 예산, 로컬 재정렬)
+- RETRIEVAL_INITIAL_K / RETRIEVAL_MAX_K / RETRIEVAL_LOW_SCORE / CHUNK_MAX_TOKENS: 적응형 numberOfResults 정책
+- TRACE_NAMESPACE / LOG_EVENTS / EVENT_LOG_SAMPLE_RATE: EMF 추적 로그 네임스페이스, 이벤트 덤프 opt-in/샘플링
+
+공통 코드: lambda/layers/rag-common (Lambda Layer로 배포되는 rag_common 패키지)
 """
 import json
-import os
-import boto3
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from rag_common import get_client, get_settings, prewarm
+from rag_common.batch import batch_results, run_batch
+from rag_common.clients import bind_client_scope
+from rag_common.adaptive_retrieval import adaptive_retrieve
+from rag_common.history import evicted_digest, message_tokens, prepend_summary, select_window
+from rag_common.post_retrieval import refine_results
+from rag_common.session_store import create_session_store
+from rag_common.timing import StageTimer
+from rag_common.tracing import Trace, log_event
 
 # [학습] 두 개의 서로 다른 Bedrock 클라이언트를 사용합니다:
 # - bedrock-agent-runtime: Knowledge Base 검색(retrieve) 전용
 # - bedrock-runtime: LLM 모델 직접 호출(converse) 전용
-bedrock_agent_runtime = boto3.client('bedrock-agent-runtime')
-bedrock_runtime = boto3.client('bedrock-runtime')
+# 클라이언트는 공통 레이어(rag_common)가 하나의 세션에서 만들어 캐시합니다.
+# prewarm()을 모듈 최상단에서 호출하여 생성 비용을 Lambda INIT 단계로 옮깁니다.
+prewarm('bedrock-agent-runtime', 'bedrock-runtime')
+
+# [학습] 검색 컨텍스트 앞뒤에 붙는 고정 지시문
+INSTRUCTION_TEXT = 'Based on the content above, please answer the following question:'
+
+# [학습] 잘려나간 이력 요약 캐시 (이력 앞부분 해시 → 요약문)
+# 같은 세션이 다음 턴을 보내면 같은 앞부분에 대한 요약을 다시 만들지 않습니다.
+# 배치 모드에서는 여러 스레드가 동시에 접근하므로 조회/저장/제거를 락으로 보호합니다.
+_summary_cache = OrderedDict()
+_summary_lock = threading.Lock()
+SUMMARY_CACHE_SIZE = 64
 
-KNOWLEDGE_BASE_ID = os.environ.get('KNOWLEDGE_BASE_ID', '')
-GENERATION_MODEL_ID = os.environ.get('GENERATION_MODEL_ID', '')
+# [학습] 요청 준비 단계(검색, 가드레일 검사)를 병렬로 실행하는 스레드 풀
+# I/O 대기(네트워크 호출)가 대부분이므로 GIL이 있어도 스레드로 충분히 겹쳐 실행됩니다.
+# 모듈 전역에 두어 warm start 요청 간에 스레드를 재사용합니다.
+# 배치 모드에서는 여러 항목이 동시에 검색/가드레일을 제출하므로 배치 동시 실행 수의 2배까지 늘립니다.
+_executor = ThreadPoolExecutor(
+    max_workers=max(4, 2 * get_settings().batch_max_concurrency),
+    thread_name_prefix='rag-pipeline',
+)
 
-# [학습] 워크숍 chatbot_lib.py 패턴: 대화 이력 최대 메시지 수
-# 메모리와 토큰 제한을 고려하여 오래된 대화를 자동으로 삭제합니다.
-MAX_MESSAGES = 20
+# [학습] 대화 세션 저장소 (최초 사용 시 생성하여 warm start 요청 간에 재사용)
+_session_store = None
+
+# [학습] converse() / converse_stream() 공통 추론 파라미터
+# 워크숍 rag_lib.py의 inferenceConfig 기본값을 사용합니다:
+# - maxTokens: 생성할 최대 토큰 수
+# - temperature: 0이면 결정적(항상 같은 답변), 높을수록 창의적
+# - topP: 누적 확률 기반 토큰 선택 (0.9 = 상위 90% 확률 토큰 중 선택)
+INFERENCE_CONFIG = {
+    'maxTokens': 2000,
+    'temperature': 0,
+    'topP': 0.9,
+    'stopSequences': [],
+}
 
 
 def handler(event, context):
     """
     [학습] API Gateway 프록시 통합 핸들러
-    요청 body: {"query": "사용자 질문", "conversation_history": [...]}
-    conversation_history는 [{"role": "user", "content": "..."}, {"role": "assistant", "content": "..."}] 형태
+    요청 body (세션 모드): {"query": "사용자 질문", "session_id": "..."}
+    - session_id가 없으면 새 세션을 만들고 응답의 session_id로 돌려줍니다.
+    - "reset_session": true면 저장된 이력을 지우고 새 대화로 시작합니다.
+    요청 body (이전 방식): {"query": "사용자 질문", "conversation_history": [...]}
+    - conversation_history는 [{"role": "user", "content": "..."}, {"role": "assistant", "content": "..."}] 형태이며,
+      이 키가 있으면 세션 저장소를 사용하지 않습니다.
+    배치 모드: {"queries": ["질문1", {"query": "질문2", "conversation_history": [...]}, ...]}
+
+    [학습] Trace는 StageTimer를 확장하므로 prepare_request()에 타이머로 그대로 넘기고,
+    요청이 끝나면 단계 시간과 converse() 토큰 사용량을 EMF 로그 한 줄로 남깁니다 (rag_common/tracing.py).
     """
-    print(f"Event: {json.dumps(event)}")
+    trace = Trace('rag-converse', context)
+    log_event(event)
+    try:
+        with trace.stage('total'):
+            return handle_request(event, context, trace)
+    finally:
+        trace.emit()
+
 
+def handle_request(event, context, trace):
     try:
-        body = json.loads(event.get('body', '{}'))
+        with trace.stage('serialization'):
+            body = json.loads(event.get('body', '{}'))
+
+        if 'queries' in body:
+            return handle_batch(body['queries'], context, trace)
+
         query = body.get('query', '')
-        conversation_history = body.get('conversation_history', [])
 
         if not query:
-            return build_response(400, {'error': 'query 파라미터가 필요합니다.'})
-
-        # [학습] 1단계: retrieve() - Knowledge Base에서 관련 문서 검색
-        # retrieve_and_generate()와 달리 검색만 수행하고 LLM 호출은 하지 않습니다.
-        # numberOfResults로 반환할 검색 결과 수를 제어합니다.
-        retrieve_response = bedrock_agent_runtime.retrieve(
-            knowledgeBaseId=KNOWLEDGE_BASE_ID,
-            retrievalQuery={'text': query},
-            retrievalConfiguration={
-                'vectorSearchConfiguration': {
-                    'numberOfResults': 4,
-                },
-            },
-        )
-
-        # [학습] 검색 결과에서 텍스트 컨텍스트 추출
-        # 각 결과의 content.text에 원본 문서 청크가 들어있습니다.
-        contexts = []
-        for result in retrieve_response.get('retrievalResults', []):
-            text = result.get('content', {}).get('text', '')
-            if text:
-                contexts.append(text)
-
-        rag_content = '\n\n'.join(contexts)
-
-        # [학습] 2단계: converse() - LLM 직접 호출
-        # 워크숍 rag_lib.py 패턴: 메시지 content 배열에 [컨텍스트, 지시문, 질문]을 순서대로 배치합니다.
-        # 이렇게 하면 LLM이 컨텍스트를 참조하여 질문에 답변합니다.
-        user_message = {
-            'role': 'user',
-            'content': [
-                {'text': rag_content},
-                {'text': 'Based on the content above, please answer the following question:'},
-                {'text': query},
-            ],
-        }
+            return build_response(400, {'error': 'query 파라미터가 필요합니다.'}, trace)
 
-        # [학습] 대화 이력 관리 (워크숍 chatbot_lib.py 패턴)
-        # conversation_history를 Converse API 메시지 형식으로 변환합니다.
-        messages = []
-        for msg in conversation_history:
-            messages.append({
-                'role': msg['role'],
-                'content': [{'text': msg['content']}],
-            })
+        conversation_history, session_id = resolve_session(body)
+        trace.set(mode='session' if session_id else 'single')
+        prepared = prepare_request(query, conversation_history, trace, session_id)
 
-        messages.append(user_message)
-
-        # [학습] MAX_MESSAGES 초과 시 오래된 메시지를 삭제합니다.
-        # user+assistant 쌍 단위로 삭제하여 대화 흐름이 깨지지 않도록 합니다.
-        if len(messages) > MAX_MESSAGES:
-            excess = len(messages) - MAX_MESSAGES
-            del messages[0:excess]
-
-        # [학습] converse() API 호출
-        # 워크숍 rag_lib.py의 inferenceConfig 기본값을 사용합니다:
-        # - maxTokens: 생성할 최대 토큰 수
-        # - temperature: 0이면 결정적(항상 같은 답변), 높을수록 창의적
-        # - topP: 누적 확률 기반 토큰 선택 (0.9 = 상위 90% 확률 토큰 중 선택)
-        converse_response = bedrock_runtime.converse(
-            modelId=GENERATION_MODEL_ID,
-            messages=messages,
-            inferenceConfig={
-                'maxTokens': 2000,
-                'temperature': 0,
-                'topP': 0.9,
-                'stopSequences': [],
-            },
-        )
+        if prepared['blocked']:
+            trace.set(guardrail='INTERVENED')
+            return build_response(200, {
+                'answer': prepared['blocked'],
+                'contexts': [],
+                'guardrail': 'INTERVENED',
+                'timings': trace.as_dict(),
+            }, trace)
 
-        # [학습] converse() 응답에서 답변 텍스트 추출
-        answer = converse_response['output']['message']['content'][0]['text']
+        # [학습] 2단계: converse() API 호출
+        with trace.stage('converse'):
+            answer, usage = generate_answer(prepared['messages'])
+        trace.add_usage(usage)
+        trace.count('contexts', len(prepared['contexts']))
+
+        if session_id:
+            with trace.stage('session_save'):
+                save_turn(session_id, prepared['history'], query, answer)
 
         return build_response(200, {
             'answer': answer,
-            'contexts': contexts,
-        })
+            'contexts': prepared['contexts'],
+            'session_id': session_id,
+            'retrieval': prepared['retrieval'],
+            'token_budget': prepared['token_budget'],
+            'usage': usage,
+            'timings': trace.as_dict(),
+        }, trace)
 
     except Exception as e:
         print(f"Error: {str(e)}")
-        return build_response(500, {'error': str(e)})
+        trace.set(error=str(e))
+        return build_response(500, {'error': str(e)}, trace)
+
+
+def generate_answer(messages):
+    """
+    [학습] converse() 호출. 반환값: (답변 텍스트, usage)
+    usage는 {'inputTokens', 'outputTokens', 'totalTokens'} - 비용 대시보드의 기준 값입니다.
+    """
+    converse_response = get_client('bedrock-runtime').converse(
+        modelId=get_settings().generation_model_id,
+        messages=messages,
+        inferenceConfig=INFERENCE_CONFIG,
+    )
+    # [학습] converse() 응답에서 답변 텍스트 추출
+    answer = converse_response['output']['message']['content'][0]['text']
+    return answer, converse_response.get('usage', {})
 
 
-def build_response(status_code, body):
+def handle_batch(queries, context, trace):
+    """
+    [학습] 배치 모드: 각 항목을 독립된 요청으로 보고 검색 + 생성을 제한된 동시성으로 처리합니다.
+    항목은 질문 문자열 또는 {"query", "conversation_history"} 객체이며, 세션 저장소는 사용하지 않습니다.
+    질문과 이력이 모두 같은 항목은 한 번만 실행하고 결과를 공유합니다.
+    """
+    settings = get_settings()
+    if not isinstance(queries, list) or not queries:
+        return build_response(400, {'error': 'queries는 비어 있지 않은 목록이어야 합니다.'}, trace)
+    if len(queries) > settings.batch_max_items:
+        return build_response(400, {'error': f'queries는 최대 {settings.batch_max_items}개까지 보낼 수 있습니다.'}, trace)
+
+    items = [q if isinstance(q, dict) else {'query': q} for q in queries]
+    if not all(isinstance(item.get('query'), str) and item['query'] for item in items):
+        return build_response(400, {'error': '모든 항목에 query 문자열이 필요합니다.'}, trace)
+
+    trace.set(mode='batch')
+    outcomes, stats = run_batch(
+        items,
+        answer_batch_item,
+        key_fn=lambda item: json.dumps([item['query'], item.get('conversation_history', [])], sort_keys=True),
+        max_concurrency=settings.batch_max_concurrency,
+        remaining_ms_fn=getattr(context, 'get_remaining_time_in_millis', None),
+        budget_ms=settings.batch_time_budget_ms,
+        read_timeout=settings.batch_read_timeout,
+        max_attempts=settings.batch_max_attempts,
+        calls_per_item=converse_calls_per_item(settings),
+    )
+
+    # [학습] 중복 항목은 실제로 실행되지 않았으므로 처음 실행된 항목만 trace에 합산합니다.
+    for outcome in outcomes:
+        if outcome['status'] == 'ok' and 'duplicate_of' not in outcome:
+            trace.merge_timings(outcome['value']['timings'])
+            trace.add_usage(outcome['value'].get('usage'))
+    trace.count('batch_items', stats['items'])
+    trace.count('batch_failed', stats['failed'])
+
+    return build_response(200, {
+        'results': batch_results([item['query'] for item in items], outcomes),
+        'batch': stats,
+    }, trace)
+
+
+def converse_calls_per_item(settings):
+    """
+    [학습] 배치 항목 하나가 순서대로 하는 Bedrock 호출 수의 최댓값
+    검색 최대 2회(적응형 재검색, 가드레일은 검색과 병렬) + (HISTORY_SUMMARY면) 이력 요약 + converse
+    """
+    return 2 + (1 if settings.history_summary else 0) + 1
+
+
+def answer_batch_item(item):
+    timer = StageTimer()
+    prepared = prepare_request(item['query'], item.get('conversation_history', []), timer)
+    if prepared['blocked']:
+        return {'answer': prepared['blocked'], 'contexts': [], 'guardrail': 'INTERVENED', 'timings': timer.as_dict()}
+
+    with timer.stage('converse'):
+        answer, usage = generate_answer(prepared['messages'])
+    return {
+        'answer': answer,
+        'contexts': prepared['contexts'],
+        'retrieval': prepared['retrieval'],
+        'token_budget': prepared['token_budget'],
+        'usage': usage,
+        'timings': timer.as_dict(),
+    }
+
+
+def resolve_session(body):
+    """
+    [학습] 요청 body에서 대화 이력 출처를 결정합니다.
+    반환값: (conversation_history, session_id)
+    - conversation_history가 body에 있으면 이전 방식(클라이언트가 이력 전송) → session_id는 None
+    - 아니면 세션 모드 → 이력은 prepare_request()가 저장소에서 불러오므로 None
+    """
+    if 'conversation_history' in body:
+        return body['conversation_history'], None
+
+    session_id = body.get('session_id') or uuid.uuid4().hex
+    if body.get('reset_session'):
+        get_session_store().delete(session_id)
+    return None, session_id
+
+
+def get_session_store():
+    global _session_store
+    if _session_store is None:
+        settings = get_settings()
+        options = {
+            'max_messages': settings.session_max_messages,
+            'ttl_seconds': settings.session_ttl_seconds,
+        }
+        if settings.session_store_backend == 'dynamodb':
+            options['table_name'] = settings.session_table_name
+        else:
+            options['max_sessions'] = settings.session_max_sessions
+        if settings.session_store_backend == 'sqlite':
+            options['path'] = settings.session_store_path
+        _session_store = create_session_store(settings.session_store_backend, **options)
+    return _session_store
+
+
+def save_turn(session_id, history, query, answer):
+    """
+    [학습] 이번 질문과 답변을 세션 이력 끝에 추가하여 저장합니다.
+    저장소에는 검색 컨텍스트 없이 원래 질문만 저장하여 세션 크기를 작게 유지합니다.
+    """
+    get_session_store().save(session_id, history + [
+        {'role': 'user', 'content': query},
+        {'role': 'assistant', 'content': answer},
+    ])
+
+
+def prepare_request(query, conversation_history, timer, session_id=None):
+    """
+    [학습] converse() 호출 전 준비 단계를 병렬 파이프라인으로 실행합니다.
+
+    순차 실행:  [retrieve] → [guardrail] → [history] → [token_budget] → [post_retrieval] → [assemble]
+    병렬 실행:  [retrieve ─────────────]
+                [guardrail ────]
+                [history][token_budget]           → [post_retrieval] → [assemble]
+
+    네트워크 호출(retrieve, guardrail)은 스레드 풀에서 실행하고, 그동안 메인 스레드에서
+    대화 이력 변환과 메시지별 토큰 추정(캐시 채우기)을 처리합니다. 전체 준비 시간은
+    단계 합(sum)이 아니라 가장 느린 단계(max)에 가까워집니다. 각 단계 시간은 timer에 기록됩니다.
+
+    session_id가 주어지면 세션 저장소 조회(session_load)도 검색과 함께 스레드 풀에서 실행합니다.
+
+    반환값: {'messages', 'contexts', 'retrieval', 'history', 'token_budget', 'blocked'}
+    history는 이번 턴 이전의 원본 대화 이력(세션 저장용)이고,
+    blocked는 가드레일이 개입했을 때의 대체 응답 문자열(아니면 None)입니다.
+    """
+    with timer.stage('prepare'):
+        # [학습] bind_client_scope(): 배치 항목의 짧은 타임아웃 클라이언트 설정을 작업 스레드에도 적용합니다.
+        retrieve_future = _executor.submit(bind_client_scope(timer.wrap('retrieve', retrieve_adaptive)), query)
+        guardrail_future = None
+        if get_settings().guardrail_id:
+            guardrail_future = _executor.submit(bind_client_scope(timer.wrap('guardrail', check_guardrail)), query)
+        if session_id:
+            session_future = _executor.submit(
+                bind_client_scope(timer.wrap('session_load', get_session_store().load)), session_id)
+            conversation_history = session_future.result()
+
+        with timer.stage('history'):
+            history = normalize_history(conversation_history)
+
+        with timer.stage('token_budget'):
+            # 검색을 기다리는 동안 메시지별 토큰 수를 미리 계산해 캐시에 채워둡니다.
+            for message in history:
+                message_tokens(message)
+
+        blocked = guardrail_future.result() if guardrail_future else None
+        if blocked:
+            # 검색 결과는 사용하지 않지만, 실행 중인 스레드는 끝까지 완료되도록 둡니다.
+            return {
+                'messages': [], 'contexts': [], 'retrieval': {}, 'history': conversation_history,
+                'token_budget': {}, 'blocked': blocked,
+            }
+
+        results, policy = retrieve_future.result()
+
+        with timer.stage('post_retrieval'):
+            contexts, retrieval = refine_contexts(query, results)
+            retrieval['policy'] = policy
+
+        with timer.stage('assemble'):
+            messages, token_budget = assemble_messages(query, contexts, history, timer)
+
+    return {
+        'messages': messages,
+        'contexts': contexts,
+        'retrieval': retrieval,
+        'history': conversation_history,
+        'token_budget': token_budget,
+        'blocked': None,
+    }
+
+
+def check_guardrail(query):
+    """
+    [학습] apply_guardrail() - 모델 호출 없이 입력 텍스트만 가드레일로 검사합니다.
+    GUARDRAIL_ID가 설정된 경우에만 실행되며, 가드레일이 개입(GUARDRAIL_INTERVENED)하면
+    가드레일에 설정된 차단 메시지를 반환하고, 통과하면 None을 반환합니다.
+    워크숍 참조: workshop/completed/guardrails/guardrails_lib.py
+    """
+    settings = get_settings()
+    response = get_client('bedrock-runtime').apply_guardrail(
+        guardrailIdentifier=settings.guardrail_id,
+        guardrailVersion=settings.guardrail_version,
+        source='INPUT',
+        content=[{'text': {'text': query}}],
+    )
+    if response.get('action') == 'GUARDRAIL_INTERVENED':
+        outputs = response.get('outputs', [])
+        return outputs[0].get('text', '') if outputs else '요청이 가드레일 정책에 의해 차단되었습니다.'
+    return None
+
+
+def retrieve_adaptive(query):
+    """
+    [학습] 적응형 numberOfResults 정책으로 검색합니다 (rag_common/adaptive_retrieval.py).
+    단순한 질문은 적은 청크로 시작하고, 최고 점수가 낮거나 여러 부분으로 된 질문일 때만 넓힙니다.
+    반환값: (검색 결과, 결정 내역) - 결정 내역은 응답의 retrieval.policy로 반환됩니다.
+    """
+    settings = get_settings()
+    return adaptive_retrieve(
+        query,
+        lambda k: retrieve_contexts(query, k),
+        initial_k=settings.retrieval_initial_k,
+        max_k=settings.retrieval_max_k,
+        low_score=settings.retrieval_low_score,
+        context_token_budget=settings.context_token_budget,
+        chunk_tokens=settings.chunk_max_tokens,
+    )
+
+
+def retrieve_contexts(query, number_of_results=4):
+    """
+    [학습] 1단계: retrieve() - Knowledge Base에서 관련 문서 검색
+    retrieve_and_generate()와 달리 검색만 수행하고 LLM 호출은 하지 않습니다.
+    numberOfResults로 반환할 검색 결과 수를 제어합니다.
+    반환값: [{'text', 'score', 'location'}] - 후처리(refine_contexts)에서 점수와 출처를 사용합니다.
+    """
+    retrieve_response = get_client('bedrock-agent-runtime').retrieve(
+        knowledgeBaseId=get_settings().knowledge_base_id,
+        retrievalQuery={'text': query},
+        retrievalConfiguration={
+            'vectorSearchConfiguration': {
+                'numberOfResults': number_of_results,
+            },
+        },
+    )
+
+    # [학습] 검색 결과에서 텍스트 컨텍스트와 유사도 점수 추출
+    # 각 결과의 content.text에 원본 문서 청크가 들어있습니다.
+    results = []
+    for result in retrieve_response.get('retrievalResults', []):
+        text = result.get('content', {}).get('text', '')
+        if text:
+            results.append({
+                'text': text,
+                'score': result.get('score'),
+                'location': result.get('location', {}),
+            })
+
+    return results
+
+
+def refine_contexts(query, results):
+    """
+    [학습] 검색 후처리 (rag_common/post_retrieval.py)
+    낮은 점수 제거 → 겹치는 청크 병합/중복 제거 → (선택) 로컬 재정렬 → 컨텍스트 토큰 예산으로 자르기
+    반환값: (컨텍스트 문자열 목록, 단계별 처리 결과 report)
+    """
+    settings = get_settings()
+    refined, report = refine_results(
+        query,
+        results,
+        min_score=settings.context_min_score,
+        use_rerank=settings.context_rerank,
+        budget_tokens=settings.context_token_budget,
+    )
+    return [r['text'] for r in refined], report
+
+
+def normalize_history(conversation_history):
+    """
+    [학습] 대화 이력 관리 (워크숍 chatbot_lib.py 패턴)
+    conversation_history를 Converse API 메시지 형식으로 변환합니다.
+    """
+    messages = []
+    for msg in conversation_history:
+        messages.append({
+            'role': msg['role'],
+            'content': [{'text': msg['content']}],
+        })
+    return messages
+
+
+def assemble_messages(query, contexts, history, timer=None):
+    """
+    [학습] 검색 컨텍스트와 질문으로 마지막 user 메시지를 만들고, 토큰 예산 안의 이력 뒤에 붙입니다.
+
+    입력 예산(INPUT_TOKEN_BUDGET)에서 컨텍스트/지시문/질문 토큰을 먼저 빼고,
+    남은 예산 안에 들어가는 최신 대화 턴만 남깁니다 (rag_common/history.py).
+    반환값: (messages, token_budget) - token_budget은 응답에 포함되는 예산 사용 내역입니다.
+    """
+    settings = get_settings()
+    rag_content = '\n\n'.join(contexts)
+
+    # [학습] 워크숍 rag_lib.py 패턴: 메시지 content 배열에 [컨텍스트, 지시문, 질문]을 순서대로 배치합니다.
+    # 이렇게 하면 LLM이 컨텍스트를 참조하여 질문에 답변합니다.
+    user_message = {
+        'role': 'user',
+        'content': [
+            {'text': rag_content},
+            {'text': INSTRUCTION_TEXT},
+            {'text': query},
+        ],
+    }
+
+    # [학습] 대화 이력에 쓸 수 있는 예산 = 전체 입력 예산 - 이번 질문 메시지 토큰
+    request_tokens = message_tokens(user_message)
+    history_budget = max(0, settings.input_token_budget - request_tokens)
+    window, evicted, history_tokens = select_window(history, history_budget)
+
+    summarized = False
+    if evicted and settings.history_summary:
+        if timer is not None:
+            with timer.stage('summarize'):
+                summary = summarize_history(evicted)
+        else:
+            summary = summarize_history(evicted)
+        window = prepend_summary(window, summary)
+        summarized = bool(summary)
+
+    messages = list(window)
+    messages.append(user_message)
+
+    token_budget = {
+        'input_budget': settings.input_token_budget,
+        'request_tokens': request_tokens,
+        'history_budget': history_budget,
+        'history_tokens': history_tokens,
+        'kept_messages': len(window),
+        'evicted_messages': len(evicted),
+        'summarized': summarized,
+    }
+    return messages, token_budget
+
+
+def summarize_history(evicted):
+    """
+    [학습] (선택, HISTORY_SUMMARY=true) 예산 밖으로 밀려난 이력을 짧게 요약합니다.
+    요약도 모델 호출이므로 maxTokens를 작게 두고, 같은 앞부분은 캐시된 요약을 재사용합니다.
+    """
+    key = evicted_digest(evicted)
+    with _summary_lock:
+        if key in _summary_cache:
+            _summary_cache.move_to_end(key)
+            return _summary_cache[key]
+
+    transcript = '\n'.join(
+        f"{m['role']}: {' '.join(b['text'] for b in m['content'] if 'text' in b)}" for m in evicted
+    )
+    response = get_client('bedrock-runtime').converse(
+        modelId=get_settings().generation_model_id,
+        messages=[{
+            'role': 'user',
+            'content': [
+                {'text': transcript},
+                {'text': 'Summarize the conversation above in under 100 words, keeping facts the user may refer back to.'},
+            ],
+        }],
+        inferenceConfig={'maxTokens': 300, 'temperature': 0},
+    )
+    summary = response['output']['message']['content'][0]['text']
+
+    with _summary_lock:
+        _summary_cache[key] = summary
+        _summary_cache.move_to_end(key)
+        while len(_summary_cache) > SUMMARY_CACHE_SIZE:
+            _summary_cache.popitem(last=False)
+    return summary
+
+
+def build_response(status_code, body, trace=None):
     """
     [학습] API Gateway 프록시 통합 응답 포맷
+    trace를 넘기면 응답 JSON 직렬화 시간을 serialization 단계로 기록합니다.
     """
+    if trace is not None:
+        trace.set(status_code=status_code)
+    with trace.stage('serialization') if trace is not None else nullcontext():
+        payload = json.dumps(body, ensure_ascii=False)
+
     return {
         'statusCode': status_code,
         'headers': {
@@ -144,5 +563,5 @@ def build_response(status_code, body):
             'Access-Control-Allow-Headers': 'Content-Type',
             'Access-Control-Allow-Methods': 'OPTIONS,POST',
         },
-        'body': json.dumps(body, ensure_ascii=False),
+        'body': payload,
     }
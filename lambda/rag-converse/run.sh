@@ -0,0 +1,6 @@
+#!/bin/bash
+# [학습] Lambda Web Adapter 진입점
+# AWS_LAMBDA_EXEC_WRAPPER=/opt/bootstrap 설정 시 Lambda는 handler 대신 이 스크립트를 실행합니다.
+# 공통 레이어(/opt/python)와 함수 코드($LAMBDA_TASK_ROOT)를 import 경로에 추가한 뒤 스트리밍 서버를 띄웁니다.
+export PYTHONPATH="/opt/python:${LAMBDA_TASK_ROOT}:${PYTHONPATH}"
+exec python3 "${LAMBDA_TASK_ROOT}/stream_server.py"
@@ -0,0 +1,167 @@
+"""
+[학습] Converse 스트리밍 서버 - converse_stream() + Server-Sent Events(SSE)
+
+/converse(API Gateway)는 답변 생성이 끝날 때까지 기다렸다가 한 번에 응답하므로,
+사용자는 생성 시간 전체(수 초) 동안 빈 화면을 보게 됩니다.
+이 모듈은 converse_stream()으로 토큰이 생성되는 즉시 클라이언트에 전달하여
+첫 토큰까지의 시간(TTFT, time-to-first-token)을 1초 이내로 줄입니다.
+
+[학습] Python Lambda에서 응답 스트리밍을 하는 방법:
+Lambda 응답 스트리밍(InvokeWithResponseStream)은 Node.js 관리형 런타임만 기본 지원합니다.
+Python에서는 AWS Lambda Web Adapter(LWA) 레이어를 사용합니다:
+1. Lambda가 run.sh를 실행하면 이 HTTP 서버가 8080 포트에서 대기합니다.
+2. LWA가 Function URL 요청을 로컬 HTTP 요청으로 바꿔 이 서버에 전달합니다.
+3. AWS_LWA_INVOKE_MODE=response_stream이면 서버가 쓰는 청크를 그대로 클라이언트에 흘려보냅니다.
+
+SSE 이벤트 순서:
+- event: contexts → 검색된 컨텍스트와 session_id (생성 시작 전에 먼저 전송)
+- event: delta    → 생성된 텍스트 조각 (여러 번)
+- event: done     → 종료 이유, 토큰 사용량, 검색 후처리 결과, 입력 토큰 예산 사용 내역
+- event: error    → 오류 메시지
+
+워크숍 원본 코드: workshop/completed/streaming/streaming_lib.py
+로컬 실행: PYTHONPATH=../layers/rag-common/python python3 stream_server.py
+"""
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rag_common import get_client, get_settings
+from rag_common.tracing import Trace
+
+from index import INFERENCE_CONFIG, prepare_request, resolve_session, save_turn
+
+
+def format_sse(event, data):
+    """
+    [학습] SSE 형식: "event: <이름>\ndata: <JSON>\n\n"
+    빈 줄(\n\n)이 이벤트 하나의 끝을 의미합니다.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def iter_sse_events(body):
+    """
+    [학습] 요청 body를 받아 SSE 문자열을 차례로 만들어내는 제너레이터
+    retrieve()가 끝나면 컨텍스트를 먼저 보내고, converse_stream()의 contentBlockDelta마다 delta를 보냅니다.
+
+    [학습] 스트리밍에서는 전체 시간보다 첫 토큰까지 시간(ttft)이 체감 지연을 결정하므로 따로 기록하고,
+    스트림이 끝나면(오류 포함) EMF 추적 로그 한 줄을 남깁니다.
+    """
+    query = body.get('query', '')
+    if not query:
+        yield format_sse('error', {'error': 'query 파라미터가 필요합니다.'})
+        return
+
+    timer = Trace('rag-converse-stream')
+    started = time.perf_counter()
+    try:
+        # [학습] /converse와 같은 병렬 준비 파이프라인(검색 + 가드레일 + 이력 변환)을 사용합니다.
+        # 세션 모드(session_id)와 이전 방식(conversation_history) 모두 /converse와 동일하게 처리합니다.
+        conversation_history, session_id = resolve_session(body)
+        timer.set(mode='session' if session_id else 'single')
+        prepared = prepare_request(query, conversation_history, timer, session_id)
+
+        if prepared['blocked']:
+            timer.set(guardrail='INTERVENED')
+            yield format_sse('contexts', {'contexts': [], 'session_id': session_id})
+            yield format_sse('delta', {'text': prepared['blocked']})
+            yield format_sse('done', {'stop_reason': 'guardrail_intervened', 'timings': timer.as_dict()})
+            return
+
+        yield format_sse('contexts', {'contexts': prepared['contexts'], 'session_id': session_id})
+
+        # [학습] converse_stream() API 호출
+        # converse()와 요청 형식은 같지만, 응답의 'stream'이 이벤트를 하나씩 돌려주는 이터레이터입니다.
+        response = get_client('bedrock-runtime').converse_stream(
+            modelId=get_settings().generation_model_id,
+            messages=prepared['messages'],
+            inferenceConfig=INFERENCE_CONFIG,
+        )
+
+        stop_reason = None
+        answer_parts = []
+        for event in response.get('stream'):
+            if 'contentBlockDelta' in event:
+                text = event['contentBlockDelta']['delta'].get('text', '')
+                if text:
+                    if not answer_parts:
+                        timer.merge_timings({'ttft': (time.perf_counter() - started) * 1000})
+                    answer_parts.append(text)
+                    yield format_sse('delta', {'text': text})
+            elif 'messageStop' in event:
+                stop_reason = event['messageStop'].get('stopReason')
+                # [학습] 답변이 끝나면 done 이벤트 전에 세션 이력을 저장합니다.
+                if session_id:
+                    with timer.stage('session_save'):
+                        save_turn(session_id, prepared['history'], query, ''.join(answer_parts))
+            elif 'metadata' in event:
+                # [학습] metadata 이벤트는 스트림 마지막에 토큰 사용량(usage)과 모델 지연(latencyMs)을 알려줍니다.
+                usage = event['metadata'].get('usage', {})
+                timer.add_usage(usage)
+                latency_ms = event['metadata'].get('metrics', {}).get('latencyMs')
+                if latency_ms is not None:
+                    timer.merge_timings({'model_latency': latency_ms})
+                yield format_sse('done', {
+                    'stop_reason': stop_reason,
+                    'usage': usage,
+                    'retrieval': prepared['retrieval'],
+                    'token_budget': prepared['token_budget'],
+                    'timings': timer.as_dict(),
+                })
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        timer.set(error=str(e))
+        yield format_sse('error', {'error': str(e)})
+
+    finally:
+        timer.merge_timings({'total': (time.perf_counter() - started) * 1000})
+        timer.emit()
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    """
+    [학습] HTTP/1.1 chunked 전송으로 SSE를 보내는 요청 핸들러
+    Content-Length 없이 청크 단위로 쓰고 flush()하면 LWA가 즉시 클라이언트로 전달합니다.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        # [학습] LWA 준비 상태 확인(readiness check)용 엔드포인트
+        self._send_plain(200, b'ok')
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_plain(400, b'invalid JSON body')
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        for chunk in iter_sse_events(body):
+            data = chunk.encode('utf-8')
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _send_plain(self, status_code, data):
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', '8080'))
+    print(f"Converse stream server listening on :{port}")
+    ThreadingHTTPServer(('0.0.0.0', port), StreamHandler).serve_forever()
@@ -14,84 +14,232 @@
 환경변수:
 - KNOWLEDGE_BASE_ID: Bedrock Knowledge Base ID
 - MODEL_ARN: 응답 생성에 사용할 LLM 모델 ARN
+- DATA_SOURCE_ID: (선택) 최신 ingestion job ID를 조회하여 답변 캐시를 무효화할 데이터 소스 ID
+- ANSWER_CACHE_BACKEND: 답변 캐시 구현 (memory | none, 기본 memory)
+- ANSWER_CACHE_MAX_ENTRIES / ANSWER_CACHE_TTL_SECONDS: 캐시 최대 항목 수 / 항목 유효 시간(초)
+- ANSWER_CACHE_SIMILARITY_THRESHOLD: 의미 일치 임계값 (0이면 정확 일치만 사용)
+- BATCH_MAX_ITEMS / BATCH_MAX_CONCURRENCY: 배치 모드 최대 질문 수 / 동시 실행 수
+- TRACE_NAMESPACE / LOG_EVENTS / EVENT_LOG_SAMPLE_RATE: EMF 추적 로그 네임스페이스, 이벤트 덤프 opt-in/샘플링
+
+공통 코드: lambda/layers/rag-common (Lambda Layer로 배포되는 rag_common 패키지)
 """
 import json
-import os
-import boto3
+from contextlib import nullcontext
+
+from rag_common import get_client, get_settings, prewarm
+from rag_common.answer_cache import create_answer_cache, normalize_query
+from rag_common.batch import batch_results, run_batch
+from rag_common.embeddings import embed_text
+from rag_common.kb_status import get_kb_readiness
+from rag_common.tracing import Trace, log_event
 
 # [학습] bedrock-agent-runtime 클라이언트는 Knowledge Base 관련 API를 제공합니다.
 # bedrock-runtime(모델 직접 호출)과는 다른 서비스 엔드포인트입니다.
-bedrock_agent_runtime = boto3.client('bedrock-agent-runtime')
+# 클라이언트 생성과 환경변수 파싱은 공통 레이어(rag_common)가 한 번만 수행하고 캐시합니다.
+prewarm('bedrock-agent-runtime')
 
-# [학습] 환경변수로 설정값을 주입받아 하드코딩을 방지합니다.
-# CDK에서 Lambda 생성 시 environment 속성으로 전달됩니다.
-KNOWLEDGE_BASE_ID = os.environ.get('KNOWLEDGE_BASE_ID', '')
-MODEL_ARN = os.environ.get('MODEL_ARN', '')
+# [학습] 컨테이너 수명 동안 유지되는 답변 캐시 (get_answer_cache()에서 지연 생성)
+_answer_cache = None
 
 
 def handler(event, context):
     """
     [학습] API Gateway 프록시 통합 핸들러
     API Gateway에서 POST 요청을 받아 처리합니다.
-    요청 body: {"query": "사용자 질문"}
+    요청 body: {"query": "사용자 질문", "use_cache": true}
+    배치 모드: {"queries": ["질문1", "질문2", ...], "use_cache": true}
+
+    [학습] 요청마다 단계별 소요 시간(캐시 조회, retrieve_and_generate, 직렬화, 전체)을
+    EMF 로그 한 줄로 남깁니다 (rag_common/tracing.py).
     """
-    print(f"Event: {json.dumps(event)}")
+    trace = Trace('rag-query', context)
+    log_event(event)
+    try:
+        with trace.stage('total'):
+            return handle_request(event, context, trace)
+    finally:
+        trace.emit()
 
+
+def handle_request(event, context, trace):
     try:
-        body = json.loads(event.get('body', '{}'))
-        query = body.get('query', '')
+        with trace.stage('serialization'):
+            body = json.loads(event.get('body', '{}'))
+        use_cache = body.get('use_cache', True)
+
+        if 'queries' in body:
+            return handle_batch(body['queries'], use_cache, context, trace)
 
+        query = body.get('query', '')
         if not query:
-            return build_response(400, {'error': 'query 파라미터가 필요합니다.'})
-
-        # [학습] retrieve_and_generate() API 호출
-        # 이 API는 한 번의 호출로 다음을 수행합니다:
-        # 1. Knowledge Base에서 질문과 관련된 문서 청크를 벡터 검색
-        # 2. 검색된 컨텍스트와 질문을 LLM에 전달
-        # 3. LLM이 컨텍스트를 기반으로 답변 생성
-        # 4. 답변과 함께 인용(citation) 정보 반환
-        response = bedrock_agent_runtime.retrieve_and_generate(
-            input={'text': query},
-            retrieveAndGenerateConfiguration={
-                'type': 'KNOWLEDGE_BASE',
-                'knowledgeBaseConfiguration': {
-                    'knowledgeBaseId': KNOWLEDGE_BASE_ID,
-                    'modelArn': MODEL_ARN,
-                },
-            },
-        )
+            return build_response(400, {'error': 'query 파라미터가 필요합니다.'}, trace)
 
-        # [학습] 응답에서 답변 텍스트 추출
-        answer = response.get('output', {}).get('text', '')
-
-        # [학습] 인용(citations) 추출
-        # 인용은 답변이 어떤 원본 문서를 참조했는지 보여줍니다.
-        # RAG의 핵심 가치 중 하나는 답변의 출처를 추적할 수 있다는 것입니다.
-        citations = []
-        for citation in response.get('citations', []):
-            for ref in citation.get('retrievedReferences', []):
-                citations.append({
-                    'text': ref.get('content', {}).get('text', ''),
-                    'location': ref.get('location', {}),
-                })
-
-        return build_response(200, {
-            'answer': answer,
-            'citations': citations,
-        })
+        trace.set(mode='single')
+        cache, kb_ready = refresh_answer_cache(trace)
+        result = answer_query(query, use_cache, cache, trace, store=kb_ready)
+        trace.set(cache_hit=result['cache']['hit'])
+        return build_response(200, result, trace)
 
     except Exception as e:
         print(f"Error: {str(e)}")
-        return build_response(500, {'error': str(e)})
+        trace.set(error=str(e))
+        return build_response(500, {'error': str(e)}, trace)
+
+
+def handle_batch(queries, use_cache, context, trace):
+    """
+    [학습] 배치 모드: 질문 목록을 한 번의 호출에서 중복 제거 후 제한된 동시성으로 처리합니다.
+    정규화된 질문이 같으면(대소문자, 공백, 끝 문장부호 차이) 한 번만 생성하고 결과를 공유합니다.
+    """
+    settings = get_settings()
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q for q in queries):
+        return build_response(400, {'error': 'queries는 비어 있지 않은 질문 문자열 목록이어야 합니다.'}, trace)
+    if len(queries) > settings.batch_max_items:
+        return build_response(400, {'error': f'queries는 최대 {settings.batch_max_items}개까지 보낼 수 있습니다.'}, trace)
+
+    trace.set(mode='batch')
+    cache, kb_ready = refresh_answer_cache(trace)
+    outcomes, stats = run_batch(
+        queries,
+        lambda query: answer_query(query, use_cache, cache, trace, store=kb_ready),
+        key_fn=normalize_query,
+        max_concurrency=settings.batch_max_concurrency,
+        remaining_ms_fn=getattr(context, 'get_remaining_time_in_millis', None),
+        budget_ms=settings.batch_time_budget_ms,
+        read_timeout=settings.batch_read_timeout,
+        max_attempts=settings.batch_max_attempts,
+        # retrieve_and_generate + (의미 일치 캐시를 켜면) 질문 임베딩
+        calls_per_item=1 + (1 if settings.answer_cache_similarity_threshold > 0 else 0),
+    )
+    trace.count('batch_items', stats['items'])
+    trace.count('batch_failed', stats['failed'])
+    return build_response(200, {'results': batch_results(queries, outcomes), 'batch': stats}, trace)
+
+
+def refresh_answer_cache(trace):
+    """
+    [학습] KB 문서 버전(generation)이 바뀌었다면(문서 갱신) 캐시를 먼저 비운 뒤
+    (캐시, 수집 완료 여부)를 반환합니다.
+    수집이 진행 중이면 일부 문서만 색인된 상태의 답변이 캐시에 남지 않도록 새 답변을 저장하지 않고,
+    수집이 끝난 뒤(ready)에 새 generation으로 캐시를 다시 채웁니다.
+    """
+    cache = get_answer_cache()
+    readiness = get_kb_readiness(get_settings().kb_status_ttl_seconds)
+    if readiness is None:
+        return cache, True
+    trace.set(kb_ready=readiness['ready'])
+    if readiness['ready']:
+        cache.set_generation(readiness['generation'])
+    return cache, readiness['ready']
+
+
+def answer_query(query, use_cache, cache, trace, store=True):
+    """
+    [학습] 답변 캐시 조회 → (미스일 때) retrieve_and_generate() → 캐시 저장
+    store=False(KB 수집 진행 중)면 캐시 조회만 하고 새 답변은 저장하지 않습니다.
+    배치 모드에서는 여러 스레드가 같은 trace에 기록하므로 단계 시간은 항목별 합계가 됩니다.
+    """
+    with trace.stage('cache_lookup'):
+        cached, match_type, embedding = cache.get(query) if use_cache else (None, None, None)
+    if cached is not None:
+        trace.count('cache_hits')
+        return dict(cached, cache=cache_info(cache, True, match_type))
+
+    with trace.stage('retrieve_and_generate'):
+        result = retrieve_and_generate(query)
+    if use_cache and store:
+        cache.put(query, result, embedding=embedding)
+
+    return dict(result, cache=cache_info(cache, False, None))
 
 
-def build_response(status_code, body):
+def retrieve_and_generate(query):
+    """
+    [학습] retrieve_and_generate() API 호출
+    이 API는 한 번의 호출로 다음을 수행합니다:
+    1. Knowledge Base에서 질문과 관련된 문서 청크를 벡터 검색
+    2. 검색된 컨텍스트와 질문을 LLM에 전달
+    3. LLM이 컨텍스트를 기반으로 답변 생성
+    4. 답변과 함께 인용(citation) 정보 반환
+    """
+    # [학습] 환경변수로 설정값을 주입받아 하드코딩을 방지합니다.
+    # CDK에서 Lambda 생성 시 environment 속성으로 전달되며, get_settings()가 최초 1회만 파싱합니다.
+    settings = get_settings()
+    response = get_client('bedrock-agent-runtime').retrieve_and_generate(
+        input={'text': query},
+        retrieveAndGenerateConfiguration={
+            'type': 'KNOWLEDGE_BASE',
+            'knowledgeBaseConfiguration': {
+                'knowledgeBaseId': settings.knowledge_base_id,
+                'modelArn': settings.model_arn,
+            },
+        },
+    )
+
+    # [학습] 응답에서 답변 텍스트 추출
+    answer = response.get('output', {}).get('text', '')
+
+    # [학습] 인용(citations) 추출
+    # 인용은 답변이 어떤 원본 문서를 참조했는지 보여줍니다.
+    # RAG의 핵심 가치 중 하나는 답변의 출처를 추적할 수 있다는 것입니다.
+    citations = []
+    for citation in response.get('citations', []):
+        for ref in citation.get('retrievedReferences', []):
+            citations.append({
+                'text': ref.get('content', {}).get('text', ''),
+                'location': ref.get('location', {}),
+            })
+
+    return {
+        'answer': answer,
+        'citations': citations,
+    }
+
+
+def get_answer_cache():
+    """
+    [학습] 답변 캐시는 모듈 전역 변수에 두어 warm start 요청 간에 공유합니다.
+    의미 일치(similarity_threshold > 0)를 켜면 질문을 Titan V2 256차원으로 임베딩하여 비교합니다.
+    """
+    global _answer_cache
+    if _answer_cache is None:
+        settings = get_settings()
+        _answer_cache = create_answer_cache(
+            settings.answer_cache_backend,
+            max_entries=settings.answer_cache_max_entries,
+            ttl_seconds=settings.answer_cache_ttl_seconds,
+            similarity_threshold=settings.answer_cache_similarity_threshold,
+            embed_fn=embed_text,
+        )
+    return _answer_cache
+
+
+def cache_info(cache, hit, match_type):
+    """
+    [학습] 응답에 포함할 캐시 지표 (hit/miss, 일치 방식, 누적 통계)
+    """
+    return {
+        'hit': hit,
+        'match': match_type,
+        'generation': cache.generation,
+        'size': len(cache),
+        **cache.stats,
+    }
+
+
+def build_response(status_code, body, trace=None):
     """
     [학습] API Gateway 프록시 통합 응답 포맷
     API Gateway는 Lambda의 응답을 HTTP 응답으로 변환합니다.
     반드시 statusCode, headers, body 구조를 따라야 합니다.
     CORS 헤더를 포함해야 브라우저(Streamlit 등)에서 호출 가능합니다.
+    trace를 넘기면 응답 JSON 직렬화 시간을 serialization 단계로 기록합니다.
     """
+    if trace is not None:
+        trace.set(status_code=status_code)
+    with trace.stage('serialization') if trace is not None else nullcontext():
+        payload = json.dumps(body, ensure_ascii=False)
+
     return {
         'statusCode': status_code,
         'headers': {
@@ -100,5 +248,5 @@ def build_response(status_code, body):
             'Access-Control-Allow-Headers': 'Content-Type',
             'Access-Control-Allow-Methods': 'OPTIONS,POST',
         },
-        'body': json.dumps(body, ensure_ascii=False),
+        'body': payload,
     }
@@ -11,6 +11,22 @@
 CDK 배포 시 자동으로 초기 동기화를 실행하여,
 사용자가 수동으로 AWS 콘솔에서 Sync를 클릭하지 않아도 됩니다.
 
+[학습] 매니페스트 기반 증분 동기화 (manifest.py):
+문서 버킷을 스캔한 결과를 마지막 동기화 매니페스트와 비교하여 동기화 방식을 고릅니다.
+- unchanged: 바뀐 문서가 없으면 ingestion job을 시작하지 않고 바로 반환합니다 (수 초).
+- direct: 바뀐 문서가 SYNC_DIRECT_MAX_DOCUMENTS 이하면 해당 문서만
+  ingest_knowledge_base_documents()로 수집하고, 삭제된 문서는 delete_knowledge_base_documents()로 제거합니다.
+- full: 첫 동기화이거나 변경이 많으면 기존처럼 start_ingestion_job()으로 데이터 소스 전체를 동기화합니다.
+
+[학습] 수집 진행 추적 (tracker.py):
+수집을 시작한 뒤 get_ingestion_job()(direct는 get_knowledge_base_documents())을 지수 백오프로 조회하여
+스캔/색인/실패 문서 수와 docs/sec를 상태 문서(sync/status.json)에 기록합니다.
+매니페스트는 수집이 COMPLETE로 끝난 뒤에만 저장되므로, 실패한 수집은 다음 배포에서 다시 시도됩니다.
+Lambda 실행 시간 안에 끝나지 않으면 진행 중 상태만 기록하고 반환하며,
+cr.Provider가 is_complete()를 주기적으로 호출해 끝날 때까지 이어서 확인합니다 (재개 가능한 단계).
+쿼리 Lambda는 이 상태 문서의 ready 값을 보고 수집이 COMPLETE로 끝난 뒤에만 답변 캐시를 채웁니다.
+FAILED/STOPPED로 끝난 수집은 state=failed, ready=false로 기록됩니다.
+
 [학습] cr.Provider와 CloudFormation 응답 패턴:
 CDK의 cr.Provider는 "framework Lambda"가 CloudFormation 이벤트를 수신하고,
 이 사용자 Lambda를 동기적으로 호출(invoke)합니다.
@@ -21,17 +37,45 @@ CloudFormation 응답(ResponseURL에 PUT)은 framework Lambda가 처리하므로
 환경변수:
 - KNOWLEDGE_BASE_ID: 동기화할 Knowledge Base ID
 - DATA_SOURCE_ID: 동기화할 데이터 소스 ID
+- DOCUMENT_BUCKET_NAME: 문서 버킷 이름 (DOCUMENT_PREFIX로 하위 경로만 지정 가능)
+- SYNC_STATE_BUCKET: 매니페스트를 저장할 버킷 (미설정이면 매번 전체 동기화)
+- SYNC_MANIFEST_KEY: 매니페스트 객체 키 (기본값 sync/manifest.json)
+- SYNC_DIRECT_MAX_DOCUMENTS: 문서 단위 수집을 사용할 최대 변경 문서 수 (기본값 50)
+- SYNC_STATUS_KEY: 수집 상태 문서 객체 키 (기본값 sync/status.json)
+- SYNC_WAIT_SECONDS: 한 번의 호출에서 수집 완료를 기다리는 최대 시간 (기본값 240)
+- LOCAL_S3_ROOT: (선택) 로컬 디렉터리를 S3 대신 사용 (로컬 실행/테스트용)
+- LOG_EVENTS: (선택) true면 CloudFormation 이벤트 전체를 로그에 출력
+
+공통 코드: lambda/layers/rag-common (Lambda Layer로 배포되는 rag_common 패키지)
 """
+import hashlib
 import json
-import os
-import boto3
+import time
+
+from rag_common import get_client, get_settings
+from rag_common.tracing import Trace, log_event
+
+from manifest import (
+    METADATA_SUFFIX,
+    LocalS3Client,
+    diff_documents,
+    load_manifest,
+    pending_manifest_key,
+    promote_manifest,
+    save_manifest,
+    scan_documents,
+)
+from tracker import documents_check, ingestion_job_check, load_status, poll_with_backoff, save_status
 
 # [학습] bedrock-agent 클라이언트는 Knowledge Base 관리 API를 제공합니다.
 # bedrock-agent-runtime(검색/생성)과는 달리 관리 작업(생성, 삭제, 동기화)에 사용됩니다.
-bedrock_agent = boto3.client('bedrock-agent')
+# 이 Lambda는 배포 시에만 드물게 호출되므로 prewarm 없이 필요할 때 생성합니다.
 
-KNOWLEDGE_BASE_ID = os.environ.get('KNOWLEDGE_BASE_ID', '')
-DATA_SOURCE_ID = os.environ.get('DATA_SOURCE_ID', '')
+# [학습] ingest/delete_knowledge_base_documents()는 요청당 최대 10개 문서를 받습니다.
+DIRECT_BATCH_SIZE = 10
+
+# [학습] 남은 실행 시간에서 이만큼은 상태 기록과 반환을 위해 남겨 둡니다.
+DEADLINE_MARGIN_SECONDS = 15
 
 
 def handler(event, context):
@@ -48,32 +92,315 @@ def handler(event, context):
     - Data: CloudFormation 출력으로 사용할 키-값 쌍
     CloudFormation 응답은 framework Lambda가 자동으로 전송합니다.
     """
-    print(f"Event: {json.dumps(event)}")
+    trace = Trace('sync-knowledge-base', context)
+    log_event(event)
+    try:
+        with trace.stage('total'):
+            return handle_request(event, context, trace)
+    finally:
+        trace.emit()
+
 
+def handle_request(event, context, trace):
+    settings = get_settings()
     request_type = event.get('RequestType', '')
+    trace.set(request_type=request_type)
 
     if request_type in ('Create', 'Update'):
-        # [학습] start_ingestion_job() API 호출
-        # 이 API는 비동기로 데이터 수집 작업을 시작합니다.
-        # S3의 문서를 읽어 → 청킹 → 임베딩 → 벡터 저장 과정을 수행합니다.
-        response = bedrock_agent.start_ingestion_job(
-            knowledgeBaseId=KNOWLEDGE_BASE_ID,
-            dataSourceId=DATA_SOURCE_ID,
-        )
-        ingestion_job_id = response.get('ingestionJob', {}).get('ingestionJobId', '')
-        print(f"Started ingestion job: {ingestion_job_id}")
+        if settings.sync_state_bucket and settings.document_bucket_name:
+            s3 = get_s3_client(settings)
+            data, status = sync_documents(settings, trace, s3)
+            if status is not None:
+                status = track_ingestion(settings, trace, s3, status, poll_deadline(context, settings))
+                data.update(readiness_data(status))
+        else:
+            # 매니페스트 저장 위치가 없으면 비교할 기준이 없으므로 매번 전체 동기화합니다.
+            data = {'SyncMode': 'full', 'IngestionJobId': start_ingestion_job(settings, trace)}
 
         # [학습] cr.Provider에 결과를 dict로 반환합니다.
         # framework Lambda가 이 값을 CloudFormation에 보고합니다.
         return {
-            'PhysicalResourceId': f'sync-kb-{KNOWLEDGE_BASE_ID}',
-            'Data': {
-                'IngestionJobId': ingestion_job_id,
-            },
+            'PhysicalResourceId': f'sync-kb-{settings.knowledge_base_id}',
+            'Data': data,
         }
     else:
         # Delete 이벤트: 별도 정리 작업 불필요
         print(f"RequestType={request_type}, skipping.")
         return {
-            'PhysicalResourceId': f'sync-kb-{KNOWLEDGE_BASE_ID}',
+            'PhysicalResourceId': f'sync-kb-{settings.knowledge_base_id}',
+        }
+
+
+def is_complete(event, context):
+    """
+    [학습] cr.Provider isComplete 핸들러 - 재개 가능한 수집 완료 확인 단계
+    onEvent(handler)가 실행 시간 안에 수집 완료를 확인하지 못했으면 cr.Provider가 이 함수를
+    queryInterval마다 다시 호출합니다. 상태 문서에서 추적 정보를 읽어 이어서 폴링하고,
+    IsComplete=True를 반환하면 CloudFormation 배포가 다음 단계로 진행됩니다.
+    """
+    trace = Trace('sync-knowledge-base', context)
+    trace.set(request_type='IsComplete')
+    try:
+        with trace.stage('total'):
+            settings = get_settings()
+            if event.get('RequestType') == 'Delete' or not settings.sync_state_bucket:
+                return {'IsComplete': True}
+
+            s3 = get_s3_client(settings)
+            status = load_status(s3, settings.sync_state_bucket, settings.sync_status_key)
+            if status is None:
+                return {'IsComplete': True}
+            if ingestion_state(status) == 'in_progress':
+                status = track_ingestion(settings, trace, s3, status, poll_deadline(context, settings))
+            return {'IsComplete': ingestion_state(status) != 'in_progress', 'Data': readiness_data(status)}
+    finally:
+        trace.emit()
+
+
+def get_s3_client(settings):
+    """
+    [학습] LOCAL_S3_ROOT가 설정되면 로컬 디렉터리 기반 대체 구현을 사용합니다 (로컬 실행/테스트용).
+    """
+    if settings.local_s3_root:
+        return LocalS3Client(settings.local_s3_root)
+    return get_client('s3')
+
+
+def sync_documents(settings, trace, s3):
+    """
+    [학습] 매니페스트를 비교해 unchanged / direct / full 중 하나로 동기화하고,
+    현재 문서 상태는 대기 매니페스트로 저장하고, 수집이 COMPLETE가 되면 track_ingestion()이 기준 매니페스트로 옮깁니다.
+    반환값: (CloudFormation Data, 추적할 수집 상태 또는 None(unchanged))
+    CloudFormation Data 값은 문자열이어야 하므로 숫자도 str()로 변환합니다.
+    """
+    with trace.stage('scan_documents'):
+        current = scan_documents(s3, settings.document_bucket_name, settings.document_prefix)
+    with trace.stage('load_manifest'):
+        previous = load_manifest(s3, settings.sync_state_bucket, settings.sync_manifest_key,
+                                 settings.knowledge_base_id, settings.data_source_id)
+
+    if previous is None:
+        mode = 'full'
+        added, modified, removed = sorted(current), [], []
+    else:
+        added, modified, removed = diff_documents(previous['documents'], current)
+        changed = len(added) + len(modified) + len(removed)
+        if changed == 0:
+            mode = 'unchanged'
+        elif changed <= settings.sync_direct_max_documents:
+            mode = 'direct'
+        else:
+            mode = 'full'
+
+    trace.set(sync_mode=mode)
+    trace.count('documents', len(current))
+    trace.count('documents_added', len(added))
+    trace.count('documents_modified', len(modified))
+    trace.count('documents_removed', len(removed))
+    print(f"Sync mode={mode}: {len(current)} documents, "
+          f"{len(added)} added, {len(modified)} modified, {len(removed)} removed")
+
+    ingestion_job_id = previous.get('ingestion_job_id', '') if previous else ''
+    status = None
+    started_at = time.time()
+    if mode == 'full':
+        ingestion_job_id = start_ingestion_job(settings, trace)
+    elif mode == 'direct':
+        failed = ingest_changed_documents(settings, trace, current, added + modified, removed)
+        # 수집에 실패한 문서는 매니페스트에서 빼서 다음 동기화 때 다시 시도되게 합니다.
+        for key in failed:
+            current.pop(key, None)
+
+    if mode != 'unchanged':
+        # [학습] generation은 "지금 KB에 들어 있는 문서의 버전"입니다. 쿼리 Lambda의 답변 캐시가
+        # 이 값이 바뀌면 비워집니다. direct 동기화는 job ID가 없으므로 매니페스트 해시를 사용합니다.
+        # 시작 시각도 넣어, 실패한 문서만 다시 수집하는 동기화도 새 generation이 되게 합니다.
+        manifest_hash = hashlib.sha256(
+            json.dumps({'documents': current, 'started_at': started_at}, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:16]
+        generation = ingestion_job_id if mode == 'full' else f'manifest-{manifest_hash}'
+
+        # [학습] 수집은 아직 끝나지 않았으므로 대기 매니페스트로 저장하고,
+        # track_ingestion()이 COMPLETE를 확인한 뒤에 동기화 기준 매니페스트로 옮깁니다.
+        with trace.stage('save_manifest'):
+            save_manifest(s3, settings.sync_state_bucket, pending_manifest_key(settings.sync_manifest_key), current,
+                          sync_mode=mode, ingestion_job_id=ingestion_job_id, generation=generation,
+                          knowledge_base_id=settings.knowledge_base_id, data_source_id=settings.data_source_id)
+
+        status = {
+            'ready': False,
+            'state': 'in_progress',
+            'sync_mode': mode,
+            'ingestion_job_id': ingestion_job_id,
+            'generation': generation,
+            'started_at': started_at,
+            'documents': [key for key in added + modified if key in current] if mode == 'direct' else [],
+            'removed': len(removed) if mode == 'direct' else 0,
+            'statistics': {'status': 'STARTING'},
         }
+
+    return {
+        'SyncMode': mode,
+        'IngestionJobId': ingestion_job_id,
+        'DocumentsAdded': str(len(added)),
+        'DocumentsModified': str(len(modified)),
+        'DocumentsRemoved': str(len(removed)),
+    }, status
+
+
+def poll_deadline(context, settings):
+    """
+    [학습] 폴링을 멈출 시각 (time.monotonic 기준)
+    SYNC_WAIT_SECONDS와 Lambda 남은 실행 시간(여유분 제외) 중 짧은 쪽을 사용합니다.
+    """
+    budget = settings.sync_wait_seconds
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        budget = min(budget, context.get_remaining_time_in_millis() / 1000 - DEADLINE_MARGIN_SECONDS)
+    return time.monotonic() + max(0, budget)
+
+
+def track_ingestion(settings, trace, s3, status, deadline):
+    """
+    [학습] 수집이 끝날 때까지(또는 deadline까지) 지수 백오프로 상태를 조회하고 상태 문서에 기록합니다.
+    시작 시점에도 한 번 기록하여, 폴링 중 Lambda가 중단되어도 is_complete()가 이어서 확인할 수 있게 합니다.
+    """
+    agent = get_client('bedrock-agent')
+    if status['sync_mode'] == 'full':
+        check = ingestion_job_check(agent, settings.knowledge_base_id, settings.data_source_id,
+                                    status['ingestion_job_id'])
+    else:
+        check = documents_check(agent, settings.knowledge_base_id, settings.data_source_id,
+                                settings.document_bucket_name, status['documents'], status['started_at'],
+                                deleted=status['removed'])
+
+    save_status(s3, settings.sync_state_bucket, settings.sync_status_key, status)
+    with trace.stage('wait_for_ingestion'):
+        done, statistics, polls = poll_with_backoff(
+            check, deadline,
+            initial_delay=settings.sync_poll_initial_seconds,
+            max_delay=settings.sync_poll_max_seconds,
+        )
+
+    # [학습] FAILED/STOPPED는 최종 상태지만 ready가 아닙니다 (state='failed').
+    # 쿼리 Lambda가 실패한 수집 결과를 새 문서 버전으로 보고 답변 캐시를 채우지 않게 합니다.
+    if not done:
+        state = 'in_progress'
+    elif statistics['status'] == 'COMPLETE':
+        state = 'complete'
+        finish_manifest(settings, s3, status, statistics)
+    else:
+        state = 'failed'
+
+    status = dict(status, state=state, ready=state == 'complete', statistics=statistics)
+    status = save_status(s3, settings.sync_state_bucket, settings.sync_status_key, status)
+
+    trace.count('ingestion_polls', polls)
+    trace.count('documents_scanned', statistics['scanned'])
+    trace.count('documents_indexed', statistics['indexed'])
+    trace.count('documents_failed', statistics['failed'])
+    trace.set(ingestion_status=statistics['status'], ingestion_state=state, docs_per_sec=statistics['docs_per_sec'])
+    print(f"Ingestion {statistics['status']} (state={state}, {polls} polls): {statistics['scanned']} scanned, "
+          f"{statistics['indexed']} indexed, {statistics['deleted']} deleted, {statistics['failed']} failed, "
+          f"{statistics['docs_per_sec']} docs/sec over {statistics['seconds']}s")
+    return status
+
+
+def finish_manifest(settings, s3, status, statistics):
+    """
+    [학습] 수집이 COMPLETE로 끝나면 대기 매니페스트를 기준 매니페스트로 저장합니다.
+    - direct: 최종 상태가 실패인 문서는 빼고 저장하여 다음 동기화 때 다시 수집되게 합니다.
+    - full: 어떤 문서가 실패했는지 알 수 없으므로 실패한 문서가 있으면 이전 매니페스트를 유지합니다.
+      다음 배포에서 같은 변경분이 다시 동기화됩니다.
+    """
+    if status['sync_mode'] == 'full' and statistics['failed']:
+        print(f"{statistics['failed']} documents failed; keeping the previous manifest so they are retried")
+        return
+    promote_manifest(s3, settings.sync_state_bucket, settings.sync_manifest_key, status['generation'],
+                     drop=statistics.get('failed_documents', []))
+
+
+def ingestion_state(status):
+    """
+    [학습] in_progress / complete / failed. state가 없는 이전 형식의 상태 문서는 ready 값으로 판단합니다.
+    """
+    return status.get('state') or ('complete' if status.get('ready') else 'in_progress')
+
+
+def readiness_data(status):
+    """
+    [학습] 수집 결과를 CloudFormation Data(문자열 값) 형태로 변환합니다.
+    """
+    statistics = status.get('statistics', {})
+    return {
+        'Ready': str(status['ready']).lower(),
+        'State': ingestion_state(status),
+        'IngestionStatus': statistics.get('status', ''),
+        'Generation': status.get('generation', ''),
+        'DocumentsScanned': str(statistics.get('scanned', 0)),
+        'DocumentsIndexed': str(statistics.get('indexed', 0)),
+        'DocumentsFailed': str(statistics.get('failed', 0)),
+        'DocsPerSecond': str(statistics.get('docs_per_sec', 0.0)),
+    }
+
+
+def start_ingestion_job(settings, trace):
+    # [학습] start_ingestion_job() API 호출
+    # 이 API는 비동기로 데이터 수집 작업을 시작합니다.
+    # S3의 문서를 읽어 → 청킹 → 임베딩 → 벡터 저장 과정을 수행합니다.
+    with trace.stage('start_ingestion_job'):
+        response = get_client('bedrock-agent').start_ingestion_job(
+            knowledgeBaseId=settings.knowledge_base_id,
+            dataSourceId=settings.data_source_id,
+        )
+    ingestion_job_id = response.get('ingestionJob', {}).get('ingestionJobId', '')
+    print(f"Started ingestion job: {ingestion_job_id}")
+    return ingestion_job_id
+
+
+def ingest_changed_documents(settings, trace, documents, changed_keys, removed_keys):
+    """
+    [학습] 바뀐 문서만 Knowledge Base에 직접 수집하고 삭제된 문서를 제거합니다.
+    S3 데이터 소스의 문서는 S3 URI로 지정하며, 메타데이터 파일이 있으면 함께 넘겨 필터 값도 갱신합니다.
+    반환값: 즉시 FAILED 상태로 응답된 문서 키 목록
+    """
+    bucket = settings.document_bucket_name
+    agent = get_client('bedrock-agent')
+    failed = []
+
+    with trace.stage('ingest_documents'):
+        for start in range(0, len(changed_keys), DIRECT_BATCH_SIZE):
+            batch = changed_keys[start:start + DIRECT_BATCH_SIZE]
+            documents_payload = []
+            for key in batch:
+                document = {'content': {'dataSourceType': 'S3', 's3': {'s3Location': {'uri': f's3://{bucket}/{key}'}}}}
+                if documents[key]['metadata']:
+                    document['metadata'] = {
+                        'type': 'S3_LOCATION',
+                        's3Location': {'uri': f's3://{bucket}/{key}{METADATA_SUFFIX}'},
+                    }
+                documents_payload.append(document)
+
+            response = agent.ingest_knowledge_base_documents(
+                knowledgeBaseId=settings.knowledge_base_id,
+                dataSourceId=settings.data_source_id,
+                documents=documents_payload,
+            )
+            for detail in response.get('documentDetails', []):
+                if detail.get('status') == 'FAILED':
+                    uri = detail.get('identifier', {}).get('s3', {}).get('uri', '')
+                    print(f"Ingest failed for {uri}: {detail.get('statusReason', '')}")
+                    failed.append(uri[len(f's3://{bucket}/'):])
+
+    with trace.stage('delete_documents'):
+        for start in range(0, len(removed_keys), DIRECT_BATCH_SIZE):
+            agent.delete_knowledge_base_documents(
+                knowledgeBaseId=settings.knowledge_base_id,
+                dataSourceId=settings.data_source_id,
+                documentIdentifiers=[
+                    {'dataSourceType': 'S3', 's3': {'uri': f's3://{bucket}/{key}'}}
+                    for key in removed_keys[start:start + DIRECT_BATCH_SIZE]
+                ],
+            )
+
+    trace.count('ingest_requests_failed', len(failed))
+    return failed
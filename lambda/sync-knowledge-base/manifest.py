@@ -0,0 +1,195 @@
+"""
+[학습] 문서 매니페스트 - 마지막 동기화 이후 바뀐 문서만 골라내기
+
+매 배포마다 start_ingestion_job()을 실행하면 Bedrock이 버킷 전체를 다시 스캔합니다.
+문서가 하나도 바뀌지 않았어도 작업 시작 → 스캔 → 완료까지 수 분이 걸립니다.
+이 모듈은 문서 버킷의 현재 상태를 "매니페스트"(문서 키 → 해시)로 만들고,
+마지막으로 동기화한 매니페스트와 비교하여 추가/수정/삭제된 문서만 찾아냅니다.
+
+[학습] 해시로 S3 ETag를 사용합니다.
+ETag는 S3가 객체 내용으로 계산한 값(단일 파트 업로드는 MD5)이라 내용이 바뀌면 함께 바뀝니다.
+list_objects_v2() 응답에 들어 있으므로 문서를 하나도 다운로드하지 않고 비교할 수 있습니다.
+문서 옆의 메타데이터 파일(<문서>.metadata.json)이 바뀌어도 필터 값이 달라지므로 문서 해시에 포함합니다.
+
+매니페스트는 문서 버킷이 아니라 별도의 상태 버킷에 저장합니다.
+문서 버킷에 두면 Knowledge Base가 매니페스트 파일까지 문서로 수집하기 때문입니다.
+
+[학습] 매니페스트는 Knowledge Base ID와 데이터 소스 ID에 묶여 있습니다.
+임베딩 설정(모델, 차원) 변경 등으로 KB나 데이터 소스가 새로 만들어지면 새 KB는 비어 있으므로,
+ID가 다른 매니페스트는 무시하고 첫 동기화(전체 동기화)로 처리합니다.
+
+LocalS3Client는 로컬 디렉터리를 S3처럼 다루는 대체 구현입니다 (로컬 실행/테스트용).
+"""
+import hashlib
+import io
+import json
+import os
+import time
+
+from botocore.exceptions import ClientError
+
+MANIFEST_VERSION = 1
+METADATA_SUFFIX = '.metadata.json'
+
+
+class LocalS3Client:
+    """
+    [학습] 로컬 디렉터리 기반 S3 대체 구현 (root/<버킷>/<키> 파일)
+    이 모듈과 index.py가 사용하는 list_objects_v2 / get_object / put_object만 같은 형태로 흉내 냅니다.
+    ETag는 S3의 단일 파트 업로드와 같이 따옴표로 감싼 MD5입니다.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, *key.split('/'))
+
+    def list_objects_v2(self, Bucket, Prefix='', ContinuationToken=None, MaxKeys=1000):
+        bucket_dir = os.path.join(self.root, Bucket)
+        keys = []
+        for directory, _, files in os.walk(bucket_dir):
+            for name in files:
+                key = os.path.relpath(os.path.join(directory, name), bucket_dir).replace(os.sep, '/')
+                if key.startswith(Prefix):
+                    keys.append(key)
+        keys.sort()
+
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + MaxKeys]
+        contents = []
+        for key in page:
+            with open(self._path(Bucket, key), 'rb') as f:
+                body = f.read()
+            contents.append({'Key': key, 'ETag': f'"{hashlib.md5(body).hexdigest()}"', 'Size': len(body)})
+
+        response = {'Contents': contents, 'KeyCount': len(contents), 'IsTruncated': start + MaxKeys < len(keys)}
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = str(start + MaxKeys)
+        return response
+
+    def get_object(self, Bucket, Key):
+        try:
+            with open(self._path(Bucket, Key), 'rb') as f:
+                return {'Body': io.BytesIO(f.read())}
+        except FileNotFoundError:
+            raise ClientError({'Error': {'Code': 'NoSuchKey', 'Message': Key}}, 'GetObject')
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(Body.encode('utf-8') if isinstance(Body, str) else Body)
+        return {}
+
+
+def list_objects(s3, bucket, prefix=''):
+    """
+    [학습] list_objects_v2()는 한 번에 최대 1000개만 반환하므로 ContinuationToken으로 끝까지 이어 읽습니다.
+    """
+    kwargs = {'Bucket': bucket, 'Prefix': prefix}
+    while True:
+        response = s3.list_objects_v2(**kwargs)
+        yield from response.get('Contents', [])
+        if not response.get('IsTruncated'):
+            return
+        kwargs['ContinuationToken'] = response['NextContinuationToken']
+
+
+def scan_documents(s3, bucket, prefix=''):
+    """
+    [학습] 문서 버킷의 현재 상태를 {문서 키: {'hash': ..., 'metadata': 메타데이터 파일 유무}}로 반환합니다.
+    폴더 표시용 객체(키가 /로 끝남)는 건너뛰고, 메타데이터 파일은 해당 문서의 해시에 합칩니다.
+    """
+    etags = {}
+    sidecars = {}
+    for obj in list_objects(s3, bucket, prefix):
+        key = obj['Key']
+        if key.endswith('/'):
+            continue
+        if key.endswith(METADATA_SUFFIX):
+            sidecars[key[:-len(METADATA_SUFFIX)]] = obj['ETag']
+        else:
+            etags[key] = f"{obj['ETag']}:{obj.get('Size', 0)}"
+
+    documents = {}
+    for key, etag in etags.items():
+        digest = hashlib.sha256(etag.encode('utf-8'))
+        if key in sidecars:
+            digest.update(sidecars[key].encode('utf-8'))
+        documents[key] = {'hash': digest.hexdigest(), 'metadata': key in sidecars}
+    return documents
+
+
+def diff_documents(previous, current):
+    """
+    [학습] 두 매니페스트의 문서 목록을 비교하여 (추가, 수정, 삭제) 키 목록을 반환합니다.
+    """
+    added = sorted(key for key in current if key not in previous)
+    modified = sorted(key for key in current if key in previous and previous[key]['hash'] != current[key]['hash'])
+    removed = sorted(key for key in previous if key not in current)
+    return added, modified, removed
+
+
+def load_manifest(s3, bucket, key, knowledge_base_id=None, data_source_id=None):
+    """
+    [학습] 마지막으로 동기화한 매니페스트를 읽습니다. 아직 한 번도 동기화하지 않았으면 None입니다.
+    knowledge_base_id/data_source_id가 주어지면 매니페스트에 기록된 ID와 다를 때도 None입니다 (KB 교체).
+    """
+    try:
+        response = s3.get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        raise
+    manifest = json.loads(response['Body'].read())
+    if manifest.get('version') != MANIFEST_VERSION:
+        print(f"Ignoring manifest version {manifest.get('version')}; running a full sync")
+        return None
+    for field, expected in (('knowledge_base_id', knowledge_base_id), ('data_source_id', data_source_id)):
+        if expected is not None and manifest.get(field) != expected:
+            print(f"Ignoring manifest for {field}={manifest.get(field)} (now {expected}); running a full sync")
+            return None
+    return manifest
+
+
+def pending_manifest_key(key):
+    """
+    [학습] 수집이 끝나기 전의 매니페스트를 보관하는 키 (sync/manifest.json → sync/manifest.pending.json)
+    """
+    return key[:-len('.json')] + '.pending.json' if key.endswith('.json') else key + '.pending'
+
+
+def save_manifest(s3, bucket, key, documents, **fields):
+    """
+    [학습] 동기화 기준 매니페스트(key)는 수집이 성공(COMPLETE)한 뒤에만 저장합니다.
+    수집을 시작할 때는 pending_manifest_key(key)에 저장해 두었다가 promote_manifest()로 옮깁니다.
+    실패한 동기화는 이전 매니페스트가 남아 있으므로 다음 실행에서 같은 변경분으로 다시 시도됩니다.
+    fields에는 동기화 방식, ingestion job ID 같은 부가 정보를 함께 기록합니다.
+    """
+    manifest = dict(fields, version=MANIFEST_VERSION, synced_at=int(time.time()), documents=documents)
+    s3.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(manifest, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+        ContentType='application/json',
+    )
+    return manifest
+
+
+def promote_manifest(s3, bucket, key, generation, drop=()):
+    """
+    [학습] 수집이 끝난 뒤 대기 중인 매니페스트를 동기화 기준 매니페스트로 저장합니다.
+    drop에는 최종 상태가 실패인 문서 키를 넘깁니다. 매니페스트에서 빠진 문서는 다음 동기화 때 다시 수집됩니다.
+    generation이 다른 대기 매니페스트(다른 동기화에서 저장한 것)는 옮기지 않습니다.
+    반환값: 저장한 매니페스트 또는 None
+    """
+    pending = load_manifest(s3, bucket, pending_manifest_key(key))
+    if pending is None or pending.get('generation') != generation:
+        print(f"No pending manifest for generation {generation}; keeping the current manifest")
+        return None
+    drop = set(drop)
+    documents = {k: v for k, v in pending.pop('documents').items() if k not in drop}
+    for field in ('version', 'synced_at'):
+        pending.pop(field, None)
+    return save_manifest(s3, bucket, key, documents, **pending)
@@ -0,0 +1,156 @@
+"""
+[학습] 수집(ingestion) 진행 상황 추적 - 지수 백오프 폴링과 준비 상태(readiness) 기록
+
+start_ingestion_job()과 ingest_knowledge_base_documents()는 작업을 시작만 하고 바로 반환합니다.
+이 모듈은 작업이 끝날 때까지 상태를 조회하여 다음을 기록합니다:
+- 스캔/색인/삭제/실패 문서 수와 초당 처리 문서 수(docs/sec)
+- 준비 상태: 수집이 끝났는지(ready)와 문서 버전(generation)
+
+[학습] 지수 백오프(exponential backoff) 폴링:
+처음에는 짧은 간격(2초)으로 확인하고, 끝나지 않았으면 간격을 두 배씩 늘립니다(최대 30초).
+작은 변경은 몇 초 안에 끝나므로 빨리 확인하고, 긴 작업에서는 불필요한 API 호출을 줄입니다.
+Lambda 남은 실행 시간이 부족하면 폴링을 멈추고 진행 중 상태를 기록합니다.
+남은 확인은 cr.Provider의 isComplete 단계가 이어서 수행합니다 (index.is_complete).
+
+상태 문서(sync/status.json)는 상태 버킷에 저장되며, 쿼리 Lambda가 rag_common.kb_status로 읽습니다.
+"""
+import json
+import time
+
+from botocore.exceptions import ClientError
+
+from manifest import METADATA_SUFFIX
+
+# [학습] ingestion job 최종 상태 (이 상태가 되면 더 이상 바뀌지 않습니다)
+JOB_TERMINAL_STATUSES = ('COMPLETE', 'FAILED', 'STOPPED')
+
+# [학습] 문서 단위 수집의 진행 중 상태 (그 외 INDEXED, FAILED, IGNORED 등은 최종 상태)
+DOCUMENT_PENDING_STATUSES = ('STARTING', 'PENDING', 'IN_PROGRESS', 'DELETING', 'DELETE_IN_PROGRESS')
+DOCUMENT_FAILED_STATUSES = ('FAILED', 'METADATA_UPDATE_FAILED')
+
+# [학습] get_knowledge_base_documents()도 요청당 최대 10개 문서를 받습니다.
+DOCUMENT_BATCH_SIZE = 10
+
+
+def poll_with_backoff(check, deadline, initial_delay=2.0, max_delay=30.0, sleep=time.sleep, clock=time.monotonic):
+    """
+    [학습] check()가 (완료 여부, 값)을 반환할 때까지 지수 백오프로 반복 호출합니다.
+    deadline(clock 기준 시각)까지 끝나지 않으면 마지막 값을 (False, 값)으로 반환합니다.
+    """
+    delay = initial_delay
+    polls = 0
+    while True:
+        done, value = check()
+        polls += 1
+        if done:
+            return True, value, polls
+        remaining = deadline - clock()
+        if remaining <= 0:
+            return False, value, polls
+        sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
+
+
+def ingestion_job_check(agent, knowledge_base_id, data_source_id, ingestion_job_id):
+    def check():
+        job = agent.get_ingestion_job(
+            knowledgeBaseId=knowledge_base_id,
+            dataSourceId=data_source_id,
+            ingestionJobId=ingestion_job_id,
+        )['ingestionJob']
+        return job['status'] in JOB_TERMINAL_STATUSES, job_report(job)
+
+    return check
+
+
+def job_report(job):
+    """
+    [학습] ingestion job 응답 → 기록용 요약
+    docs/sec는 (색인 + 삭제 문서 수) / (updatedAt - startedAt)입니다.
+    """
+    stats = job.get('statistics', {})
+    indexed = stats.get('numberOfNewDocumentsIndexed', 0) + stats.get('numberOfModifiedDocumentsIndexed', 0)
+    deleted = stats.get('numberOfDocumentsDeleted', 0)
+    seconds = 0.0
+    if job.get('startedAt') and job.get('updatedAt'):
+        seconds = max(0.0, (job['updatedAt'] - job['startedAt']).total_seconds())
+    return {
+        'status': job['status'],
+        'scanned': stats.get('numberOfDocumentsScanned', 0),
+        'indexed': indexed,
+        'deleted': deleted,
+        'failed': stats.get('numberOfDocumentsFailed', 0),
+        'seconds': round(seconds, 1),
+        'docs_per_sec': round((indexed + deleted) / seconds, 2) if seconds > 0 else 0.0,
+        'failure_reasons': job.get('failureReasons', [])[:5],
+    }
+
+
+def documents_check(agent, knowledge_base_id, data_source_id, bucket, keys, started_at, deleted=0, clock=time.time):
+    """
+    [학습] 문서 단위 수집(direct)은 job ID가 없으므로 문서별 상태를 조회합니다.
+    메타데이터 파일은 별도 문서가 아니므로 조회 대상에서 제외합니다.
+    failed_documents에는 최종 상태가 실패인 문서 키가 들어가며, 매니페스트에서 빠집니다.
+    deleted는 delete_knowledge_base_documents()로 삭제 요청한 문서 수입니다.
+    """
+    keys = [key for key in keys if not key.endswith(METADATA_SUFFIX)]
+    prefix = f's3://{bucket}/'
+
+    def check():
+        statuses = {}
+        for start in range(0, len(keys), DOCUMENT_BATCH_SIZE):
+            response = agent.get_knowledge_base_documents(
+                knowledgeBaseId=knowledge_base_id,
+                dataSourceId=data_source_id,
+                documentIdentifiers=[
+                    {'dataSourceType': 'S3', 's3': {'uri': prefix + key}}
+                    for key in keys[start:start + DOCUMENT_BATCH_SIZE]
+                ],
+            )
+            for detail in response.get('documentDetails', []):
+                statuses[detail['identifier']['s3']['uri'][len(prefix):]] = detail['status']
+
+        pending = sum(1 for status in statuses.values() if status in DOCUMENT_PENDING_STATUSES)
+        failed_documents = sorted(key for key, status in statuses.items() if status in DOCUMENT_FAILED_STATUSES)
+        failed = len(failed_documents)
+        indexed = len(statuses) - pending - failed
+        seconds = max(0.0, clock() - started_at)
+        return pending == 0, {
+            'status': 'IN_PROGRESS' if pending else ('FAILED' if failed and not indexed else 'COMPLETE'),
+            'scanned': len(keys),
+            'indexed': indexed,
+            'deleted': deleted,
+            'failed': failed,
+            'seconds': round(seconds, 1),
+            'docs_per_sec': round((indexed + deleted) / seconds, 2) if seconds > 0 else 0.0,
+            'failure_reasons': [],
+            'failed_documents': failed_documents,
+        }
+
+    return check
+
+
+def load_status(s3, bucket, key):
+    try:
+        response = s3.get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        raise
+    return json.loads(response['Body'].read())
+
+
+def save_status(s3, bucket, key, status):
+    """
+    [학습] 상태 문서 저장. state는 in_progress / complete / failed이고,
+    ready는 수집이 COMPLETE로 끝났을 때(state=complete)만 True입니다.
+    FAILED/STOPPED는 state=failed, ready=False로 기록하며 원인은 statistics.failure_reasons로 확인합니다.
+    """
+    status = dict(status, checked_at=int(time.time()))
+    s3.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(status, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+        ContentType='application/json',
+    )
+    return status
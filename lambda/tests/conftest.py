@@ -0,0 +1,53 @@
+"""
+[학습] Lambda 코드 유닛 테스트 공통 설정
+
+rag_common 레이어와 동기화 Lambda 모듈은 배포 시 /opt/python, 함수 루트에 놓이므로
+로컬 테스트에서는 같은 경로를 sys.path에 추가합니다. (저장소 루트에서: python3 -m pytest lambda/tests)
+"""
+import importlib.util
+import os
+import sys
+
+import pytest
+from botocore.stub import Stubber
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in (
+    os.path.join(LAMBDA_DIR, 'layers', 'rag-common', 'python'),
+    os.path.join(LAMBDA_DIR, 'sync-knowledge-base'),
+):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+
+@pytest.fixture
+def load_lambda():
+    """
+    [학습] lambda/<이름>/index.py를 모듈로 읽습니다. 함수마다 파일 이름이 index.py로 같으므로
+    sys.modules에는 '<이름>_index'로 등록하지 않고 새 모듈 객체로 돌려줍니다.
+    """
+    def load(name):
+        path = os.path.join(LAMBDA_DIR, name, 'index.py')
+        spec = importlib.util.spec_from_file_location(name.replace('-', '_') + '_index', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    return load
+
+
+@pytest.fixture
+def agent():
+    """
+    [학습] 공통 레이어가 캐시한 bedrock-agent 클라이언트에 Stubber를 붙입니다.
+    앞뒤로 클라이언트 캐시를 비워 다른 테스트의 Stubber가 남지 않게 합니다.
+    """
+    from rag_common import clients, get_client
+
+    clients.reset()
+    with Stubber(get_client('bedrock-agent')) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+    clients.reset()
@@ -0,0 +1,38 @@
+"""
+[학습] 답변 캐시 테스트 - 정확 일치, 의미 일치, 임베딩 실패 시 캐시 미스 처리
+"""
+from rag_common.answer_cache import MemoryAnswerCache
+
+
+def fake_embed(text):
+    return [1.0, 0.0] if 'bedrock' in text else [0.0, 1.0]
+
+
+def test_exact_hit_ignores_case_and_trailing_punctuation():
+    cache = MemoryAnswerCache()
+    cache.put('What is Bedrock?', {'answer': 'A'})
+    value, match, _ = cache.get('what is  bedrock')
+    assert value == {'answer': 'A'}
+    assert match == 'exact'
+
+
+def test_semantic_hit_uses_embedding_similarity():
+    cache = MemoryAnswerCache(similarity_threshold=0.9, embed_fn=fake_embed)
+    cache.put('bedrock 소개', {'answer': 'A'}, embedding=fake_embed('bedrock'))
+    value, match, embedding = cache.get('bedrock 설명')
+    assert value == {'answer': 'A'}
+    assert match == 'semantic'
+    assert embedding == [1.0, 0.0]
+
+
+def test_embedding_failure_is_a_cache_miss():
+    def failing_embed(text):
+        raise RuntimeError('ThrottlingException')
+
+    cache = MemoryAnswerCache(similarity_threshold=0.9, embed_fn=failing_embed)
+    cache.put('bedrock 소개', {'answer': 'A'}, embedding=[1.0, 0.0])
+    assert cache.get('bedrock 설명') == (None, None, None)
+    assert cache.stats['misses'] == 1
+
+    cache.put('bedrock 설명', {'answer': 'B'})
+    assert cache.get('bedrock 설명')[:2] == ({'answer': 'B'}, 'exact')
@@ -0,0 +1,113 @@
+"""
+[학습] 배치 실행기 테스트 - 시간 예산과 배치 항목의 짧은 타임아웃 클라이언트
+"""
+import time
+
+import pytest
+from botocore.stub import Stubber
+
+from rag_common import clients, get_client
+from rag_common.batch import item_reserve_ms, run_batch
+from rag_common.clients import bind_client_scope, client_scope
+
+READ_TIMEOUT = 6.0
+MAX_ATTEMPTS = 1
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    clients.reset()
+    yield
+    clients.reset()
+
+
+def client_options(service_name):
+    config = get_client(service_name).meta.config
+    return config.read_timeout, config.retries['total_max_attempts']
+
+
+def test_reserve_covers_every_call_and_attempt():
+    # 기본 연결 타임아웃 2초: 3회 × 2번 시도 × (2 + 6)초 + 여유 1초
+    assert item_reserve_ms(6.0, 2, calls=3) == 3 * 2 * 8000 + 1000
+    assert item_reserve_ms(6.0, 1) == 8000 + 1000
+
+
+def test_items_past_the_budget_are_skipped():
+    outcomes, stats = run_batch(list(range(6)), lambda item: time.sleep(0.2) or item, max_concurrency=2,
+                                budget_ms=500, reserve_ms=300)
+
+    assert [o['status'] for o in outcomes[:2]] == ['ok', 'ok']
+    assert stats['skipped'] >= 1 and outcomes[-1]['status'] == 'skipped'
+
+
+def test_scope_reaches_pool_threads_only_when_bound():
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=1) as executor, client_scope(READ_TIMEOUT, MAX_ATTEMPTS):
+        inside = client_options('s3')
+        unbound = executor.submit(client_options, 's3').result()
+        bound = executor.submit(bind_client_scope(client_options), 's3').result()
+
+    assert inside == bound == (READ_TIMEOUT, MAX_ATTEMPTS)
+    assert unbound != bound
+
+
+def test_converse_batch_item_uses_batch_clients_in_every_thread(load_lambda, monkeypatch):
+    """
+    [학습] prepare_request()는 검색/가드레일을 스레드 풀에서 실행합니다.
+    배치 클라이언트(read_timeout=6, max_attempts=1)에만 Stubber 응답을 등록하므로,
+    어느 호출이든 기본 클라이언트를 쓰면 실제 네트워크 호출로 이어져 실패합니다.
+    """
+    monkeypatch.setenv('KNOWLEDGE_BASE_ID', 'KB12345678')
+    monkeypatch.setenv('GENERATION_MODEL_ID', 'model-1')
+    monkeypatch.setenv('GUARDRAIL_ID', 'guardrail-1')
+    clients.reset()
+    converse = load_lambda('rag-converse')
+
+    seen = {}
+    original_retrieve, original_guardrail = converse.retrieve_contexts, converse.check_guardrail
+
+    def retrieve_contexts(query, number_of_results=4):
+        seen['retrieve'] = client_options('bedrock-agent-runtime')
+        return original_retrieve(query, number_of_results)
+
+    def check_guardrail(query):
+        seen['guardrail'] = client_options('bedrock-runtime')
+        return original_guardrail(query)
+
+    monkeypatch.setattr(converse, 'retrieve_contexts', retrieve_contexts)
+    monkeypatch.setattr(converse, 'check_guardrail', check_guardrail)
+
+    agent_runtime = Stubber(get_client('bedrock-agent-runtime', READ_TIMEOUT, MAX_ATTEMPTS))
+    agent_runtime.add_response('retrieve', {'retrievalResults': [{
+        'content': {'text': 'Amazon Bedrock is a fully managed service.'},
+        'score': 0.9,
+        'location': {'type': 'S3', 's3Location': {'uri': 's3://docs/bedrock.txt'}},
+    }]})
+    runtime = Stubber(get_client('bedrock-runtime', READ_TIMEOUT, MAX_ATTEMPTS))
+    runtime.add_response('apply_guardrail', {
+        'usage': {'topicPolicyUnits': 0, 'contentPolicyUnits': 1, 'wordPolicyUnits': 0,
+                  'sensitiveInformationPolicyUnits': 0, 'sensitiveInformationPolicyFreeUnits': 0,
+                  'contextualGroundingPolicyUnits': 0},
+        'action': 'NONE',
+        'outputs': [],
+        'assessments': [],
+    })
+    runtime.add_response('converse', {
+        'output': {'message': {'role': 'assistant', 'content': [{'text': 'stub answer'}]}},
+        'stopReason': 'end_turn',
+        'usage': {'inputTokens': 10, 'outputTokens': 5, 'totalTokens': 15},
+        'metrics': {'latencyMs': 1},
+    })
+
+    with agent_runtime, runtime:
+        outcomes, _ = run_batch([{'query': 'What is Amazon Bedrock?'}], converse.answer_batch_item,
+                                key_fn=lambda item: item['query'],
+                                    read_timeout=READ_TIMEOUT, max_attempts=MAX_ATTEMPTS, budget_ms=29000,
+                                    reserve_ms=0)
+        assert outcomes[0]['status'] == 'ok', outcomes[0].get('error')
+        agent_runtime.assert_no_pending_responses()
+        runtime.assert_no_pending_responses()
+
+    assert outcomes[0]['value']['answer'] == 'stub answer'
+    assert seen == {'retrieve': (READ_TIMEOUT, MAX_ATTEMPTS), 'guardrail': (READ_TIMEOUT, MAX_ATTEMPTS)}
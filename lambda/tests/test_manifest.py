@@ -0,0 +1,309 @@
+"""
+[학습] 문서 매니페스트와 동기화 방식 선택 테스트
+
+S3와 bedrock-agent 응답은 botocore Stubber로 만들어 네트워크 없이 실행합니다 (benchmarks/cold_start.py와 같은 방식).
+Stubber는 등록한 순서대로 호출되지 않거나 남은 응답이 있으면 실패하므로, 어떤 API를 어떤 순서로 부르는지도 함께 검증됩니다.
+"""
+import dataclasses
+import datetime
+import io
+import json
+
+import boto3
+import pytest
+from botocore.response import StreamingBody
+from botocore.stub import ANY, Stubber
+
+from rag_common import get_settings
+from rag_common.tracing import Trace
+
+import index
+from manifest import (
+    MANIFEST_VERSION,
+    LocalS3Client,
+    diff_documents,
+    load_manifest,
+    pending_manifest_key,
+    promote_manifest,
+    save_manifest,
+    scan_documents,
+)
+
+DOCS = 'docs-bucket'
+STATE = 'state-bucket'
+MANIFEST_KEY = 'sync/manifest.json'
+NOW = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def s3():
+    client = boto3.client('s3', region_name='us-east-1')
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+
+def listing(objects, next_token=None):
+    response = {
+        'Contents': [{'Key': key, 'ETag': f'"{etag}"', 'Size': 10} for key, etag in objects],
+        'KeyCount': len(objects),
+        'IsTruncated': next_token is not None,
+    }
+    if next_token is not None:
+        response['NextContinuationToken'] = next_token
+    return response
+
+
+def body(data):
+    raw = json.dumps(data).encode('utf-8')
+    return {'Body': StreamingBody(io.BytesIO(raw), len(raw))}
+
+
+def manifest(documents, knowledge_base_id='kb-1', data_source_id='ds-1', **fields):
+    return dict(fields, version=MANIFEST_VERSION, knowledge_base_id=knowledge_base_id,
+                data_source_id=data_source_id, documents=documents)
+
+
+def scanned(s3_stub, objects):
+    client, stubber = s3_stub
+    stubber.add_response('list_objects_v2', listing(objects), {'Bucket': DOCS, 'Prefix': ''})
+    return scan_documents(client, DOCS)
+
+
+# --- 스캔 / 비교 ---
+
+def test_scan_follows_pagination_and_skips_folders(s3):
+    client, stubber = s3
+    stubber.add_response('list_objects_v2', listing([('a.txt', 'e1'), ('faq/', 'e0')], next_token='t1'),
+                         {'Bucket': DOCS, 'Prefix': ''})
+    stubber.add_response('list_objects_v2', listing([('faq/b.txt', 'e2')]),
+                         {'Bucket': DOCS, 'Prefix': '', 'ContinuationToken': 't1'})
+
+    documents = scan_documents(client, DOCS)
+
+    assert sorted(documents) == ['a.txt', 'faq/b.txt']
+
+
+def test_sidecar_is_hashed_into_its_document(s3):
+    plain = scanned(s3, [('a.txt', 'e1'), ('b.txt', 'e2')])
+    with_sidecar = scanned(s3, [('a.txt', 'e1'), ('a.txt.metadata.json', 'm1'), ('b.txt', 'e2')])
+    changed_sidecar = scanned(s3, [('a.txt', 'e1'), ('a.txt.metadata.json', 'm2'), ('b.txt', 'e2')])
+
+    assert sorted(with_sidecar) == ['a.txt', 'b.txt']  # 메타데이터 파일은 문서가 아님
+    assert with_sidecar['a.txt']['metadata'] is True
+    assert plain['a.txt']['metadata'] is False
+    assert plain['a.txt']['hash'] != with_sidecar['a.txt']['hash'] != changed_sidecar['a.txt']['hash']
+    assert plain['b.txt'] == with_sidecar['b.txt'] == changed_sidecar['b.txt']
+
+
+def test_diff_classifies_added_modified_removed():
+    previous = {'keep': {'hash': '1'}, 'edit': {'hash': '2'}, 'gone': {'hash': '3'}}
+    current = {'keep': {'hash': '1'}, 'edit': {'hash': '2b'}, 'new': {'hash': '4'}}
+
+    assert diff_documents(previous, current) == (['new'], ['edit'], ['gone'])
+    assert diff_documents(current, current) == ([], [], [])
+    assert diff_documents({}, current) == (sorted(current), [], [])
+
+
+# --- 매니페스트 읽기/쓰기 ---
+
+def test_load_manifest_missing_is_first_sync(s3):
+    client, stubber = s3
+    stubber.add_client_error('get_object', service_error_code='NoSuchKey', http_status_code=404)
+
+    assert load_manifest(client, STATE, MANIFEST_KEY) is None
+
+
+@pytest.mark.parametrize('ids, expected', [
+    (('kb-1', 'ds-1'), True),
+    (('kb-2', 'ds-1'), False),  # KB 교체
+    (('kb-1', 'ds-2'), False),  # 데이터 소스 교체
+])
+def test_load_manifest_is_tied_to_knowledge_base(s3, ids, expected):
+    client, stubber = s3
+    stubber.add_response('get_object', body(manifest({'a.txt': {'hash': '1'}})), {'Bucket': STATE, 'Key': MANIFEST_KEY})
+
+    loaded = load_manifest(client, STATE, MANIFEST_KEY, *ids)
+
+    assert (loaded is not None) == expected
+
+
+def test_load_manifest_ignores_other_versions(s3):
+    client, stubber = s3
+    stubber.add_response('get_object', body(dict(manifest({}), version=MANIFEST_VERSION + 1)))
+
+    assert load_manifest(client, STATE, MANIFEST_KEY) is None
+
+
+def test_promote_manifest_drops_failed_documents(s3):
+    client, stubber = s3
+    pending = manifest({'a.txt': {'hash': '1'}, 'b.txt': {'hash': '2'}}, generation='g1', sync_mode='direct')
+    stubber.add_response('get_object', body(pending), {'Bucket': STATE, 'Key': 'sync/manifest.pending.json'})
+    stubber.add_response('put_object', {}, {'Bucket': STATE, 'Key': MANIFEST_KEY, 'Body': ANY,
+                                            'ContentType': 'application/json'})
+
+    promoted = promote_manifest(client, STATE, MANIFEST_KEY, 'g1', drop=['b.txt'])
+
+    assert promoted['documents'] == {'a.txt': {'hash': '1'}}
+    assert promoted['generation'] == 'g1' and promoted['knowledge_base_id'] == 'kb-1'
+
+
+def test_promote_manifest_skips_other_generation(s3):
+    client, stubber = s3
+    stubber.add_response('get_object', body(manifest({}, generation='g2')))
+
+    assert promote_manifest(client, STATE, MANIFEST_KEY, 'g1') is None
+
+
+def test_pending_manifest_key():
+    assert pending_manifest_key('sync/manifest.json') == 'sync/manifest.pending.json'
+    assert pending_manifest_key('manifest') == 'manifest.pending'
+
+
+# --- 동기화 방식 선택 (unchanged / direct / full) ---
+
+def sync_settings(direct_max=2):
+    return dataclasses.replace(
+        get_settings(),
+        knowledge_base_id='kb-1',
+        data_source_id='ds-1',
+        document_bucket_name=DOCS,
+        document_prefix='',
+        sync_state_bucket=STATE,
+        sync_manifest_key=MANIFEST_KEY,
+        sync_direct_max_documents=direct_max,
+    )
+
+
+def run_sync(s3, objects, previous, pending_put=True):
+    """
+    [학습] 문서 목록과 이전 매니페스트를 등록하고 sync_documents()를 실행합니다.
+    대기 매니페스트 저장(put_object)은 bedrock-agent 호출 뒤에 일어나므로, 그 응답은 호출 전에 미리 등록합니다.
+    """
+    client, stubber = s3
+    stubber.add_response('list_objects_v2', listing(objects), {'Bucket': DOCS, 'Prefix': ''})
+    if previous is None:
+        stubber.add_client_error('get_object', service_error_code='NoSuchKey', http_status_code=404)
+    else:
+        stubber.add_response('get_object', body(previous), {'Bucket': STATE, 'Key': MANIFEST_KEY})
+    if pending_put:
+        stubber.add_response('put_object', {}, {'Bucket': STATE, 'Key': 'sync/manifest.pending.json', 'Body': ANY,
+                                                'ContentType': 'application/json'})
+    return index.sync_documents(sync_settings(), Trace('test'), client)
+
+
+def previous_manifest(s3, objects, **kwargs):
+    return manifest(scanned(s3, objects), **kwargs)
+
+
+def expect_ingestion_job(agent):
+    agent.add_response('start_ingestion_job', {'ingestionJob': {
+        'knowledgeBaseId': 'kb-1', 'dataSourceId': 'ds-1', 'ingestionJobId': 'job-1',
+        'status': 'STARTING', 'startedAt': NOW, 'updatedAt': NOW,
+    }}, {'knowledgeBaseId': 'kb-1', 'dataSourceId': 'ds-1'})
+
+
+def expect_direct_ingest(agent, keys):
+    agent.add_response('ingest_knowledge_base_documents', {'documentDetails': [
+        {'knowledgeBaseId': 'kb-1', 'dataSourceId': 'ds-1', 'status': 'STARTING',
+         'identifier': {'dataSourceType': 'S3', 's3': {'uri': f's3://{DOCS}/{key}'}}, 'updatedAt': NOW}
+        for key in keys
+    ]}, {'knowledgeBaseId': 'kb-1', 'dataSourceId': 'ds-1', 'documents': ANY})
+
+
+BASE = [('a.txt', 'e1'), ('b.txt', 'e2')]
+
+
+def test_first_sync_is_full(s3, agent):
+    expect_ingestion_job(agent)
+
+    data, status = run_sync(s3, BASE, None)
+
+    assert data['SyncMode'] == 'full' and data['DocumentsAdded'] == '2'
+    assert status['state'] == 'in_progress' and status['generation'] == 'job-1'
+
+
+def test_unchanged_starts_nothing(s3, agent):
+    previous = previous_manifest(s3, BASE)
+
+    data, status = run_sync(s3, BASE, previous, pending_put=False)
+
+    assert data['SyncMode'] == 'unchanged' and status is None
+
+
+def test_changes_up_to_threshold_are_direct(s3, agent):
+    previous = previous_manifest(s3, BASE)
+    expect_direct_ingest(agent, ['b.txt', 'c.txt'])
+
+    data, status = run_sync(s3, [('a.txt', 'e1'), ('b.txt', 'e2b'), ('c.txt', 'e3')], previous)
+
+    assert data['SyncMode'] == 'direct'
+    assert (data['DocumentsAdded'], data['DocumentsModified']) == ('1', '1')
+    assert sorted(status['documents']) == ['b.txt', 'c.txt']
+    assert status['generation'].startswith('manifest-')
+
+
+def test_changes_over_threshold_are_full(s3, agent):
+    previous = previous_manifest(s3, BASE)
+    expect_ingestion_job(agent)
+
+    data, _ = run_sync(s3, BASE + [('c.txt', 'e3'), ('d.txt', 'e4'), ('e.txt', 'e5')], previous)
+
+    assert data['SyncMode'] == 'full' and data['DocumentsAdded'] == '3'
+
+
+def test_manifest_from_another_knowledge_base_is_full(s3, agent):
+    previous = previous_manifest(s3, BASE, knowledge_base_id='kb-old')
+    expect_ingestion_job(agent)
+
+    data, _ = run_sync(s3, BASE, previous)
+
+    assert data['SyncMode'] == 'full'
+
+
+def test_save_manifest_records_fields(s3):
+    client, stubber = s3
+    stubber.add_response('put_object', {}, {'Bucket': STATE, 'Key': MANIFEST_KEY, 'Body': ANY,
+                                            'ContentType': 'application/json'})
+
+    saved = save_manifest(client, STATE, MANIFEST_KEY, {'a.txt': {'hash': '1'}}, sync_mode='full', generation='g1')
+
+    assert saved['version'] == MANIFEST_VERSION and saved['generation'] == 'g1'
+
+
+# --- 로컬 디렉터리(LocalS3Client) 왕복: full → unchanged → direct ---
+
+def write_document(root, key, text):
+    path = root / DOCS / key
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+
+
+def test_sync_round_trip_over_local_directory(tmp_path, agent):
+    settings = dataclasses.replace(sync_settings(), local_s3_root=str(tmp_path))
+    s3 = index.get_s3_client(settings)
+    assert isinstance(s3, LocalS3Client)
+    write_document(tmp_path, 'a.txt', 'Amazon Bedrock')
+    write_document(tmp_path, 'faq/b.txt', 'Knowledge Bases')
+    write_document(tmp_path, 'faq/b.txt.metadata.json', '{"metadataAttributes": {"topic": "kb"}}')
+
+    # 1) 매니페스트가 없으므로 전체 동기화, 수집 완료(COMPLETE) 후 기준 매니페스트로 옮김
+    expect_ingestion_job(agent)
+    data, status = index.sync_documents(settings, Trace('test'), s3)
+    assert data['SyncMode'] == 'full' and data['DocumentsAdded'] == '2'
+    assert load_manifest(s3, STATE, MANIFEST_KEY) is None  # 수집이 끝나기 전에는 대기 매니페스트만 있음
+    index.finish_manifest(settings, s3, status, {'failed': 0})
+    saved = load_manifest(s3, STATE, MANIFEST_KEY, 'kb-1', 'ds-1')
+    assert sorted(saved['documents']) == ['a.txt', 'faq/b.txt']
+    assert saved['documents']['faq/b.txt']['metadata'] is True
+
+    # 2) 문서가 그대로이면 아무 작업도 시작하지 않음
+    data, status = index.sync_documents(settings, Trace('test'), s3)
+    assert data['SyncMode'] == 'unchanged' and status is None
+
+    # 3) 메타데이터 파일만 바뀌어도 해당 문서만 직접 수집
+    write_document(tmp_path, 'faq/b.txt.metadata.json', '{"metadataAttributes": {"topic": "faq"}}')
+    expect_direct_ingest(agent, ['faq/b.txt'])
+    data, status = index.sync_documents(settings, Trace('test'), s3)
+    assert data['SyncMode'] == 'direct' and data['DocumentsModified'] == '1'
+    assert status['documents'] == ['faq/b.txt']
@@ -0,0 +1,42 @@
+"""
+[학습] 검색 후처리 테스트 - 줄바꿈 보존, 같은 문서 청크만 이어 붙이기
+"""
+from rag_common.post_retrieval import _normalize, dedupe_chunks, truncate_to_tokens
+
+OVERLAP = 'The shared overlap sentence is long enough to count as chunk overlap.'
+
+
+def chunk(text, score, uri):
+    return {'text': text, 'score': score, 'location': {'type': 'S3', 's3Location': {'uri': uri}} if uri else {}}
+
+
+def test_normalize_keeps_line_and_paragraph_breaks():
+    text = 'First   line.\n\n\n  Second\tparagraph.\nThird line  '
+
+    assert _normalize(text) == 'First line.\n\nSecond paragraph.\nThird line'
+
+
+def test_truncate_cuts_at_paragraph_break():
+    text = _normalize('a ' * 100 + '\n\n' + 'b ' * 300)
+
+    assert truncate_to_tokens(text, 80) == ('a ' * 100).strip()
+
+
+def test_overlapping_chunks_of_same_document_are_stitched():
+    first = chunk('Intro of the document. ' + OVERLAP, 0.9, 's3://docs/a.txt')
+    second = chunk(OVERLAP + ' And the text continues.', 0.8, 's3://docs/a.txt')
+
+    kept, merged, removed = dedupe_chunks([first, second])
+
+    assert (merged, removed) == (1, 0)
+    assert kept[0]['text'] == 'Intro of the document. ' + OVERLAP + ' And the text continues.'
+
+
+def test_overlapping_chunks_of_different_documents_stay_apart():
+    first = chunk('Intro of the document. ' + OVERLAP, 0.9, 's3://docs/a.txt')
+    other = chunk(OVERLAP + ' And the text continues.', 0.8, 's3://docs/b.txt')
+    unknown = chunk(OVERLAP + ' Something else entirely here.', 0.7, None)
+
+    kept, merged, _ = dedupe_chunks([first, other, unknown])
+
+    assert merged == 0 and len(kept) == 3
@@ -0,0 +1,128 @@
+"""
+[학습] 대화 세션 저장소 테스트 - 백엔드 왕복, compact encoding, 턴 단위 정리, TTL 만료
+"""
+import zlib
+
+import pytest
+
+from rag_common import session_store
+from rag_common.session_store import (
+    COMPRESS_MIN_BYTES,
+    MemorySessionStore,
+    SQLiteSessionStore,
+    create_session_store,
+    decode_messages,
+    encode_messages,
+    trim_turns,
+)
+
+
+def conversation(turns, text='질문'):
+    messages = []
+    for i in range(turns):
+        messages.append({'role': 'user', 'content': f'{text} {i}'})
+        messages.append({'role': 'assistant', 'content': f'답변 {i}'})
+    return messages
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(session_store, 'time', fake)
+    return fake
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request):
+    return create_session_store(request.param, max_messages=6, ttl_seconds=60)
+
+
+def test_round_trip(store):
+    messages = conversation(2)
+    store.save('s1', messages)
+
+    assert store.load('s1') == messages
+    assert store.load('unknown') == []
+
+
+def test_save_replaces_and_delete_removes(store):
+    store.save('s1', conversation(1))
+    store.save('s1', conversation(2))
+    assert store.load('s1') == conversation(2)
+
+    store.delete('s1')
+    assert store.load('s1') == []
+
+
+def test_save_trims_oldest_turns(store):
+    store.save('s1', conversation(5))
+
+    assert store.load('s1') == conversation(5)[-6:]
+
+
+def test_ttl_expires_sessions(store, clock):
+    store.save('s1', conversation(1))
+
+    clock.now += 60
+    assert store.load('s1') == conversation(1)
+
+    clock.now += 1
+    assert store.load('s1') == []
+
+
+@pytest.mark.parametrize('backend_class', [MemorySessionStore, SQLiteSessionStore])
+def test_max_sessions_evicts_least_recently_used(backend_class, clock):
+    store = backend_class(max_sessions=2)
+    for session_id in ('a', 'b', 'c'):
+        store.save(session_id, conversation(1))
+        clock.now += 1
+
+    assert store.load('a') == []
+    assert store.load('b') == conversation(1)
+    assert store.load('c') == conversation(1)
+
+
+def test_short_history_is_stored_as_compact_json():
+    data = encode_messages([{'role': 'user', 'content': '안녕'}, {'role': 'assistant', 'content': 'hi'}])
+
+    assert data == b'j' + '[["u","안녕"],["a","hi"]]'.encode('utf-8')
+    assert decode_messages(data) == [{'role': 'user', 'content': '안녕'}, {'role': 'assistant', 'content': 'hi'}]
+
+
+def test_long_history_is_compressed():
+    messages = conversation(20, text='Amazon Bedrock Knowledge Base 질문')
+    data = encode_messages(messages)
+
+    assert data[:1] == b'z'
+    assert len(zlib.decompress(data[1:])) >= COMPRESS_MIN_BYTES
+    assert decode_messages(data) == messages
+
+
+def test_decode_empty_and_memoryview():
+    assert decode_messages(b'') == []
+    assert decode_messages(None) == []
+    # [학습] sqlite/DynamoDB는 bytes 대신 memoryview/bytearray를 돌려줄 수 있습니다.
+    assert decode_messages(memoryview(encode_messages(conversation(1)))) == conversation(1)
+
+
+def test_trim_turns_keeps_history_starting_with_user():
+    messages = conversation(3)
+
+    assert trim_turns(messages, 0) is messages
+    assert trim_turns(messages, 10) is messages
+    assert trim_turns(messages, 4) == messages[2:]
+    # 홀수 한도로 자르면 assistant로 시작하지 않도록 한 메시지를 더 버립니다.
+    assert trim_turns(messages, 3) == messages[4:]
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_session_store('redis')
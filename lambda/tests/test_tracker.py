@@ -0,0 +1,219 @@
+"""
+[학습] 수집 진행 추적 테스트 - 지수 백오프, deadline, 최종 상태 매핑, 매니페스트 승격
+
+poll_with_backoff()는 sleep/clock을 인자로 받으므로 가짜 시계로 실제 대기 없이 검증합니다.
+bedrock-agent 응답은 Stubber로, 상태 버킷은 LocalS3Client(임시 디렉터리)로 대신합니다.
+"""
+import dataclasses
+import datetime
+
+import pytest
+from botocore.stub import ANY
+
+from rag_common import get_client, get_settings
+from rag_common.tracing import Trace
+
+import index
+from manifest import LocalS3Client, load_manifest, pending_manifest_key, save_manifest
+from tracker import documents_check, load_status, poll_with_backoff, save_status
+
+DOCS = 'docs-bucket'
+STATE = 'state-bucket'
+MANIFEST_KEY = 'sync/manifest.json'
+STATUS_KEY = 'sync/status.json'
+NOW = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def finishes_after(polls, value='done'):
+    calls = []
+
+    def check():
+        calls.append(1)
+        return len(calls) >= polls, value
+
+    return check
+
+
+# --- 지수 백오프 폴링 ---
+
+def test_poll_delay_doubles_up_to_max_delay():
+    clock = FakeClock()
+
+    done, value, polls = poll_with_backoff(finishes_after(6), deadline=1000, initial_delay=2, max_delay=10,
+                                           sleep=clock.sleep, clock=clock)
+
+    assert (done, value, polls) == (True, 'done', 6)
+    assert clock.sleeps == [2, 4, 8, 10, 10]
+
+
+def test_poll_stops_at_deadline_and_never_sleeps_past_it():
+    clock = FakeClock()
+
+    done, value, polls = poll_with_backoff(finishes_after(100, 'running'), deadline=5, initial_delay=2, max_delay=30,
+                                           sleep=clock.sleep, clock=clock)
+
+    assert (done, value) == (False, 'running')
+    assert clock.sleeps == [2, 3]  # 두 번째 대기는 남은 3초로 잘림
+    assert polls == 3 and clock.now == 5
+
+
+def test_poll_checks_once_when_deadline_has_passed():
+    clock = FakeClock()
+    clock.now = 10
+
+    assert poll_with_backoff(finishes_after(2), deadline=5, sleep=clock.sleep, clock=clock) == (False, 'done', 1)
+    assert clock.sleeps == []
+
+
+# --- 문서 단위 수집(direct) 상태 매핑 ---
+
+def document_details(statuses):
+    return {'documentDetails': [
+        {'knowledgeBaseId': 'kb-1', 'dataSourceId': 'ds-1', 'status': status,
+         'identifier': {'dataSourceType': 'S3', 's3': {'uri': f's3://{DOCS}/{key}'}}, 'updatedAt': NOW}
+        for key, status in statuses.items()
+    ]}
+
+
+def direct_check(keys, deleted=0):
+    return documents_check(get_client('bedrock-agent'), 'kb-1', 'ds-1', DOCS, keys, started_at=100.0,
+                           deleted=deleted, clock=lambda: 110.0)
+
+
+def test_documents_check_waits_while_any_document_is_pending(agent):
+    agent.add_response('get_knowledge_base_documents', document_details({'a.txt': 'INDEXED', 'b.txt': 'IN_PROGRESS'}))
+
+    done, report = direct_check(['a.txt', 'b.txt'])()
+
+    assert done is False
+    assert report['status'] == 'IN_PROGRESS' and report['indexed'] == 1
+
+
+def test_documents_check_reports_failed_documents(agent):
+    agent.add_response('get_knowledge_base_documents', document_details({'a.txt': 'INDEXED', 'b.txt': 'FAILED'}))
+
+    done, report = direct_check(['a.txt', 'b.txt'], deleted=1)()
+
+    assert done is True
+    assert report['status'] == 'COMPLETE'
+    assert report['failed_documents'] == ['b.txt']
+    assert (report['indexed'], report['deleted'], report['seconds'], report['docs_per_sec']) == (1, 1, 10.0, 0.2)
+
+
+def test_documents_check_all_failed_is_failed(agent):
+    agent.add_response('get_knowledge_base_documents', document_details({'a.txt': 'METADATA_UPDATE_FAILED'}))
+
+    done, report = direct_check(['a.txt'])()
+
+    assert done is True and report['status'] == 'FAILED'
+
+
+def test_documents_check_batches_and_skips_metadata_files(agent):
+    keys = [f'doc{i:02d}.txt' for i in range(12)]
+    agent.add_response('get_knowledge_base_documents', document_details({key: 'INDEXED' for key in keys[:10]}),
+                       {'knowledgeBaseId': 'kb-1', 'dataSourceId': 'ds-1', 'documentIdentifiers': ANY})
+    agent.add_response('get_knowledge_base_documents', document_details({key: 'INDEXED' for key in keys[10:]}),
+                       {'knowledgeBaseId': 'kb-1', 'dataSourceId': 'ds-1', 'documentIdentifiers': ANY})
+
+    done, report = direct_check(keys + ['doc00.txt.metadata.json'])()
+
+    assert done is True
+    assert report['scanned'] == 12 and report['indexed'] == 12
+
+
+# --- track_ingestion / is_complete: 상태 문서와 매니페스트 승격 ---
+
+@pytest.fixture
+def state(tmp_path):
+    settings = dataclasses.replace(
+        get_settings(),
+        knowledge_base_id='kb-1',
+        data_source_id='ds-1',
+        document_bucket_name=DOCS,
+        sync_state_bucket=STATE,
+        sync_manifest_key=MANIFEST_KEY,
+        sync_status_key=STATUS_KEY,
+        sync_wait_seconds=0,
+        local_s3_root=str(tmp_path),
+    )
+    s3 = LocalS3Client(str(tmp_path))
+    save_manifest(s3, STATE, pending_manifest_key(MANIFEST_KEY), {'a.txt': {'hash': '1', 'metadata': False}},
+                  sync_mode='full', ingestion_job_id='job-1', generation='job-1',
+                  knowledge_base_id='kb-1', data_source_id='ds-1')
+    return settings, s3
+
+
+def full_status():
+    return {'ready': False, 'state': 'in_progress', 'sync_mode': 'full', 'ingestion_job_id': 'job-1',
+            'generation': 'job-1', 'started_at': 0.0, 'documents': [], 'removed': 0,
+            'statistics': {'status': 'STARTING'}}
+
+
+def expect_job(agent, status, failed=0):
+    agent.add_response('get_ingestion_job', {'ingestionJob': {
+        'knowledgeBaseId': 'kb-1', 'dataSourceId': 'ds-1', 'ingestionJobId': 'job-1', 'status': status,
+        'statistics': {'numberOfDocumentsScanned': 1, 'numberOfNewDocumentsIndexed': 1 - failed,
+                       'numberOfDocumentsFailed': failed},
+        'startedAt': NOW, 'updatedAt': NOW + datetime.timedelta(seconds=4),
+    }}, {'knowledgeBaseId': 'kb-1', 'dataSourceId': 'ds-1', 'ingestionJobId': 'job-1'})
+
+
+def track(settings, s3):
+    return index.track_ingestion(settings, Trace('test'), s3, full_status(), deadline=0)
+
+
+@pytest.mark.parametrize('job_status, failed, state_name, promoted', [
+    ('COMPLETE', 0, 'complete', True),
+    ('COMPLETE', 1, 'complete', False),  # full 동기화에서 실패 문서가 있으면 이전 매니페스트 유지
+    ('FAILED', 0, 'failed', False),
+    ('STOPPED', 0, 'failed', False),
+    ('IN_PROGRESS', 0, 'in_progress', False),  # deadline이 지나 한 번만 확인
+])
+def test_track_ingestion_maps_job_status(state, agent, job_status, failed, state_name, promoted):
+    settings, s3 = state
+    expect_job(agent, job_status, failed)
+
+    status = track(settings, s3)
+
+    assert status['state'] == state_name and status['ready'] == (state_name == 'complete')
+    assert load_status(s3, STATE, STATUS_KEY)['state'] == state_name
+    assert (load_manifest(s3, STATE, MANIFEST_KEY) is not None) == promoted
+
+
+def test_is_complete_resumes_polling_from_status_document(state, agent, monkeypatch):
+    settings, s3 = state
+    monkeypatch.setattr(index, 'get_settings', lambda: settings)
+    save_status(s3, STATE, STATUS_KEY, full_status())
+
+    expect_job(agent, 'IN_PROGRESS')
+    assert index.is_complete({'RequestType': 'Create'}, None)['IsComplete'] is False
+    assert load_manifest(s3, STATE, MANIFEST_KEY) is None
+
+    expect_job(agent, 'COMPLETE')
+    result = index.is_complete({'RequestType': 'Create'}, None)
+    assert result['IsComplete'] is True
+    assert result['Data']['Ready'] == 'true' and result['Data']['Generation'] == 'job-1'
+    assert load_manifest(s3, STATE, MANIFEST_KEY)['generation'] == 'job-1'
+
+    # 최종 상태 이후에는 bedrock-agent를 다시 호출하지 않음
+    assert index.is_complete({'RequestType': 'Create'}, None)['IsComplete'] is True
+
+
+def test_is_complete_without_status_document_is_done(state, monkeypatch):
+    settings, _ = state
+    monkeypatch.setattr(index, 'get_settings', lambda: settings)
+
+    assert index.is_complete({'RequestType': 'Create'}, None) == {'IsComplete': True}
@@ -4,6 +4,8 @@
  * 이 스택은 RAG 파이프라인의 API 레이어를 생성합니다:
  * - POST /query: 관리형 retrieve_and_generate (한 번의 호출로 검색+생성)
  * - POST /converse: 워크숍 패턴 retrieve + converse (검색과 생성을 분리)
+ * - Function URL (스트리밍): retrieve + converse_stream을 SSE로 전송
+ * - DynamoDB 세션 테이블: /converse 대화 이력을 session_id 기준으로 저장
  *
  * 서버리스 아키텍처의 장점:
  * - 요청이 없으면 비용이 발생하지 않음 (Free Tier 범위)
@@ -17,6 +19,7 @@ import * as cdk from 'aws-cdk-lib';
 import { Construct } from 'constructs';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
 import * as apigateway from 'aws-cdk-lib/aws-apigateway';
+import * as dynamodb from 'aws-cdk-lib/aws-dynamodb';
 import * as iam from 'aws-cdk-lib/aws-iam';
 import { CONFIG } from './config';
 
@@ -24,6 +27,10 @@ import { CONFIG } from './config';
 export interface ApiStackProps extends cdk.StackProps {
   /** BedrockKbStack에서 생성한 Knowledge Base ID */
   knowledgeBaseId: string;
+  /** BedrockKbStack에서 생성한 데이터 소스 ID (답변 캐시 무효화용 ingestion job 조회) */
+  dataSourceId?: string;
+  /** BedrockKbStack의 동기화 상태 버킷 이름 (수집 완료 전에는 답변 캐시를 채우지 않음) */
+  syncStateBucketName?: string;
 }
 
 export class ApiStack extends cdk.Stack {
@@ -36,6 +43,31 @@ export class ApiStack extends cdk.Stack {
     // converse API는 모델 ID를 직접 사용합니다.
     const modelArn = `arn:aws:bedrock:${this.region}::foundation-model/${CONFIG.generationModelId}`;
 
+    // [학습] 공통 Lambda Layer (rag_common)
+    // 세 Lambda가 공유하는 boto3 클라이언트 풀/설정 캐시 코드를 Layer로 배포합니다.
+    // Layer의 python/ 디렉터리는 Lambda 런타임의 sys.path에 자동으로 추가됩니다.
+    const commonLayer = new lambda.LayerVersion(this, 'RagCommonLayer', {
+      code: lambda.Code.fromAsset('lambda/layers/rag-common'),
+      compatibleRuntimes: [lambda.Runtime.PYTHON_3_12],
+      description: 'Shared boto3 client pool and settings cache for RAG Lambdas',
+    });
+
+    // [학습] EMF 추적 로그 환경변수 (모든 Lambda 공통)
+    const tracingEnvironment: Record<string, string> = {
+      TRACE_NAMESPACE: CONFIG.tracing.namespace,
+      LOG_EVENTS: String(CONFIG.tracing.logEvents),
+      EVENT_LOG_SAMPLE_RATE: String(CONFIG.tracing.eventLogSampleRate),
+    };
+
+    // [학습] 배치 모드 환경변수 (/query, /converse 공통)
+    const batchEnvironment: Record<string, string> = {
+      BATCH_MAX_ITEMS: String(CONFIG.batch.maxItems),
+      BATCH_MAX_CONCURRENCY: String(CONFIG.batch.maxConcurrency),
+      BATCH_READ_TIMEOUT: String(CONFIG.batch.readTimeoutSeconds),
+      BATCH_MAX_ATTEMPTS: String(CONFIG.batch.maxAttempts),
+      BATCH_TIME_BUDGET_MS: String(CONFIG.batch.timeBudgetMs),
+    };
+
     // [학습] RAG 쿼리 Lambda (관리형 방식)
     // retrieve_and_generate() API를 사용하여 한 번의 호출로 RAG를 수행합니다.
     const ragQueryLambda = new lambda.Function(this, 'RagQueryLambda', {
@@ -43,13 +75,56 @@ export class ApiStack extends cdk.Stack {
       runtime: lambda.Runtime.PYTHON_3_12,
       handler: 'index.handler',
       code: lambda.Code.fromAsset('lambda/rag-query'),
+      layers: [commonLayer],
       timeout: cdk.Duration.seconds(30),
       environment: {
         KNOWLEDGE_BASE_ID: props.knowledgeBaseId,
         MODEL_ARN: modelArn,
+        DATA_SOURCE_ID: props.dataSourceId ?? '',
+        SYNC_STATE_BUCKET: props.syncStateBucketName ?? '',
+        EMBEDDING_MODEL_ID: CONFIG.embeddingModelId,
+        ANSWER_CACHE_BACKEND: CONFIG.answerCache.backend,
+        ANSWER_CACHE_MAX_ENTRIES: String(CONFIG.answerCache.maxEntries),
+        ANSWER_CACHE_TTL_SECONDS: String(CONFIG.answerCache.ttlSeconds),
+        ANSWER_CACHE_SIMILARITY_THRESHOLD: String(CONFIG.answerCache.similarityThreshold),
+        ...batchEnvironment,
+        ...tracingEnvironment,
       },
     });
 
+    // [학습] 대화 세션 테이블 (session_id → 압축된 대화 이력)
+    // expires_at을 TTL 속성으로 지정하면 만료된 세션을 DynamoDB가 자동 삭제합니다.
+    // 온디맨드(PAY_PER_REQUEST) 과금이므로 요청이 없으면 비용이 거의 발생하지 않습니다.
+    const sessionTable = new dynamodb.Table(this, 'ConversationSessionTable', {
+      tableName: `${CONFIG.projectPrefix}-conversation-sessions`,
+      partitionKey: { name: 'session_id', type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      timeToLiveAttribute: 'expires_at',
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+    });
+
+    // [학습] 대화 이력 토큰 예산 + 세션 저장소 + 검색 후처리 환경변수 (/converse와 스트리밍 Lambda 공통)
+    const conversationEnvironment: Record<string, string> = {
+      INPUT_TOKEN_BUDGET: String(CONFIG.conversation.inputTokenBudget),
+      HISTORY_SUMMARY: String(CONFIG.conversation.historySummary),
+      SESSION_STORE_BACKEND: CONFIG.sessionStore.backend,
+      SESSION_TABLE_NAME: sessionTable.tableName,
+      SESSION_TTL_SECONDS: String(CONFIG.sessionStore.ttlSeconds),
+      SESSION_MAX_MESSAGES: String(CONFIG.sessionStore.maxMessages),
+      CONTEXT_MIN_SCORE: String(CONFIG.retrieval.minScore),
+      CONTEXT_TOKEN_BUDGET: String(CONFIG.retrieval.contextTokenBudget),
+      CONTEXT_RERANK: String(CONFIG.retrieval.rerank),
+      RETRIEVAL_INITIAL_K: String(CONFIG.retrieval.initialResults),
+      RETRIEVAL_MAX_K: String(CONFIG.retrieval.maxResults),
+      RETRIEVAL_LOW_SCORE: String(CONFIG.retrieval.lowScore),
+      CHUNK_MAX_TOKENS: String(CONFIG.chunkMaxTokens),
+    };
+
+    // [학습] (선택) 가드레일 환경변수 - CONFIG.guardrail.id가 비어 있으면 주입하지 않습니다.
+    const guardrailEnvironment: Record<string, string> = CONFIG.guardrail.id
+      ? { GUARDRAIL_ID: CONFIG.guardrail.id, GUARDRAIL_VERSION: CONFIG.guardrail.version }
+      : {};
+
     // [학습] RAG Converse Lambda (워크숍 패턴)
     // retrieve() + converse() 를 분리 호출하여 프롬프트와 대화 이력을 직접 제어합니다.
     const ragConverseLambda = new lambda.Function(this, 'RagConverseLambda', {
@@ -57,10 +132,56 @@ export class ApiStack extends cdk.Stack {
       runtime: lambda.Runtime.PYTHON_3_12,
       handler: 'index.handler',
       code: lambda.Code.fromAsset('lambda/rag-converse'),
+      layers: [commonLayer],
       timeout: cdk.Duration.seconds(30),
       environment: {
         KNOWLEDGE_BASE_ID: props.knowledgeBaseId,
         GENERATION_MODEL_ID: CONFIG.generationModelId,
+        ...guardrailEnvironment,
+        ...conversationEnvironment,
+        ...batchEnvironment,
+        ...tracingEnvironment,
+      },
+    });
+
+    // [학습] RAG Converse 스트리밍 Lambda (Lambda Web Adapter)
+    // rag-converse와 같은 코드 에셋을 사용하되, handler 대신 run.sh가 HTTP 서버(stream_server.py)를 띄웁니다.
+    // Lambda Web Adapter 레이어가 Function URL 요청을 로컬 HTTP 요청으로 전달하고,
+    // 서버가 쓰는 SSE 청크를 응답 스트림으로 즉시 흘려보냅니다.
+    const webAdapterLayer = lambda.LayerVersion.fromLayerVersionArn(
+      this,
+      'LambdaWebAdapterLayer',
+      `arn:aws:lambda:${this.region}:${CONFIG.streaming.webAdapterLayerAccount}:layer:LambdaAdapterLayerX86:${CONFIG.streaming.webAdapterLayerVersion}`,
+    );
+    const ragConverseStreamLambda = new lambda.Function(this, 'RagConverseStreamLambda', {
+      functionName: `${CONFIG.projectPrefix}-rag-converse-stream`,
+      runtime: lambda.Runtime.PYTHON_3_12,
+      handler: 'run.sh',
+      code: lambda.Code.fromAsset('lambda/rag-converse'),
+      layers: [commonLayer, webAdapterLayer],
+      timeout: cdk.Duration.seconds(60),
+      environment: {
+        KNOWLEDGE_BASE_ID: props.knowledgeBaseId,
+        GENERATION_MODEL_ID: CONFIG.generationModelId,
+        ...guardrailEnvironment,
+        ...conversationEnvironment,
+        ...tracingEnvironment,
+        AWS_LAMBDA_EXEC_WRAPPER: '/opt/bootstrap',
+        AWS_LWA_INVOKE_MODE: 'response_stream',
+        PORT: '8080',
+      },
+    });
+
+    // [학습] Function URL + RESPONSE_STREAM
+    // API Gateway(REST)는 Lambda 응답을 버퍼링하므로, 스트리밍은 Function URL로 노출합니다.
+    // /query, /converse와 동일하게 인증 없이 CORS만 허용합니다 (실습용 설정).
+    const converseStreamUrl = ragConverseStreamLambda.addFunctionUrl({
+      authType: lambda.FunctionUrlAuthType.NONE,
+      invokeMode: lambda.InvokeMode.RESPONSE_STREAM,
+      cors: {
+        allowedOrigins: ['*'],
+        allowedMethods: [lambda.HttpMethod.POST],
+        allowedHeaders: ['Content-Type'],
       },
     });
 
@@ -87,6 +208,28 @@ export class ApiStack extends cdk.Stack {
       resources: [modelArn],
     }));
 
+    // [학습] 답변 캐시용 권한
+    // - ListIngestionJobs: 최신 ingestion job ID로 문서 갱신 여부를 확인하여 캐시를 무효화
+    // - InvokeModel(임베딩 모델): 의미 일치(similarityThreshold > 0) 조회 시 질문 임베딩
+    ragQueryLambda.addToRolePolicy(new iam.PolicyStatement({
+      effect: iam.Effect.ALLOW,
+      actions: ['bedrock:ListIngestionJobs'],
+      resources: [`arn:aws:bedrock:${this.region}:${this.account}:knowledge-base/*`],
+    }));
+    ragQueryLambda.addToRolePolicy(new iam.PolicyStatement({
+      effect: iam.Effect.ALLOW,
+      actions: ['bedrock:InvokeModel'],
+      resources: [`arn:aws:bedrock:${this.region}::foundation-model/${CONFIG.embeddingModelId}`],
+    }));
+    // [학습] 수집 상태 문서 읽기: 수집이 끝난(ready) 뒤에만 답변 캐시를 채웁니다.
+    if (props.syncStateBucketName) {
+      ragQueryLambda.addToRolePolicy(new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: ['s3:GetObject'],
+        resources: [`arn:aws:s3:::${props.syncStateBucketName}/sync/status.json`],
+      }));
+    }
+
     // [학습] rag-converse Lambda 권한: retrieve() + converse() 분리 호출
     // - Retrieve: Knowledge Base에서 관련 문서만 검색
     // - InvokeModel: converse() API로 LLM을 직접 호출
@@ -101,6 +244,40 @@ export class ApiStack extends cdk.Stack {
       resources: [modelArn],
     }));
 
+    // [학습] rag-converse-stream Lambda 권한: retrieve() + converse_stream()
+    // converse_stream()은 InvokeModel이 아닌 InvokeModelWithResponseStream 권한이 필요합니다.
+    ragConverseStreamLambda.addToRolePolicy(new iam.PolicyStatement({
+      effect: iam.Effect.ALLOW,
+      actions: ['bedrock:Retrieve'],
+      resources: [`arn:aws:bedrock:${this.region}:${this.account}:knowledge-base/*`],
+    }));
+    ragConverseStreamLambda.addToRolePolicy(new iam.PolicyStatement({
+      effect: iam.Effect.ALLOW,
+      actions: ['bedrock:InvokeModelWithResponseStream'],
+      resources: [modelArn],
+    }));
+    // [학습] HISTORY_SUMMARY=true면 잘려나간 이력 요약을 converse()로 생성하므로 InvokeModel도 필요합니다.
+    ragConverseStreamLambda.addToRolePolicy(new iam.PolicyStatement({
+      effect: iam.Effect.ALLOW,
+      actions: ['bedrock:InvokeModel'],
+      resources: [modelArn],
+    }));
+
+    // [학습] 세션 테이블 읽기/쓰기 권한 (GetItem, PutItem, DeleteItem 등)
+    sessionTable.grantReadWriteData(ragConverseLambda);
+    sessionTable.grantReadWriteData(ragConverseStreamLambda);
+
+    // [학습] (선택) 가드레일 사전 검사 권한: apply_guardrail()
+    if (CONFIG.guardrail.id) {
+      for (const fn of [ragConverseLambda, ragConverseStreamLambda]) {
+        fn.addToRolePolicy(new iam.PolicyStatement({
+          effect: iam.Effect.ALLOW,
+          actions: ['bedrock:ApplyGuardrail'],
+          resources: [`arn:aws:bedrock:${this.region}:${this.account}:guardrail/${CONFIG.guardrail.id}`],
+        }));
+      }
+    }
+
     // [학습] REST API Gateway 생성
     // API Gateway는 HTTP 요청을 Lambda 함수로 라우팅합니다.
     // defaultCorsPreflightOptions: 브라우저의 CORS 프리플라이트(OPTIONS) 요청을 자동 처리합니다.
@@ -128,5 +305,10 @@ export class ApiStack extends cdk.Stack {
       value: api.url,
       description: 'API Gateway 엔드포인트 URL',
     });
+
+    new cdk.CfnOutput(this, 'ConverseStreamUrl', {
+      value: converseStreamUrl.url,
+      description: '/converse 스트리밍(SSE) Function URL',
+    });
   }
 }
@@ -15,6 +15,7 @@ import { Construct } from 'constructs';
 import * as iam from 'aws-cdk-lib/aws-iam';
 import * as bedrock from 'aws-cdk-lib/aws-bedrock';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
+import * as s3 from 'aws-cdk-lib/aws-s3';
 import * as cr from 'aws-cdk-lib/custom-resources';
 import { CONFIG } from './config';
 
@@ -35,6 +36,8 @@ export class BedrockKbStack extends cdk.Stack {
   // [학습] ApiStack에서 Lambda 환경변수로 사용됩니다.
   public readonly knowledgeBaseId: string;
   public readonly dataSourceId: string;
+  // [학습] 쿼리 Lambda가 수집 상태 문서(sync/status.json)를 읽을 때 사용합니다.
+  public readonly syncStateBucketName: string;
 
   constructor(scope: Construct, id: string, props: BedrockKbStackProps) {
     super(scope, id, props);
@@ -96,6 +99,18 @@ export class BedrockKbStack extends cdk.Stack {
         type: 'VECTOR',
         vectorKnowledgeBaseConfiguration: {
           embeddingModelArn: `arn:aws:bedrock:${this.region}::foundation-model/${CONFIG.embeddingModelId}`,
+          // [학습] embeddingModelConfiguration: 임베딩 출력 차원을 지정합니다.
+          // 생략하면 모델 기본값(Titan v2는 1024)이 사용되므로, 기본값이 아닐 때만 S3 Vectors 인덱스와
+          // 같은 값(CONFIG.vectorDimension)을 넘깁니다.
+          // 주의: knowledgeBaseConfiguration이 바뀌면 CloudFormation이 Knowledge Base를 교체합니다(새 ID).
+          // 1024일 때 속성을 생략하는 것은, 이미 배포된 스택에 속성이 새로 추가되어 KB가 교체되는 일을 막기 위해서입니다.
+          ...(CONFIG.vectorDimension !== 1024 ? {
+            embeddingModelConfiguration: {
+              bedrockEmbeddingModelConfiguration: {
+                dimensions: CONFIG.vectorDimension,
+              },
+            },
+          } : {}),
         },
       },
       // [학습] storageConfiguration: 벡터를 어디에 저장할지 설정합니다.
@@ -144,30 +159,98 @@ export class BedrockKbStack extends cdk.Stack {
     // [학습] Custom Resource로 초기 데이터 동기화를 자동 실행합니다.
     // CDK 배포 완료 후 자동으로 S3 문서를 KB에 수집하여
     // 사용자가 수동으로 콘솔에서 Sync를 클릭하지 않아도 됩니다.
+    // [학습] ApiStack의 Lambda와 같은 공통 Layer(rag_common)를 사용합니다.
+    // 스택 간 Layer 참조 대신 같은 에셋으로 스택별 LayerVersion을 만들어 의존성을 단순하게 유지합니다.
+    const commonLayer = new lambda.LayerVersion(this, 'RagCommonLayer', {
+      code: lambda.Code.fromAsset('lambda/layers/rag-common'),
+      compatibleRuntimes: [lambda.Runtime.PYTHON_3_12],
+      description: 'Shared boto3 client pool and settings cache for RAG Lambdas',
+    });
+
+    // [학습] 동기화 상태 버킷 - 마지막으로 동기화한 문서 매니페스트(문서 키 → 해시)를 저장합니다.
+    // 문서 버킷에 두면 Knowledge Base가 매니페스트까지 문서로 수집하므로 별도 버킷을 사용합니다.
+    const syncStateBucket = new s3.Bucket(this, 'SyncStateBucket', {
+      blockPublicAccess: s3.BlockPublicAccess.BLOCK_ALL,
+      enforceSSL: true,
+      encryption: s3.BucketEncryption.S3_MANAGED,
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+      autoDeleteObjects: true,
+    });
+
+    const syncEnvironment: Record<string, string> = {
+      KNOWLEDGE_BASE_ID: knowledgeBase.attrKnowledgeBaseId,
+      DATA_SOURCE_ID: dataSource.attrDataSourceId,
+      DOCUMENT_BUCKET_NAME: props.documentBucketName,
+      SYNC_STATE_BUCKET: syncStateBucket.bucketName,
+      SYNC_DIRECT_MAX_DOCUMENTS: String(CONFIG.sync.directMaxDocuments),
+      SYNC_WAIT_SECONDS: String(CONFIG.sync.waitSeconds),
+      TRACE_NAMESPACE: CONFIG.tracing.namespace,
+      LOG_EVENTS: String(CONFIG.tracing.logEvents),
+    };
+
     const syncLambda = new lambda.Function(this, 'SyncKbLambda', {
       runtime: lambda.Runtime.PYTHON_3_12,
       handler: 'index.handler',
       code: lambda.Code.fromAsset('lambda/sync-knowledge-base'),
+      layers: [commonLayer],
       timeout: cdk.Duration.minutes(5),
-      environment: {
-        KNOWLEDGE_BASE_ID: knowledgeBase.attrKnowledgeBaseId,
-        DATA_SOURCE_ID: dataSource.attrDataSourceId,
-      },
+      environment: syncEnvironment,
     });
 
-    // [학습] 동기화 Lambda에 bedrock-agent API 호출 권한 부여
-    syncLambda.addToRolePolicy(new iam.PolicyStatement({
-      effect: iam.Effect.ALLOW,
-      actions: ['bedrock:StartIngestionJob'],
-      resources: [knowledgeBase.attrKnowledgeBaseArn],
-    }));
+    // [학습] 수집 완료 확인 Lambda (같은 코드의 index.is_complete 핸들러)
+    // onEvent가 실행 시간 안에 완료를 확인하지 못하면 cr.Provider가 queryInterval마다 호출하여 이어서 폴링합니다.
+    const syncIsCompleteLambda = new lambda.Function(this, 'SyncKbIsCompleteLambda', {
+      runtime: lambda.Runtime.PYTHON_3_12,
+      handler: 'index.is_complete',
+      code: lambda.Code.fromAsset('lambda/sync-knowledge-base'),
+      layers: [commonLayer],
+      timeout: cdk.Duration.minutes(5),
+      environment: syncEnvironment,
+    });
 
+    for (const fn of [syncLambda, syncIsCompleteLambda]) {
+      // [학습] 동기화 Lambda에 bedrock-agent API 호출 권한 부여
+      // Ingest/DeleteKnowledgeBaseDocuments는 바뀐 문서만 수집/삭제하는 증분 동기화에,
+      // GetIngestionJob/GetKnowledgeBaseDocuments는 수집 진행 상황 폴링에 사용합니다.
+      fn.addToRolePolicy(new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: [
+          'bedrock:StartIngestionJob',
+          'bedrock:GetIngestionJob',
+          'bedrock:IngestKnowledgeBaseDocuments',
+          'bedrock:DeleteKnowledgeBaseDocuments',
+          'bedrock:GetKnowledgeBaseDocuments',
+        ],
+        resources: [knowledgeBase.attrKnowledgeBaseArn],
+      }));
+
+      // [학습] 매니페스트 비교를 위해 문서 버킷 목록 조회와 상태 버킷 읽기/쓰기 권한을 부여합니다.
+      // 문서 본문은 읽지 않고 list_objects_v2()의 ETag만 사용합니다.
+      fn.addToRolePolicy(new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: ['s3:ListBucket'],
+        resources: [props.documentBucketArn],
+      }));
+      syncStateBucket.grantReadWrite(fn);
+    }
+    this.syncStateBucketName = syncStateBucket.bucketName;
+
+    // [학습] isCompleteHandler를 지정하면 cr.Provider가 Step Functions로 완료될 때까지 재시도합니다.
+    // totalTimeout을 넘기면 배포가 실패하므로 대용량 첫 수집 시간을 고려해 여유 있게 설정합니다.
     const syncProvider = new cr.Provider(this, 'SyncProvider', {
       onEventHandler: syncLambda,
+      isCompleteHandler: syncIsCompleteLambda,
+      queryInterval: cdk.Duration.seconds(30),
+      totalTimeout: cdk.Duration.minutes(CONFIG.sync.completeTimeoutMinutes),
     });
 
+    // [학습] 속성 값이 바뀌어야 CloudFormation이 Update 이벤트를 보냅니다.
+    // 배포 시각을 넘겨 매 배포마다 동기화를 확인하게 하고, 문서가 그대로면 매니페스트 비교 후 바로 끝납니다.
     new cdk.CustomResource(this, 'SyncKbTrigger', {
       serviceToken: syncProvider.serviceToken,
+      properties: {
+        DeployedAt: new Date().toISOString(),
+      },
     });
 
     new cdk.CfnOutput(this, 'KnowledgeBaseId', {
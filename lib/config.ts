@@ -7,7 +7,10 @@ export const CONFIG = {
 
   // Bedrock 임베딩 모델
   embeddingModelId: 'amazon.titan-embed-text-v2:0',
-  vectorDimension: 1024,
+  // Titan v2는 256 / 512 / 1024 차원 출력을 지원합니다. 차원을 줄이면 벡터 저장 용량과 검색 비용이
+  // 비례해 줄고 검색 품질은 약간 떨어집니다 (workshop/data/quantization_report.py로 비교).
+  // 값을 바꾸면 S3 Vectors 인덱스와 Knowledge Base가 새로 만들어지므로 문서를 다시 동기화해야 합니다.
+  vectorDimension: 1024 as 256 | 512 | 1024,
 
   // Bedrock 생성 모델 (LLM)
   // 워크숍 rag_lib.py에서도 사용하는 모델
@@ -17,6 +20,16 @@ export const CONFIG = {
   // S3 문서 버킷
   documentBucketPrefix: 'rag-documents',
 
+  // KB 동기화 - 마지막 동기화 매니페스트와 비교해 바뀐 문서가 이 개수 이하면 문서 단위로 수집하고,
+  // 더 많으면 ingestion job으로 전체 동기화합니다. 바뀐 문서가 없으면 동기화를 건너뜁니다.
+  // 수집 완료는 지수 백오프로 폴링하며, 한 번의 호출에서 waitSeconds까지 기다리고
+  // 끝나지 않으면 isComplete 단계가 completeTimeoutMinutes까지 이어서 확인합니다.
+  sync: {
+    directMaxDocuments: 50,
+    waitSeconds: 240,
+    completeTimeoutMinutes: 60,
+  },
+
   // Knowledge Base 청킹 설정
   chunkingStrategy: 'FIXED_SIZE' as const,
   chunkMaxTokens: 512,
@@ -30,6 +43,75 @@ export const CONFIG = {
     stopSequences: [] as string[],
   },
 
-  // 대화 이력 관리 (워크숍 chatbot_lib.py 패턴)
-  maxConversationMessages: 20,
+  // 대화 이력 관리 - 메시지 개수 대신 입력 토큰 예산으로 최신 턴을 유지합니다.
+  // 예산 = 검색 컨텍스트 + 질문 + 대화 이력. historySummary를 켜면 잘려나간 이력을 요약해 유지합니다.
+  conversation: {
+    inputTokenBudget: 6000,
+    historySummary: false,
+  },
+
+  // (선택) Bedrock Guardrail 입력 사전 검사 - rag-converse에서 검색과 병렬로 apply_guardrail() 실행
+  // 워크숍 guardrails 실습에서 만든 가드레일 ID를 입력하면 활성화됩니다. 빈 문자열이면 비활성화.
+  guardrail: {
+    id: '',
+    version: 'DRAFT',
+  },
+
+  // /converse 스트리밍 (Lambda Web Adapter + Function URL RESPONSE_STREAM)
+  // Python 런타임은 응답 스트리밍을 기본 지원하지 않으므로 AWS 공식 Lambda Web Adapter 레이어를 사용합니다.
+  streaming: {
+    webAdapterLayerAccount: '753240598075',
+    webAdapterLayerVersion: 25,
+  },
+
+  // rag-query 답변 캐시 (Lambda 컨테이너 메모리, TTL + LRU)
+  // similarityThreshold: 0이면 정확 일치만, 0보다 크면 임베딩 코사인 유사도 일치도 사용 (예: 0.95)
+  answerCache: {
+    backend: 'memory',
+    maxEntries: 256,
+    ttlSeconds: 3600,
+    similarityThreshold: 0,
+  },
+
+  // rag-converse 대화 세션 저장소 - 클라이언트는 새 질문과 session_id만 보냅니다.
+  // dynamodb: 모든 Lambda 인스턴스가 세션을 공유 (배포 기본값), memory/sqlite: 컨테이너별 (로컬 실습용)
+  sessionStore: {
+    backend: 'dynamodb',
+    ttlSeconds: 86400,
+    maxMessages: 100,
+  },
+
+  // rag-converse 검색 후처리 - 점수가 낮은 결과 제거, 겹치는 청크 병합, 컨텍스트 토큰 예산으로 자르기
+  // minScore: 0이면 점수 필터 비활성화. rerank: true면 질문 단어 일치도로 결과 순서를 다시 정합니다.
+  // 적응형 numberOfResults: initialResults개로 시작하고, 최고 점수가 lowScore 미만이거나
+  // 여러 부분으로 된 질문이면 2배로 넓힙니다 (maxResults와 컨텍스트 토큰 예산이 상한).
+  retrieval: {
+    minScore: 0.2,
+    contextTokenBudget: 2000,
+    rerank: false,
+    initialResults: 3,
+    maxResults: 10,
+    lowScore: 0.5,
+  },
+
+  // 구조화된 추적 로그 (CloudWatch EMF) - 단계별 지연 시간과 토큰 사용량을 지표로 자동 추출
+  // logEvents: true면 요청 이벤트 전체를 로그에 출력, eventLogSampleRate: 0~1 비율로 샘플링하여 출력
+  tracing: {
+    namespace: 'BedrockRag',
+    logEvents: false,
+    eventLogSampleRate: 0,
+  },
+
+  // 배치 모드 - /query, /converse에 "queries" 목록을 보내면 한 번의 호출에서 병렬 처리합니다.
+  // maxConcurrency는 Bedrock 스로틀링을 피할 수 있는 범위로 유지합니다.
+  // 배치 항목의 Bedrock 호출은 readTimeoutSeconds 안에 끝나야 하고 maxAttempts번까지만 시도합니다.
+  // 남은 시간(timeBudgetMs, API Gateway 29초 제한)이 항목의 최악 소요 시간
+  // (순차 호출 수 × maxAttempts × (연결 2초 + readTimeoutSeconds) + 1초)보다 적으면 새 항목을 시작하지 않습니다.
+  batch: {
+    maxItems: 50,
+    maxConcurrency: 4,
+    readTimeoutSeconds: 6,
+    maxAttempts: 1,
+    timeBudgetMs: 29000,
+  },
 };
@@ -6,7 +6,7 @@
  * resourceCountIs: 특정 유형의 리소스 개수 확인
  */
 import * as cdk from 'aws-cdk-lib';
-import { Template } from 'aws-cdk-lib/assertions';
+import { Match, Template } from 'aws-cdk-lib/assertions';
 import { S3Stack } from '../lib/s3-stack';
 import { S3VectorsStack } from '../lib/s3-vectors-stack';
 import { BedrockKbStack } from '../lib/bedrock-kb-stack';
@@ -50,15 +50,63 @@ describe('BedrockKbStack', () => {
 });
 
 describe('ApiStack', () => {
-  test('Lambda 함수 2개와 API Gateway가 생성됨', () => {
+  test('Lambda 함수 3개와 API Gateway가 생성됨', () => {
     const app = new cdk.App();
     const stack = new ApiStack(app, 'TestApiStack', {
       knowledgeBaseId: 'test-kb-id',
     });
     const template = Template.fromStack(stack);
 
-    // rag-query + rag-converse 2개 Lambda
-    template.resourceCountIs('AWS::Lambda::Function', 2);
+    // rag-query + rag-converse + rag-converse-stream 3개 Lambda
+    template.resourceCountIs('AWS::Lambda::Function', 3);
     template.resourceCountIs('AWS::ApiGateway::RestApi', 1);
   });
+
+  test('스트리밍 Lambda가 RESPONSE_STREAM Function URL로 노출됨', () => {
+    const app = new cdk.App();
+    const stack = new ApiStack(app, 'TestApiStack', {
+      knowledgeBaseId: 'test-kb-id',
+    });
+    const template = Template.fromStack(stack);
+
+    template.hasResourceProperties('AWS::Lambda::Url', {
+      InvokeMode: 'RESPONSE_STREAM',
+    });
+  });
+
+  test('대화 세션 DynamoDB 테이블이 TTL과 함께 생성됨', () => {
+    const app = new cdk.App();
+    const stack = new ApiStack(app, 'TestApiStack', {
+      knowledgeBaseId: 'test-kb-id',
+    });
+    const template = Template.fromStack(stack);
+
+    template.hasResourceProperties('AWS::DynamoDB::Table', {
+      KeySchema: [{ AttributeName: 'session_id', KeyType: 'HASH' }],
+      TimeToLiveSpecification: { AttributeName: 'expires_at', Enabled: true },
+    });
+  });
+
+  test('스트리밍 Lambda가 이력 요약용 InvokeModel 권한을 가짐', () => {
+    const app = new cdk.App();
+    const stack = new ApiStack(app, 'TestApiStack', {
+      knowledgeBaseId: 'test-kb-id',
+    });
+    const template = Template.fromStack(stack);
+
+    // HISTORY_SUMMARY는 스트리밍 Lambda에도 주입되고, 요약은 converse()(InvokeModel)로 생성됩니다.
+    template.hasResourceProperties('AWS::Lambda::Function', {
+      FunctionName: Match.stringLikeRegexp('rag-converse-stream'),
+      Environment: { Variables: Match.objectLike({ HISTORY_SUMMARY: Match.anyValue() }) },
+    });
+    template.hasResourceProperties('AWS::IAM::Policy', {
+      Roles: [{ Ref: Match.stringLikeRegexp('RagConverseStreamLambda') }],
+      PolicyDocument: {
+        Statement: Match.arrayWith([
+          Match.objectLike({ Action: 'bedrock:InvokeModelWithResponseStream', Effect: 'Allow' }),
+          Match.objectLike({ Action: 'bedrock:InvokeModel', Effect: 'Allow' }),
+        ]),
+      },
+    });
+  });
 });
@@ -1,11 +1,43 @@
+import math
 import boto3
 
-MAX_MESSAGES = 20
+MAX_INPUT_TOKENS = 6000 #input token budget for the conversation history sent to the model
+MESSAGE_OVERHEAD_TOKENS = 4 #rough per-message cost of the role/content structure
+
+def estimate_tokens(text): #fast estimate: ~4 ASCII characters per token, ~1 token per other character
+    if not text:
+        return 0
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
 
 class ChatMessage(): #create a class that can store image and text messages
     def __init__(self, role, text):
         self.role = role
         self.text = text
+        self.tokens = estimate_tokens(text) + MESSAGE_OVERHEAD_TOKENS #computed once, reused on every turn
+
+
+def trim_history_to_budget(message_history, max_tokens=MAX_INPUT_TOKENS):
+    used = 0
+    turn_tokens = 0
+    keep_from = len(message_history)
+    
+    for i in range(len(message_history) - 1, -1, -1): #walk back from the newest message
+        turn_tokens += message_history[i].tokens
+        
+        if message_history[i].role != 'user': #a turn is complete once we reach its user message
+            continue
+        
+        if used + turn_tokens > max_tokens and keep_from < len(message_history): #always keep the newest turn
+            break
+        
+        used += turn_tokens
+        turn_tokens = 0
+        keep_from = i
+    
+    del message_history[0 : keep_from] #remove whole user/assistant turns so the history still starts with a user message
+    
+    return used
 
 
 def convert_chat_messages_to_converse_api(chat_messages):
@@ -31,10 +63,7 @@ def chat_with_model(message_history, new_text=None):
     new_text_message = ChatMessage('user', text=new_text)
     message_history.append(new_text_message)
     
-    number_of_messages = len(message_history)
-    
-    if number_of_messages > MAX_MESSAGES:
-        del message_history[0 : (number_of_messages - MAX_MESSAGES) * 2] #make sure we remove both the user and assistant responses
+    trim_history_to_budget(message_history) #keep the newest turns that fit the input token budget
     
     messages = convert_chat_messages_to_converse_api(message_history)
     
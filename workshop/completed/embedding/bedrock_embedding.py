@@ -1,10 +1,19 @@
 import json
+import os
+import sys
 import boto3
-from numpy import dot
-from numpy.linalg import norm
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../data"))
+from embedding_cache import get_cache
+from similarity import all_pairs_top_k
 
 
 def get_embedding(text):
+    #re-running the script reads the vectors from the shared embedding cache instead of calling Bedrock again
+    return get_cache().get_or_compute("amazon.titan-embed-text-v2:0", text, get_embedding_from_bedrock)
+
+
+def get_embedding_from_bedrock(text):
     session = boto3.Session()
     bedrock = session.client(service_name='bedrock-runtime') #creates a Bedrock client
     
@@ -24,14 +33,6 @@ class EmbedItem:
         self.text = text
         self.embedding = get_embedding(text)
 
-class ComparisonResult:
-    def __init__(self, text, similarity):
-        self.text = text
-        self.similarity = similarity
-
-def calculate_similarity(a, b): #See Cosine Similarity: https://en.wikipedia.org/wiki/Cosine_similarity
-    return dot(a, b) / (norm(a) * norm(b))
-
 #
 
 
@@ -46,20 +47,18 @@ for text in text_items:
 
 #
 
-for e1 in items:
+#See Cosine Similarity: https://en.wikipedia.org/wiki/Cosine_similarity
+#The embeddings are normalised once and every pair is scored with a single matrix multiplication,
+#instead of a dot product and two norms per pair (see ../../data/similarity.py)
+closest_indices, closest_scores = all_pairs_top_k([item.embedding for item in items], k=len(items))
+
+for e1, indices, scores in zip(items, closest_indices, closest_scores):
     print(f"Closest matches for '{e1.text}'")
     print ("----------------")
-    cosine_comparisons = []
-    
-    for e2 in items:
-        similarity_score = calculate_similarity(e1.embedding, e2.embedding)
-        
-        cosine_comparisons.append(ComparisonResult(e2.text, similarity_score)) #save the comparisons to a list
-        
-    cosine_comparisons.sort(key=lambda x: x.similarity, reverse=True) # list the closest matches first
     
-    for c in cosine_comparisons:
-        print("%.6f" % c.similarity, "\t", c.text)
+    for j, similarity_score in zip(indices, scores): # closest matches first
+        print("%.6f" % similarity_score, "\t", items[j].text)
     
     print()
 
+get_cache().print_stats()
@@ -1,17 +1,19 @@
 import itertools
-import boto3
 import json
 import base64
-import chromadb
+import os
+import sys
 from io import BytesIO
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../data"))
+import registry
+from embedding_cache import get_cache, multimodal_content
+
 
 #calls Bedrock to get a vector from either an image, text, or both
 def get_multimodal_vector(input_image_base64=None, input_text=None):
     
-    session = boto3.Session()
-
-    bedrock = session.client(service_name='bedrock-runtime') #creates a Bedrock client
+    bedrock = registry.get_bedrock_client('bedrock-runtime') #shared Bedrock client
     
     request_body = {}
     
@@ -38,11 +40,8 @@ def get_multimodal_vector(input_image_base64=None, input_text=None):
 
 
 def get_collection(path, collection_name):
-
-    client = chromadb.PersistentClient(path=path)
-    collection = client.get_collection(collection_name)
-    
-    return collection
+    #queries pass query_embeddings, so no embedding function is attached
+    return registry.get_collection(path, collection_name, model_name=None)
 
 
 
@@ -71,7 +70,12 @@ def get_similarity_search_results(search_term=None, search_image=None):
     
     search_image_base64 = (get_base64_from_bytes(search_image) if search_image else None)
 
-    query_embedding = get_multimodal_vector(input_text=search_term, input_image_base64=search_image_base64)
+    #the same search term/image pair is only embedded once
+    query_embedding = get_cache().get_or_compute(
+        "amazon.titan-embed-image-v1",
+        multimodal_content(search_term, search_image_base64),
+        lambda _: get_multimodal_vector(input_text=search_term, input_image_base64=search_image_base64)
+    )
     
     collection = get_collection("../../data/chroma", "images_collection")
     
@@ -1,7 +1,9 @@
+import os
+import sys
 import itertools
-import boto3
-import chromadb
-from chromadb.utils.embedding_functions import AmazonBedrockEmbeddingFunction
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../data"))
+import registry
 
 MAX_MESSAGES = 20
 
@@ -13,13 +15,7 @@ class ChatMessage(): #create a class that can store image and text messages
 #
 
 def get_collection(path, collection_name):
-    session = boto3.Session()
-    embedding_function = AmazonBedrockEmbeddingFunction(session=session, model_name="amazon.titan-embed-text-v2:0")
-    
-    client = chromadb.PersistentClient(path=path)
-    collection = client.get_collection(collection_name, embedding_function=embedding_function)
-    
-    return collection
+    return registry.get_collection(path, collection_name)
 
 #
 
@@ -152,8 +148,7 @@ def process_tool(response_message, messages, bedrock, tool_list):
 #
 
 def chat_with_model(message_history, new_text=None):
-    session = boto3.Session()
-    bedrock = session.client(service_name='bedrock-runtime') #creates a Bedrock client
+    bedrock = registry.get_bedrock_client('bedrock-runtime') #shared Bedrock client
     
     tool_list = get_tools()
     
@@ -1,15 +1,11 @@
-import boto3
-import chromadb
-from chromadb.utils.embedding_functions import AmazonBedrockEmbeddingFunction
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../data"))
+import registry
 
 def get_collection(path, collection_name):
-    session = boto3.Session()
-    embedding_function = AmazonBedrockEmbeddingFunction(session=session, model_name="amazon.titan-embed-text-v2:0")
-    
-    client = chromadb.PersistentClient(path=path)
-    collection = client.get_collection(collection_name, embedding_function=embedding_function)
-    
-    return collection
+    return registry.get_collection(path, collection_name)
 
 
 def get_vector_search_results(collection, question):
@@ -23,8 +19,7 @@ def get_vector_search_results(collection, question):
 
 
 def get_personalized_recommendation(question, description):
-    session = boto3.Session()
-    bedrock = session.client(service_name='bedrock-runtime')
+    bedrock = registry.get_bedrock_client('bedrock-runtime')
     
     message = {
         "role": "user",
@@ -52,8 +47,7 @@ def get_personalized_recommendation(question, description):
 
 def get_similarity_search_results(question):
 
-    session = boto3.Session()
-    bedrock = session.client(service_name='bedrock-runtime')
+    bedrock = registry.get_bedrock_client('bedrock-runtime')
     
     collection = get_collection("../../data/chroma", "services_collection")
     
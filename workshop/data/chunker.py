@@ -0,0 +1,328 @@
+import argparse, json, os, re, time, zlib
+from collections import deque
+import numpy as np
+
+#Local chunking engine that mirrors the Knowledge Base chunking strategies
+#
+#The Knowledge Base splits documents on the Bedrock side (lib/config.ts: FIXED_SIZE, 512 tokens, 20% overlap),
+#so nothing local used to see the same chunks. This module reproduces the three strategies offline:
+#
+#  - fixed: chunks of at most max_tokens; the last overlap_percentage of each chunk starts the next one
+#  - semantic: sentences are embedded and a chunk ends where the distance between neighbouring sentences
+#              is above the breakpoint_percentile of recent distances (or max_tokens is reached)
+#  - hierarchical: parent chunks (1500 tokens) split into child chunks (300 tokens); children are
+#                  embedded and searched, their parent text is what gets returned
+#
+#Everything is a generator: text is read in blocks, split into words and chunked as it streams past,
+#so a multi-GB corpus is chunked in constant memory. Text without whitespace (Chinese, Japanese, long URLs or
+#base64) has no word boundaries, so words longer than MAX_PIECE_CHARS are cut into MAX_PIECE_CHARS slices, and
+#a piece that alone exceeds max_tokens is hard-cut before it reaches a chunk. Token counts come from estimate_tokens, a
+#character-based estimate (no tokenizer download, no per-call model overhead); it will not match the
+#Bedrock tokenizer exactly, so expect chunk boundaries a few words apart from the Knowledge Base's.
+#
+#chunk_items(...) turns chunks into the {'id', 'document', 'metadata', 'input'} items prefetch_embeddings
+#expects, so chunks go straight into an embedding store (embedding_store.py) and a local index (vector_index.py).
+#
+#python chunker.py ../../sampledata/amazon-bedrock-faq.txt --mode fixed --output chunks.jsonl
+#python chunker.py ../../sampledata --mode hierarchical --embed bedrock_faq_chunks
+
+#defaults from lib/config.ts and the Bedrock chunking configuration defaults
+MAX_TOKENS = 512
+OVERLAP_PERCENTAGE = 20
+SEMANTIC_MAX_TOKENS = 300
+SEMANTIC_BUFFER_SIZE = 0
+BREAKPOINT_PERCENTILE = 95
+BREAKPOINT_HISTORY = 200 #recent sentence distances the percentile is taken over
+PARENT_MAX_TOKENS = 1500
+CHILD_MAX_TOKENS = 300
+HIERARCHICAL_OVERLAP_TOKENS = 60
+
+MODES = ('fixed', 'semantic', 'hierarchical')
+TEXT_EXTENSIONS = ('.txt', '.md')
+BLOCK_SIZE = 1 << 16 #characters read per block
+MAX_PIECE_CHARS = 64 #longer runs without whitespace are cut; at most 64 tokens even for CJK text
+
+PIECE = re.compile(r"\s*\S+\s*")
+SENTENCE_END = re.compile(r"(?:[.!?。]['\")\]]*\s+|\n\s*\n)$")
+WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text):
+    #~4 characters per token for ASCII text, ~1 token per character for Korean and other non-ASCII text
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    return max(1, (ascii_chars + 3) // 4 + len(text) - ascii_chars)
+
+
+def split_long(piece, max_chars=MAX_PIECE_CHARS):
+    if len(piece) <= max_chars:
+        return [piece]
+    return [piece[i:i + max_chars] for i in range(0, len(piece), max_chars)]
+
+
+def read_pieces(stream, block_size=BLOCK_SIZE, max_piece_chars=MAX_PIECE_CHARS):
+    #yields (offset, word with its trailing whitespace); the last word of a block is carried over,
+    #since the next block may continue the word or its whitespace. Words are cut at max_piece_chars,
+    #so the carry stays small even when a block has no whitespace at all
+    offset = 0
+    carry = ''
+    while True:
+        block = stream.read(block_size)
+        text = carry + block
+        pieces = [part for piece in PIECE.findall(text) for part in split_long(piece, max_piece_chars)]
+        if block and pieces:
+            carry = pieces.pop()
+        else:
+            carry = ''
+        for piece in pieces:
+            yield offset, piece
+            offset += len(piece)
+        if not block:
+            return
+
+
+def text_pieces(text):
+    return read_pieces(_StringStream(text))
+
+
+class _StringStream:
+    #minimal read() over a string, so chunking a string and a file share one code path
+
+    def __init__(self, text):
+        self.text = text
+        self.position = 0
+
+    def read(self, size):
+        block = self.text[self.position:self.position + size]
+        self.position += len(block)
+        return block
+
+
+def cut_pieces(pieces, max_tokens):
+    #hard cut for pieces that alone exceed max_tokens, so no chunk is ever larger than max_tokens
+    for offset, piece in pieces:
+        if estimate_tokens(piece) <= max_tokens:
+            yield offset, piece
+            continue
+        start = ascii_chars = other = 0
+        for i, char in enumerate(piece):
+            if i > start and (ascii_chars + char.isascii() + 3) // 4 + other + (not char.isascii()) > max_tokens:
+                yield offset + start, piece[start:i]
+                start = i
+                ascii_chars = other = 0
+            if char.isascii():
+                ascii_chars += 1
+            else:
+                other += 1
+        yield offset + start, piece[start:]
+
+
+def fixed_chunks(pieces, max_tokens=MAX_TOKENS, overlap_tokens=None):
+    #yields (offset, text, tokens); overlap_tokens defaults to OVERLAP_PERCENTAGE of max_tokens
+    if overlap_tokens is None:
+        overlap_tokens = max_tokens * OVERLAP_PERCENTAGE // 100
+    window = deque() #(offset, piece, tokens)
+    total = 0
+    fresh = 0 #pieces added since the last chunk was emitted
+
+    for offset, piece in cut_pieces(pieces, max_tokens):
+        tokens = estimate_tokens(piece)
+        if window and total + tokens > max_tokens:
+            yield window[0][0], ''.join(p for _, p, _ in window).strip(), total
+            fresh = 0
+            while window and (total > overlap_tokens or total + tokens > max_tokens):
+                total -= window.popleft()[2]
+        window.append((offset, piece, tokens))
+        total += tokens
+        fresh += 1
+
+    if fresh:
+        yield window[0][0], ''.join(p for _, p, _ in window).strip(), total
+
+
+def sentences(pieces, max_tokens):
+    #yields (offset, sentence, tokens); sentences longer than max_tokens are cut
+    offset = None
+    parts = []
+    total = 0
+    for piece_offset, piece in cut_pieces(pieces, max_tokens):
+        tokens = estimate_tokens(piece)
+        if parts and total + tokens > max_tokens:
+            yield offset, ''.join(parts), total
+            parts, total = [], 0
+        if not parts:
+            offset = piece_offset
+        parts.append(piece)
+        total += tokens
+        if SENTENCE_END.search(piece):
+            yield offset, ''.join(parts), total
+            parts, total = [], 0
+    if parts:
+        yield offset, ''.join(parts), total
+
+
+def with_context(items, buffer_size):
+    #yields (item, text of the item with buffer_size neighbours on each side) using a bounded lookahead
+    previous = deque(maxlen=buffer_size)
+    pending = deque()
+    for item in items:
+        pending.append(item)
+        if len(pending) > buffer_size:
+            current = pending.popleft()
+            yield current, ''.join(s[1] for s in list(previous) + [current] + list(pending))
+            previous.append(current)
+    while pending:
+        current = pending.popleft()
+        yield current, ''.join(s[1] for s in list(previous) + [current] + list(pending))
+        previous.append(current)
+
+
+def hashed_embedding(text, dimensions=256):
+    #offline stand-in for a text embedding: word counts hashed into a fixed-size unit vector
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in WORD.findall(text.lower()):
+        vector[zlib.crc32(word.encode('utf-8')) % dimensions] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def semantic_chunks(pieces, embed_fn=hashed_embedding, max_tokens=SEMANTIC_MAX_TOKENS, buffer_size=SEMANTIC_BUFFER_SIZE,
+                    breakpoint_percentile=BREAKPOINT_PERCENTILE, history=BREAKPOINT_HISTORY):
+    #yields (offset, text, tokens); the percentile is taken over the last `history` distances so memory stays bounded
+    distances = deque(maxlen=history)
+    previous_embedding = None
+    offset = None
+    parts = []
+    total = 0
+
+    for (sentence_offset, sentence, tokens), context in with_context(sentences(pieces, max_tokens), buffer_size):
+        embedding = np.asarray(embed_fn(context.strip()), dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        embedding = embedding / norm if norm else embedding
+
+        breakpoint = False
+        if previous_embedding is not None:
+            distance = 1.0 - float(embedding @ previous_embedding)
+            if len(distances) >= 2:
+                breakpoint = distance > np.percentile(distances, breakpoint_percentile)
+            distances.append(distance)
+        previous_embedding = embedding
+
+        if parts and (breakpoint or total + tokens > max_tokens):
+            yield offset, ''.join(parts).strip(), total
+            parts, total = [], 0
+        if not parts:
+            offset = sentence_offset
+        parts.append(sentence)
+        total += tokens
+
+    if parts:
+        yield offset, ''.join(parts).strip(), total
+
+
+def hierarchical_chunks(pieces, parent_max_tokens=PARENT_MAX_TOKENS, child_max_tokens=CHILD_MAX_TOKENS,
+                        overlap_tokens=HIERARCHICAL_OVERLAP_TOKENS):
+    #yields (offset, child text, tokens, parent index, parent text); overlap applies within each layer
+    for parent_index, (parent_offset, parent, _) in enumerate(fixed_chunks(pieces, parent_max_tokens, overlap_tokens)):
+        for child_offset, child, tokens in fixed_chunks(text_pieces(parent), child_max_tokens, overlap_tokens):
+            yield parent_offset + child_offset, child, tokens, parent_index, parent
+
+
+def chunk_stream(stream, source, mode='fixed', max_tokens=None, overlap_percentage=OVERLAP_PERCENTAGE,
+                 embed_fn=hashed_embedding, **options):
+    #yields {'id', 'text', 'tokens', 'metadata'} records; ids are "<source>#<chunk number>", stable across runs
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode} (expected one of {MODES})")
+
+    pieces = read_pieces(stream)
+    if mode == 'fixed':
+        max_tokens = max_tokens or MAX_TOKENS
+        chunks = ((o, t, n, None, None) for o, t, n in fixed_chunks(pieces, max_tokens, max_tokens * overlap_percentage // 100))
+    elif mode == 'semantic':
+        chunks = ((o, t, n, None, None) for o, t, n in
+                  semantic_chunks(pieces, embed_fn, max_tokens=max_tokens or SEMANTIC_MAX_TOKENS, **options))
+    else:
+        chunks = hierarchical_chunks(pieces, child_max_tokens=max_tokens or CHILD_MAX_TOKENS, **options)
+
+    for number, (offset, text, tokens, parent_index, parent) in enumerate(chunks):
+        metadata = {'source': source, 'chunk': number, 'offset': offset, 'mode': mode}
+        record = {'id': f"{source}#{number}", 'text': text, 'tokens': tokens, 'metadata': metadata}
+        if parent is not None:
+            metadata['parent'] = f"{source}#p{parent_index}"
+            record['parent_text'] = parent
+        yield record
+
+
+def source_files(paths):
+    #files as given, and every .txt/.md file under a directory
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in sorted(os.walk(path)):
+                for name in sorted(names):
+                    if name.endswith(TEXT_EXTENSIONS):
+                        yield os.path.join(directory, name)
+        else:
+            yield path
+
+
+def chunk_files(paths, mode='fixed', **options):
+    for path in source_files(paths):
+        with open(path, encoding='utf-8') as f:
+            yield from chunk_stream(f, os.path.basename(path), mode=mode, **options)
+
+
+def chunk_items(records):
+    #prefetch_embeddings items: the chunk text is embedded; hierarchical chunks return their parent text
+    for record in records:
+        yield {
+            'id': record['id'],
+            'document': record.get('parent_text', record['text']),
+            'metadata': record['metadata'],
+            'input': record['text'],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk text files the way the Knowledge Base does")
+    parser.add_argument('paths', nargs='+', help="text files or directories")
+    parser.add_argument('--mode', choices=MODES, default='fixed')
+    parser.add_argument('--max-tokens', type=int, help="chunk size (child size for hierarchical)")
+    parser.add_argument('--overlap-percentage', type=int, default=OVERLAP_PERCENTAGE)
+    parser.add_argument('--titan', action='store_true', help="semantic mode: embed sentences with Titan instead of hashed word counts")
+    parser.add_argument('--output', help="write the chunks as JSON lines here")
+    parser.add_argument('--embed', metavar='STORE', help="embed the chunks into this embedding store (see prefetch_embeddings.py)")
+    args = parser.parse_args()
+
+    options = {'max_tokens': args.max_tokens, 'overlap_percentage': args.overlap_percentage}
+    if args.titan:
+        from prefetch_embeddings import get_cached_text_embedding
+        options['embed_fn'] = get_cached_text_embedding
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else None
+    items = [] if args.embed else None
+    count = tokens = 0
+    start = time.perf_counter()
+
+    for record in chunk_files(args.paths, mode=args.mode, **options):
+        count += 1
+        tokens += record['tokens']
+        if output:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if items is not None:
+            items.extend(chunk_items([record]))
+
+    elapsed = time.perf_counter() - start
+    print(f"{count} {args.mode} chunks, {tokens / count if count else 0:.0f} tokens on average, {elapsed * 1000:.1f} ms")
+    if output:
+        output.close()
+        print(f"Wrote {args.output}")
+
+    if items:
+        from embedding_store import store_name
+        from prefetch_embeddings import EMBEDDING_DIMENSIONS, prefetch_embeddings
+        output_name = store_name(args.embed, EMBEDDING_DIMENSIONS)
+        prefetch_embeddings(items, output_name)
+        print(f"Saved {output_name}.npy and {output_name}.meta.json to disk!")
+
+
+if __name__ == "__main__":
+    main()
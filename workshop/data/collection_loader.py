@@ -0,0 +1,103 @@
+import time
+import numpy as np
+
+#Bulk loader for Chroma collections from an embedding store (see embedding_store.py)
+#
+#Rows are streamed from the memory-mapped store in batches and written with one add/upsert call per
+#batch, instead of one collection.add call (and one write transaction + index update) per row.
+#
+#modes:
+#  - incremental (default): compare documents, metadata and embeddings with what's already in the
+#    collection and only write new or changed rows; with prune=True, rows that are no longer in the store are deleted
+#  - upsert: write every row, replacing existing ones
+#  - add: write every row; only for empty collections (existing ids raise an error)
+
+DEFAULT_BATCH_SIZE = 1000
+MODES = ('incremental', 'upsert', 'add')
+
+
+def max_batch_size(collection, batch_size):
+    #Chroma rejects batches larger than the client's limit
+    try:
+        return min(batch_size, collection._client.get_max_batch_size())
+    except AttributeError:
+        return batch_size
+
+
+def changed_rows(collection, ids, documents, metadatas, embeddings):
+    #returns the indexes (within the batch) of rows that are new or differ from the collection
+    #embeddings are compared too, so re-embedding with another model or dimension count rewrites the rows
+    existing = collection.get(ids=ids, include=['documents', 'metadatas', 'embeddings'])
+    current = {
+        existing_id: (document, metadata, embedding)
+        for existing_id, document, metadata, embedding in
+        zip(existing['ids'], existing['documents'], existing['metadatas'], existing['embeddings'])
+    }
+
+    changed = []
+    for i, row_id in enumerate(ids):
+        if row_id not in current:
+            changed.append(i)
+            continue
+        document, metadata, embedding = current[row_id]
+        embedding = np.asarray(embedding, dtype=np.float32)
+        if (document, metadata) != (documents[i], metadatas[i]) or embedding.shape != embeddings[i].shape \
+                or not np.allclose(embedding, embeddings[i], rtol=0, atol=1e-6):
+            changed.append(i)
+
+    return changed, len(ids) - len(current)
+
+
+def load_collection(collection, store, batch_size=DEFAULT_BATCH_SIZE, mode='incremental', prune=False):
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode} (expected one of {MODES})")
+
+    batch_size = max_batch_size(collection, batch_size)
+    stats = {'rows': len(store), 'written': 0, 'new': 0, 'unchanged': 0, 'deleted': 0, 'batches': 0}
+    start_time = time.perf_counter()
+
+    for start in range(0, len(store), batch_size):
+        stop = min(start + batch_size, len(store))
+        ids = store.ids[start:stop]
+        documents = store.documents[start:stop]
+        metadatas = store.metadatas[start:stop]
+        selected = list(range(stop - start))
+        embeddings = np.asarray(store.vectors(start, stop), dtype=np.float32)
+
+        if mode == 'incremental':
+            selected, new_rows = changed_rows(collection, ids, documents, metadatas, embeddings)
+            stats['new'] += new_rows
+            stats['unchanged'] += (stop - start) - len(selected)
+            if not selected:
+                continue
+
+        if len(selected) < stop - start:
+            embeddings = embeddings[selected]
+
+        write = collection.add if mode == 'add' else collection.upsert
+        write(
+            ids=[ids[i] for i in selected],
+            documents=[documents[i] for i in selected],
+            metadatas=[metadatas[i] for i in selected],
+            embeddings=embeddings
+        )
+
+        stats['written'] += len(selected)
+        stats['batches'] += 1
+
+    if prune:
+        source_ids = set(store.ids)
+        stale = [row_id for row_id in collection.get(include=[])['ids'] if row_id not in source_ids]
+        for start in range(0, len(stale), batch_size):
+            collection.delete(ids=stale[start:start + batch_size])
+        stats['deleted'] = len(stale)
+
+    elapsed = time.perf_counter() - start_time
+    stats['seconds'] = round(elapsed, 3)
+    stats['rows_per_second'] = round(stats['rows'] / elapsed, 1) if elapsed > 0 else 0.0
+
+    print(f"Loaded {collection.name}: {stats['written']} written in {stats['batches']} batches "
+          f"({stats['new']} new, {stats['unchanged']} unchanged, {stats['deleted']} deleted), "
+          f"{stats['rows']} rows in {elapsed:.2f}s ({stats['rows_per_second']} rows/sec)")
+
+    return stats
@@ -0,0 +1,285 @@
+import argparse, hashlib, json, os, re, shutil, time, zlib
+import numpy as np
+from chunker import estimate_tokens, source_files
+from embedding_store import DEFAULT_DIMENSIONS
+
+#Near-duplicate detection before embedding (MinHash + LSH)
+#
+#Document buckets collect near-identical versions of the same text (re-exports, copies with a changed
+#footer, old and new revisions). Each one is embedded, stored and indexed, and together they crowd the
+#top k with the same answer. This stage collapses them before anything is embedded:
+#
+#  - exact duplicates (same text after whitespace/case normalisation) are found with a content hash
+#  - near duplicates: each text becomes a set of word shingles (runs of SHINGLE_SIZE words), and a MinHash
+#    signature of NUM_PERM values estimates the Jaccard similarity of two shingle sets. LSH splits the
+#    signature into bands; only records sharing a band are compared, so each record is checked against a
+#    handful of candidates instead of the whole corpus
+#
+#Records are streamed in one pass: a canonical record is emitted as soon as it is accepted, and only ids,
+#content hashes and one NUM_PERM * 8 byte signature per canonical record stay in memory, never the text.
+#The first record of a group is canonical; later ones are dropped and collected in a separate
+#canonical id -> alias ids map, which is patched into the output afterwards as 'aliases' metadata
+#(comma-separated ids, since Chroma metadata values must be scalars) with a 'duplicates' count.
+#Texts without any word (empty, punctuation only) have no shingles; they are matched on the content hash only.
+#
+#The report shows what was saved: embed calls, tokens sent to the embedding model, and index size
+#(one DEFAULT_DIMENSIONS float32 vector plus the document text per dropped record).
+#
+#python dedup.py ../../sampledata --kb-dir dedup_kb
+#python dedup.py chunks.jsonl --threshold 0.85 --output unique.jsonl --report dedup_report.json
+
+THRESHOLD = 0.8 #estimated Jaccard similarity at or above which two records are duplicates
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+SHINGLE_CHUNK = 4096 #shingles hashed at once; bounds the NUM_PERM x chunk work matrix
+PRIME = 4294967311 #smallest prime above 2**32
+
+WORD = re.compile(r"\w+")
+
+
+def normalize_text(text):
+    return " ".join(text.lower().split())
+
+
+def shingle_hashes(text, size=SHINGLE_SIZE):
+    #32-bit hashes of the distinct word shingles; texts shorter than one shingle become a single shingle
+    words = WORD.findall(text.lower())
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    count = max(1, len(words) - size + 1)
+    hashes = {zlib.crc32(" ".join(words[i:i + size]).encode('utf-8')) for i in range(count)}
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+def lsh_bands(num_perm, threshold):
+    #(bands, rows): pairs at the threshold should almost always share a band, so pick the split whose
+    #S-curve midpoint (1 / bands) ** (1 / rows) is closest to 0.85 * threshold
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - 0.85 * threshold))
+
+
+class Deduplicator:
+
+    def __init__(self, threshold=THRESHOLD, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, seed=1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 31, num_perm, dtype=np.uint64)
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands, self.rows = lsh_bands(num_perm, threshold)
+        self.exact = {} #content hash -> canonical id
+        self.buckets = {} #(band, band values) -> canonical ids
+        self.signatures = {} #canonical id -> signature
+
+    def signature(self, text):
+        #values are < PRIME, which is above 2**32, so they stay uint64; None when the text has no shingles
+        hashes = shingle_hashes(text, self.shingle_size)
+        if len(hashes) == 0:
+            return None
+        signature = np.full(len(self.a), PRIME, dtype=np.uint64)
+        for start in range(0, len(hashes), SHINGLE_CHUNK):
+            x = hashes[start:start + SHINGLE_CHUNK]
+            np.minimum(signature, ((self.a[:, None] * x[None, :] + self.b[:, None]) % PRIME).min(axis=1), out=signature)
+        return signature
+
+    def band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def add(self, record_id, text):
+        #returns (canonical id, 'exact' or 'near') if record_id duplicates an earlier record, else (None, None)
+        content = hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()
+        if content in self.exact:
+            return self.exact[content], 'exact'
+        self.exact[content] = record_id
+
+        signature = self.signature(text)
+        if signature is None:
+            return None, None
+        keys = self.band_keys(signature)
+        best, best_similarity = None, 0.0
+        for key in keys:
+            for candidate in self.buckets.get(key, ()):
+                similarity = float(np.mean(self.signatures[candidate] == signature))
+                if similarity > best_similarity:
+                    best, best_similarity = candidate, similarity
+
+        if best is not None and best_similarity >= self.threshold:
+            self.exact[content] = best
+            return best, 'near'
+
+        self.signatures[record_id] = signature
+        for key in keys:
+            self.buckets.setdefault(key, []).append(record_id)
+        return None, None
+
+
+def new_report():
+    return {'records': 0, 'canonical': 0, 'exact_duplicates': 0, 'near_duplicates': 0,
+            'embed_calls_saved': 0, 'tokens_saved': 0, 'index_bytes_saved': 0, 'seconds': 0.0}
+
+
+def deduplicate(records, text_fn, threshold=THRESHOLD, dimensions=DEFAULT_DIMENSIONS, report=None, aliases=None, **options):
+    #records: iterable of dicts with 'id' and 'metadata'; yields each canonical record (unchanged) as soon as it is accepted
+    #dropped ids are appended to aliases (canonical id -> [ids]) and counted in report; both are complete once the
+    #generator is exhausted (see with_aliases)
+    deduplicator = Deduplicator(threshold, **options)
+    report = new_report() if report is None else report
+    aliases = {} if aliases is None else aliases
+    start = time.perf_counter()
+
+    for record in records:
+        text = text_fn(record)
+        report['records'] += 1
+        duplicate_of, kind = deduplicator.add(record['id'], text)
+        if duplicate_of is None:
+            report['canonical'] += 1
+            yield record
+            continue
+
+        aliases.setdefault(duplicate_of, []).append(record['id'])
+        report[kind + '_duplicates'] += 1
+        report['embed_calls_saved'] += 1
+        report['tokens_saved'] += estimate_tokens(text)
+        report['index_bytes_saved'] += dimensions * 4 + len(record.get('document', text).encode('utf-8'))
+
+    report['seconds'] = round(time.perf_counter() - start, 3)
+
+
+def with_aliases(record, aliases):
+    #copy of record whose metadata gains 'aliases' and 'duplicates' when anything collapsed into it
+    if record['id'] not in aliases:
+        return record
+    return dict(record, metadata=dict(record.get('metadata') or {},
+                                      aliases=",".join(aliases[record['id']]),
+                                      duplicates=len(aliases[record['id']])))
+
+
+def deduplicate_items(items, threshold=THRESHOLD, dimensions=DEFAULT_DIMENSIONS):
+    #prefetch_embeddings items: duplicates are judged on 'input', the text that would be embedded
+    #items are already a list here, so the aliases are patched in after the pass; returns (canonical items, report)
+    report, aliases = new_report(), {}
+    canonical = list(deduplicate(items, lambda item: item['input'], threshold, dimensions, report, aliases))
+    return [with_aliases(item, aliases) for item in canonical], report
+
+
+def print_report(report):
+    duplicates = report['exact_duplicates'] + report['near_duplicates']
+    share = duplicates / report['records'] if report['records'] else 0.0
+    print(f"Dedup: {report['records']} records -> {report['canonical']} canonical "
+          f"({report['exact_duplicates']} exact + {report['near_duplicates']} near duplicates, {share:.1%}) in {report['seconds']}s")
+    print(f"  saved {report['embed_calls_saved']} embed calls, ~{report['tokens_saved']} tokens, "
+          f"{report['index_bytes_saved'] / 1e6:.2f} MB of index")
+
+
+def read_records(paths):
+    #text files become one record each (id = path); .jsonl lines are chunker records or prefetch items
+    for path in paths:
+        if path.endswith('.jsonl'):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        record.setdefault('metadata', {})
+                        yield record
+        else:
+            for file_path in source_files([path]):
+                with open(file_path, encoding='utf-8') as f:
+                    text = f.read()
+                yield {'id': file_path, 'document': text, 'metadata': {}, 'path': file_path}
+
+
+def record_text(record):
+    return record.get('input') or record.get('text') or record.get('document') or ''
+
+
+def copy_kb_document(record, directory, root):
+    #copies one canonical file to directory (path relative to root); returns the target path
+    target = os.path.join(directory, os.path.relpath(record['path'], root))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.copyfile(record['path'], target)
+    return target
+
+
+def write_kb_sidecars(targets, aliases, root):
+    #targets: canonical id (source path) -> copied path. Writes a .metadata.json sidecar carrying the aliases;
+    #an existing sidecar's metadataAttributes are kept. Returns the normalised paths of everything written.
+    written = set()
+    for source, target in targets.items():
+        written.add(os.path.normpath(target))
+        attributes = {}
+        if os.path.exists(source + ".metadata.json"):
+            with open(source + ".metadata.json", encoding='utf-8') as f:
+                attributes = json.load(f).get('metadataAttributes', {})
+        if source in aliases:
+            attributes.update(aliases=[os.path.relpath(a, root) for a in aliases[source]], duplicates=len(aliases[source]))
+        if attributes:
+            with open(target + ".metadata.json", 'w', encoding='utf-8') as f:
+                json.dump({'metadataAttributes': attributes}, f, ensure_ascii=False)
+            written.add(os.path.normpath(target + ".metadata.json"))
+    return written
+
+
+def remove_stale_kb_documents(directory, written):
+    #files from earlier runs that are now duplicates are removed
+    for file_path in source_files([directory]):
+        if os.path.normpath(file_path) not in written:
+            os.remove(file_path)
+            if os.path.exists(file_path + ".metadata.json"):
+                os.remove(file_path + ".metadata.json")
+
+
+def patch_aliases(path, aliases):
+    #rewrites the streamed JSON lines output line by line, adding the aliases that were only known at the end
+    with open(path, encoding='utf-8') as source, open(path + ".tmp", 'w', encoding='utf-8') as target:
+        for line in source:
+            target.write(json.dumps(with_aliases(json.loads(line), aliases), ensure_ascii=False) + "\n")
+    os.replace(path + ".tmp", path)
+
+
+def kb_root(paths):
+    root = paths[0] if len(paths) == 1 else os.path.commonpath([os.path.abspath(p) for p in paths])
+    return os.path.dirname(root) if os.path.isfile(root) else root
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collapse near-duplicate documents before embedding")
+    parser.add_argument('paths', nargs='+', help="text files, directories, or .jsonl records (chunker.py / faq_parser.py output)")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--dimensions', type=int, default=int(os.environ.get("EMBEDDING_DIMENSIONS", DEFAULT_DIMENSIONS)))
+    parser.add_argument('--output', help="write the canonical records as JSON lines here")
+    parser.add_argument('--kb-dir', help="copy the canonical text files here, with aliases in .metadata.json sidecars")
+    parser.add_argument('--report', help="write the report as JSON here")
+    args = parser.parse_args()
+
+    report, aliases, targets = new_report(), {}, {}
+    root = kb_root(args.paths) if args.kb_dir else None
+    output = open(args.output, 'w', encoding='utf-8') if args.output else None
+
+    #canonical records are written as they stream out of the deduplicator; aliases are patched in afterwards
+    try:
+        for record in deduplicate(read_records(args.paths), record_text, args.threshold, args.dimensions, report, aliases):
+            if output:
+                output.write(json.dumps({key: value for key, value in record.items() if key != 'path'}, ensure_ascii=False) + "\n")
+            if args.kb_dir and 'path' in record:
+                targets[record['id']] = copy_kb_document(record, args.kb_dir, root)
+    finally:
+        if output:
+            output.close()
+    print_report(report)
+
+    if args.output:
+        patch_aliases(args.output, aliases)
+        print(f"Wrote {args.output}")
+
+    if args.kb_dir:
+        remove_stale_kb_documents(args.kb_dir, write_kb_sidecars(targets, aliases, root))
+        print(f"Wrote {len(targets)} documents to {args.kb_dir}")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({'config': vars(args), 'report': report}, f, indent=2)
+        print(f"Wrote {args.report}")
+
+
+if __name__ == "__main__":
+    main()
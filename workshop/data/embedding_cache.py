@@ -0,0 +1,232 @@
+import hashlib, json, os, sqlite3, threading, time
+from array import array
+
+#Persistent embedding cache shared by every script that calls a Titan embedding model
+#
+#Entries are keyed by (model id, dimensions, normalize, sha256 of the input), so the same text or
+#image is only ever embedded once per model configuration, across runs and across processes.
+#Omitted dimensions/normalize are filled in with the model's defaults (MODEL_DEFAULTS) before keying.
+#
+#  - storage: one SQLite file in WAL mode; several processes can read and write it at the same time
+#  - values: float32 bytes (4 bytes per dimension instead of ~20 characters of JSON)
+#  - eviction: least recently used entries are removed once the file holds more than max_bytes
+#  - stats: hits, misses and hit rate for this process, plus entry count and size on disk
+
+DEFAULT_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_cache.sqlite3")
+)
+DEFAULT_MAX_BYTES = int(os.environ.get("EMBEDDING_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+EVICT_CHECK_EVERY = 64 #puts between size checks; the check is a full-table SUM
+
+
+def content_hash(content):
+    #content is the text, or the base64 string / raw bytes of an image
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+
+def multimodal_content(input_text=None, input_image_base64=None):
+    #cache content for a multimodal request; a text-only, image-only and text+image request never collide
+    return f"text:{input_text or ''}\nimage:{input_image_base64 or ''}"
+
+
+#(dimensions, normalize) each model uses when a request leaves them out; cache keys are built from the
+#effective values, so {"inputText": t} and {"inputText": t, "dimensions": 1024, "normalize": true} share an entry
+MODEL_DEFAULTS = {
+    'amazon.titan-embed-text-v2:0': (1024, True),
+    'amazon.titan-embed-image-v1': (1024, None),
+}
+
+
+def cache_key(model_id, content, dimensions=None, normalize=None):
+    default_dimensions, default_normalize = MODEL_DEFAULTS.get(model_id, (None, None))
+    dimensions = default_dimensions if dimensions is None else dimensions
+    normalize = default_normalize if normalize is None else normalize
+    return f"{model_id}|{dimensions}|{normalize}|{content_hash(content)}"
+
+
+class EmbeddingCache:
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+        #one connection shared by this process's threads; SQLite's own file locking handles other processes
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    def get_many(self, model_id, contents, dimensions=None, normalize=None):
+        #returns a list with the cached embedding (list of floats) or None for each input
+        keys = [cache_key(model_id, c, dimensions, normalize) for c in contents]
+        found = {}
+
+        with self._lock, self._conn:
+            for start in range(0, len(keys), 500): #SQLite limits the number of bound parameters
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+
+            self.hits += sum(1 for k in keys if k in found)
+            self.misses += sum(1 for k in keys if k not in found)
+
+        return [array('f', found[k]).tolist() if k in found else None for k in keys]
+
+    def put_many(self, model_id, contents, embeddings, dimensions=None, normalize=None):
+        now = time.time()
+        rows = []
+        for content, embedding in zip(contents, embeddings):
+            vector = array('f', embedding).tobytes()
+            rows.append((cache_key(model_id, content, dimensions, normalize), vector, len(vector), now))
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, size, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._puts += len(rows)
+            if self._puts >= EVICT_CHECK_EVERY:
+                self._puts = 0
+                self._evict()
+
+    def get(self, model_id, content, dimensions=None, normalize=None):
+        return self.get_many(model_id, [content], dimensions, normalize)[0]
+
+    def put(self, model_id, content, embedding, dimensions=None, normalize=None):
+        self.put_many(model_id, [content], [embedding], dimensions, normalize)
+
+    def get_or_compute(self, model_id, content, compute_fn, dimensions=None, normalize=None):
+        #compute_fn(content) is only called on a miss
+        embedding = self.get(model_id, content, dimensions, normalize)
+        if embedding is None:
+            embedding = compute_fn(content)
+            self.put(model_id, content, embedding, dimensions, normalize)
+        return embedding
+
+    def _evict(self):
+        #called with the lock held; trims to 90% of max_bytes so we don't evict on every put
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = total - int(self.max_bytes * 0.9)
+        removed = 0
+        freed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_used").fetchall():
+            if freed >= target:
+                break
+            self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+            freed += size
+            removed += 1
+
+        self.evictions += removed
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': entries,
+                'bytes': size,
+            }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%} hit rate), "
+              f"{stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB")
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache():
+    #one shared cache per process
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
+
+
+def cached(model_id, compute_fn, dimensions=None, normalize=None):
+    #wraps compute_fn(content) -> embedding so repeated inputs are served from the cache
+    def cached_fn(content):
+        return get_cache().get_or_compute(model_id, content, compute_fn, dimensions, normalize)
+
+    return cached_fn
+
+
+class TitanTextEmbeddingFunction:
+    #query embedding function for stores written at a reduced Titan v2 dimension (256 or 512);
+    #Chroma's AmazonBedrockEmbeddingFunction always gets the model's default 1024 dimensions
+
+    def __init__(self, client, model_id, dimensions, normalize=True):
+        self.client = client
+        self.model_id = model_id
+        self.dimensions = dimensions
+        self.normalize = normalize
+
+    def embed(self, text):
+        response = self.client.invoke_model(
+            body=json.dumps({"inputText": text, "dimensions": self.dimensions, "normalize": self.normalize}),
+            modelId=self.model_id,
+            accept="application/json",
+            contentType="application/json"
+        )
+        return json.loads(response['body'].read())['embedding']
+
+    def __call__(self, input):
+        cache = get_cache()
+        return [cache.get_or_compute(self.model_id, text, self.embed, self.dimensions, self.normalize) for text in input]
+
+
+try:
+    import numpy as np
+    from chromadb.utils.embedding_functions import AmazonBedrockEmbeddingFunction
+except ImportError: #the prefetch scripts only need the cache itself
+    AmazonBedrockEmbeddingFunction = None
+
+
+if AmazonBedrockEmbeddingFunction is not None:
+
+    class CachedAmazonBedrockEmbeddingFunction(AmazonBedrockEmbeddingFunction):
+        #drop-in replacement for AmazonBedrockEmbeddingFunction; keeps its name() and config,
+        #so collections created with the original embedding function still open with this one
+
+        def __call__(self, input):
+            cache = get_cache()
+            texts = list(input)
+            embeddings = cache.get_many(self.model_name, texts)
+
+            missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+            if missing:
+                computed = super().__call__([texts[i] for i in missing])
+                cache.put_many(self.model_name, [texts[i] for i in missing], computed)
+                for i, embedding in zip(missing, computed):
+                    embeddings[i] = embedding
+
+            return [np.asarray(embedding, dtype=np.float32) for embedding in embeddings]
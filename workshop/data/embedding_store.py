@@ -0,0 +1,214 @@
+import json, os, sys, time
+import numpy as np
+
+#Compact on-disk format for precomputed embeddings, replacing *_with_embeddings.json
+#
+#  <name>.npy        - (count, dim) matrix, float32 by default (float16, int8 or binary to save more space;
+#                      binary keeps one sign bit per dimension, packed 8 to a byte)
+#  <name>.meta.json  - ids, documents, metadatas, plus the dtype and int8 scales
+#
+#The matrix is a standard .npy file, so np.load(mmap_mode='r') maps it straight from disk:
+#nothing is parsed or copied until a row is actually read.
+#
+#Stores embedded at a reduced Titan v2 dimension (256 or 512) get a ".d<dimensions>" suffix,
+#e.g. services_with_embeddings.d256, so they can sit next to the full 1024-dimension store.
+
+FORMAT_VERSION = 1
+DTYPES = ('float32', 'float16', 'int8', 'binary')
+DEFAULT_DIMENSIONS = 1024
+
+
+def store_name(name, dimensions=None):
+    #store name for embeddings of the given dimension; the default dimension keeps the plain name
+    if not dimensions or dimensions == DEFAULT_DIMENSIONS:
+        return name
+    return f"{name}.d{dimensions}"
+
+
+def store_paths(name):
+    #accepts 'services_with_embeddings', 'services_with_embeddings.json' or '...npy'
+    base = os.path.splitext(name)[0] if name.endswith(('.json', '.npy')) else name
+    if base.endswith('.meta'):
+        base = base[:-len('.meta')]
+    return base + ".npy", base + ".meta.json"
+
+
+def quantize(matrix, dtype):
+    #returns (stored matrix, per-row scales or None)
+    matrix = np.asarray(matrix, dtype=np.float32)
+
+    if dtype == 'float32':
+        return matrix, None
+    if dtype == 'float16':
+        return matrix.astype(np.float16), None
+    if dtype == 'int8':
+        #symmetric per-row quantization: row ~= int8_row * scale
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.round(matrix / scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+    if dtype == 'binary':
+        #sign bits; the dot product of two sign vectors is dimension - 2 * hamming distance
+        return np.packbits(matrix > 0, axis=1), None
+
+    raise ValueError(f"Unsupported dtype: {dtype} (expected one of {DTYPES})")
+
+
+def save_store(name, ids, documents, metadatas, embeddings, dtype='float32'):
+    matrix_path, meta_path = store_paths(name)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+
+    if embeddings.ndim != 2 or len(embeddings) != len(ids):
+        raise ValueError(f"Expected {len(ids)} embeddings, got shape {embeddings.shape}")
+
+    stored, scales = quantize(embeddings, dtype)
+
+    #write to temp files first so a crash never leaves a half-written store behind
+    np.save(matrix_path + ".tmp.npy", stored)
+    with open(meta_path + ".tmp", 'w') as f:
+        json.dump({
+            'format': FORMAT_VERSION,
+            'dtype': dtype,
+            'count': int(stored.shape[0]),
+            'dimension': int(embeddings.shape[1]),
+            'scales': scales.tolist() if scales is not None else None,
+            'ids': [str(i) for i in ids],
+            'documents': list(documents),
+            'metadatas': list(metadatas),
+        }, f)
+
+    os.replace(matrix_path + ".tmp.npy", matrix_path)
+    os.replace(meta_path + ".tmp", meta_path)
+
+    return matrix_path, meta_path
+
+
+class EmbeddingStore:
+    #read-only view of a saved store; .embeddings is a memory-mapped array (no copy)
+
+    def __init__(self, name):
+        matrix_path, meta_path = store_paths(name)
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+        if meta.get('format') != FORMAT_VERSION:
+            raise ValueError(f"{meta_path}: unsupported format {meta.get('format')}")
+
+        self.dtype = meta['dtype']
+        self.dimension = meta['dimension']
+        self.ids = meta['ids']
+        self.documents = meta['documents']
+        self.metadatas = meta['metadatas']
+        self.embeddings = np.load(matrix_path, mmap_mode='r')
+        self.scales = np.asarray(meta['scales'], dtype=np.float32) if meta['scales'] is not None else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def vectors(self, start=0, stop=None):
+        #float32 rows [start:stop]; float32 stores return a memory-mapped slice, others are decoded
+        rows = self.embeddings[start:stop]
+        if self.dtype == 'float32':
+            return rows
+        if self.dtype == 'int8':
+            return rows.astype(np.float32) * self.scales[start:stop, None]
+        if self.dtype == 'binary':
+            return np.unpackbits(rows, axis=1, count=self.dimension).astype(np.float32) * 2 - 1
+        return rows.astype(np.float32)
+
+    def items(self):
+        #yields the same dicts as the old *_with_embeddings.json entries
+        for i in range(len(self.ids)):
+            yield {
+                'id': self.ids[i],
+                'document': self.documents[i],
+                'metadata': self.metadatas[i],
+                'embedding': self.vectors(i, i + 1)[0].tolist()
+            }
+
+
+def load_store(name):
+    return EmbeddingStore(name)
+
+
+def save_items(name, items, dtype='float32'):
+    #items: list of {'id', 'document', 'metadata', 'embedding'}
+    return save_store(
+        name,
+        ids=[item['id'] for item in items],
+        documents=[item['document'] for item in items],
+        metadatas=[item['metadata'] for item in items],
+        embeddings=[item['embedding'] for item in items],
+        dtype=dtype
+    )
+
+
+def json_to_store(json_file, name=None, dtype='float32'):
+    with open(json_file) as f:
+        items = json.load(f)
+
+    return save_items(name or json_file, items, dtype=dtype)
+
+
+def store_to_json(name, json_file=None):
+    matrix_path, _ = store_paths(name)
+    json_file = json_file or os.path.splitext(matrix_path)[0] + ".json"
+
+    with open(json_file, 'w') as f:
+        json.dump(list(load_store(name).items()), f)
+
+    return json_file
+
+
+def open_store(name, dtype='float32'):
+    #loads the binary store, converting the legacy JSON file once if only that exists
+    matrix_path, meta_path = store_paths(name)
+
+    if not (os.path.exists(matrix_path) and os.path.exists(meta_path)):
+        json_file = os.path.splitext(matrix_path)[0] + ".json"
+        print(f"Converting {json_file} to {matrix_path} ({dtype})")
+        json_to_store(json_file, dtype=dtype)
+
+    return load_store(name)
+
+
+def compare_with_json(json_file):
+    #prints load time for the JSON file vs. the binary store
+    start = time.perf_counter()
+    with open(json_file) as f:
+        items = json.load(f)
+    json_seconds = time.perf_counter() - start
+
+    print(f"{json_file}: {os.path.getsize(json_file) / 1e6:.2f} MB, json.load {json_seconds * 1000:.1f} ms, {len(items)} items")
+
+    for dtype in DTYPES:
+        name = f"{os.path.splitext(json_file)[0]}.{dtype}"
+        matrix_path, meta_path = save_items(name, items, dtype=dtype)
+
+        start = time.perf_counter()
+        store = load_store(name)
+        load_seconds = time.perf_counter() - start
+
+        size = os.path.getsize(matrix_path) + os.path.getsize(meta_path)
+        error = np.abs(store.vectors() - np.asarray([item['embedding'] for item in items], dtype=np.float32)).max()
+        print(f"  {dtype:8} {size / 1e6:.2f} MB, load {load_seconds * 1000:.1f} ms, max abs error {error:.5f}")
+
+        os.remove(matrix_path)
+        os.remove(meta_path)
+
+
+if __name__ == "__main__":
+    #python embedding_store.py to-store services_with_embeddings.json [float32|float16|int8|binary]
+    #python embedding_store.py to-json services_with_embeddings
+    #python embedding_store.py compare services_with_embeddings.json
+    command, target = sys.argv[1], sys.argv[2]
+
+    if command == 'to-store':
+        print(json_to_store(target, dtype=sys.argv[3] if len(sys.argv) > 3 else 'float32'))
+    elif command == 'to-json':
+        print(store_to_json(target))
+    elif command == 'compare':
+        compare_with_json(target)
+    else:
+        print(f"Unknown command: {command}")
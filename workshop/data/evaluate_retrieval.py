@@ -0,0 +1,208 @@
+import argparse, json, math, os, time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import registry
+
+#Offline retrieval evaluation and latency benchmark
+#
+#Replays the labelled queries in eval_queries.json ({"collection", "query", "relevant": [ids]}) against a
+#retriever and reports quality and speed:
+#
+#  - recall@k: share of the relevant ids found in the top k
+#  - MRR: 1 / rank of the first relevant id (0 when none is found)
+#  - nDCG@k: rank-discounted gain of the relevant ids, 1.0 when they fill the top ranks
+#  - latency p50/p95/p99 per query and QPS at the chosen concurrency
+#
+#retrievers:
+#  - chroma / flat / ivf / hybrid: the collection returned by registry.get_collection (see test_queries.py)
+#  - kb-stub: the Knowledge Base retrieve API shape, answered by LocalKnowledgeBase over an in-process index
+#  - kb: the real Knowledge Base retrieve API (--knowledge-base-id); ids come from each result's
+#        metadata 'id' or the file name of its S3 source
+#
+#python evaluate_retrieval.py --retriever flat --k 4 --concurrency 8 --output results.json
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+RETRIEVERS = ('chroma', 'flat', 'ivf', 'hybrid', 'kb-stub', 'kb')
+
+
+def recall_at_k(retrieved, relevant, k):
+    return len(set(retrieved[:k]) & set(relevant)) / len(relevant) if relevant else 0.0
+
+
+def reciprocal_rank(retrieved, relevant):
+    for rank, item in enumerate(retrieved, start=1):
+        if item in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg_at_k(retrieved, relevant, k):
+    dcg = sum(1.0 / math.log2(rank + 1) for rank, item in enumerate(retrieved[:k], start=1) if item in relevant)
+    ideal = sum(1.0 / math.log2(rank + 1) for rank in range(1, min(len(relevant), k) + 1))
+    return dcg / ideal if ideal else 0.0
+
+
+def percentiles(values_ms):
+    values = np.asarray(values_ms)
+    return {
+        'p50': round(float(np.percentile(values, 50)), 3),
+        'p95': round(float(np.percentile(values, 95)), 3),
+        'p99': round(float(np.percentile(values, 99)), 3),
+        'mean': round(float(values.mean()), 3),
+    }
+
+
+class LocalKnowledgeBase:
+    #stand-in for the bedrock-agent-runtime client: retrieve() takes and returns the same shapes
+
+    def __init__(self, index_mode='flat'):
+        self.index_mode = index_mode
+
+    def retrieve(self, knowledgeBaseId, retrievalQuery, retrievalConfiguration=None):
+        k = (retrievalConfiguration or {}).get('vectorSearchConfiguration', {}).get('numberOfResults', 5)
+        collection = registry.get_collection(DATA_DIR, knowledgeBaseId, vector_index=self.index_mode)
+        results = collection.query(query_texts=[retrievalQuery['text']], n_results=k)
+
+        return {
+            'retrievalResults': [
+                {
+                    'content': {'text': document},
+                    'location': {'type': 'S3', 's3Location': {'uri': f"s3://local-knowledge-base/{knowledgeBaseId}/{result_id}.txt"}},
+                    'metadata': dict(metadata, id=result_id),
+                    'score': 1.0 - distance,
+                }
+                for result_id, document, metadata, distance in zip(
+                    results['ids'][0], results['documents'][0], results['metadatas'][0], results['distances'][0])
+            ]
+        }
+
+
+def result_id(result):
+    if 'id' in result.get('metadata', {}):
+        return str(result['metadata']['id'])
+    uri = result['location']['s3Location']['uri']
+    return os.path.splitext(os.path.basename(uri))[0]
+
+
+def make_retriever(kind, collection_name, path, knowledge_base_id=None):
+    #returns retrieve(query, k) -> list of ids, best first
+    if kind in ('kb', 'kb-stub'):
+        client = LocalKnowledgeBase() if kind == 'kb-stub' else registry.get_bedrock_client('bedrock-agent-runtime')
+        kb_id = collection_name if kind == 'kb-stub' else knowledge_base_id
+
+        def retrieve(query, k):
+            response = client.retrieve(
+                knowledgeBaseId=kb_id,
+                retrievalQuery={'text': query},
+                retrievalConfiguration={'vectorSearchConfiguration': {'numberOfResults': k}}
+            )
+            return [result_id(r) for r in response['retrievalResults']]
+
+        return retrieve
+
+    collection = registry.get_collection(path, collection_name, vector_index=kind)
+
+    def retrieve(query, k):
+        return collection.query(query_texts=[query], n_results=k)['ids'][0]
+
+    return retrieve
+
+
+def evaluate(queries, retrievers, k=4, concurrency=1, repeat=1):
+    #retrievers: {collection name: retrieve(query, k)}
+    for name, retrieve in retrievers.items():
+        #warm-up: opens the collection and the embedding client outside of the timed run
+        retrieve(next(q['query'] for q in queries if q['collection'] == name), k)
+
+    jobs = [q for _ in range(repeat) for q in queries]
+
+    def run(query):
+        start = time.perf_counter()
+        retrieved = retrievers[query['collection']](query['query'], k)
+        return query, retrieved, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(run, jobs))
+    wall_seconds = time.perf_counter() - start
+
+    per_query = []
+    for query, retrieved, latency_ms in outcomes[:len(queries)]:
+        relevant = set(query['relevant'])
+        per_query.append({
+            'collection': query['collection'],
+            'query': query['query'],
+            'retrieved': retrieved,
+            'relevant': query['relevant'],
+            f'recall@{k}': round(recall_at_k(retrieved, relevant, k), 4),
+            'reciprocal_rank': round(reciprocal_rank(retrieved, relevant), 4),
+            f'ndcg@{k}': round(ndcg_at_k(retrieved, relevant, k), 4),
+        })
+
+    def summary(rows, latencies):
+        return {
+            'queries': len(rows),
+            f'recall@{k}': round(float(np.mean([r[f'recall@{k}'] for r in rows])), 4),
+            'mrr': round(float(np.mean([r['reciprocal_rank'] for r in rows])), 4),
+            f'ndcg@{k}': round(float(np.mean([r[f'ndcg@{k}'] for r in rows])), 4),
+            'latency_ms': percentiles(latencies),
+        }
+
+    latencies = [latency for _, _, latency in outcomes]
+    report = {
+        'overall': dict(summary(per_query, latencies), qps=round(len(jobs) / wall_seconds, 2)),
+        'collections': {
+            name: summary(
+                [r for r in per_query if r['collection'] == name],
+                [latency for q, _, latency in outcomes if q['collection'] == name]
+            )
+            for name in retrievers
+        },
+        'per_query': per_query,
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay labelled queries against a retriever")
+    parser.add_argument('--retriever', choices=RETRIEVERS, default='chroma')
+    parser.add_argument('--queries', default=os.path.join(DATA_DIR, 'eval_queries.json'))
+    parser.add_argument('--collection', action='append', help="only evaluate these collections")
+    parser.add_argument('--path', default=os.path.join(DATA_DIR, 'chroma'), help="Chroma persistent path")
+    parser.add_argument('--knowledge-base-id', help="for --retriever kb")
+    parser.add_argument('--k', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=1, help="replay the query set N times for latency/QPS")
+    parser.add_argument('--output', help="write the full JSON report here")
+    args = parser.parse_args()
+
+    with open(args.queries) as f:
+        queries = json.load(f)
+    if args.collection:
+        queries = [q for q in queries if q['collection'] in args.collection]
+
+    retrievers = {
+        name: make_retriever(args.retriever, name, args.path, args.knowledge_base_id)
+        for name in dict.fromkeys(q['collection'] for q in queries)
+    }
+
+    report = evaluate(queries, retrievers, k=args.k, concurrency=args.concurrency, repeat=args.repeat)
+    report['config'] = {key: value for key, value in vars(args).items()}
+
+    overall = report['overall']
+    print(f"{args.retriever}: {overall['queries']} queries, recall@{args.k} {overall[f'recall@{args.k}']:.3f}, "
+          f"MRR {overall['mrr']:.3f}, nDCG@{args.k} {overall[f'ndcg@{args.k}']:.3f}")
+    latency = overall['latency_ms']
+    print(f"  latency p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms, p99 {latency['p99']:.2f} ms, "
+          f"{overall['qps']} QPS at concurrency {args.concurrency}")
+    for name, stats in report['collections'].items():
+        print(f"  {name}: recall@{args.k} {stats[f'recall@{args.k}']:.3f}, MRR {stats['mrr']:.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
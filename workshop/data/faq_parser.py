@@ -0,0 +1,172 @@
+import argparse, hashlib, json, os, re
+
+#Structure-aware FAQ parser: one record per question and answer
+#
+#Fixed-size chunking cuts sampledata/amazon-bedrock-faq.txt at token boundaries, so an answer can start
+#in one chunk and end in the next, and retrieval needs extra chunks to recover it. This parser reads
+#FAQ-style text (Q<n>: / A<n>: blocks separated by --- lines) and the bedrock_faqs.json list written by
+#bedrock_faqs.py, and emits one complete question + answer per record.
+#
+#  - ids are "faq-" + a hash of the normalised question, so they survive renumbering and reordering,
+#    and the same question from both sources becomes one record
+#  - text files are parsed line by line, so large FAQ dumps stream through in constant memory
+#
+#outputs (bulk-load formats):
+#  - --kb-dir: one <id>.txt per record plus an <id>.txt.metadata.json sidecar with filterable
+#    metadataAttributes; upload it to the document bucket (aws s3 cp <dir> s3://<BUCKET_NAME>/faq/ --recursive).
+#    Most answers fit in one 512-token chunk; with chunkingStrategy NONE every file is exactly one chunk.
+#  - --output: prefetch_embeddings items as JSON lines ({'id', 'document', 'metadata', 'input'})
+#  - --embed: embeds the records into an embedding store for vector_index / registry
+#
+#python faq_parser.py ../../sampledata/amazon-bedrock-faq.txt bedrock_faqs.json --kb-dir faq_kb --output faq_items.jsonl
+
+DEFAULT_SOURCES = (
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'sampledata', 'amazon-bedrock-faq.txt'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bedrock_faqs.json'),
+)
+TOPIC = 'bedrock'
+
+QUESTION_LINE = re.compile(r"^Q(\d*)\s*:\s*(.*)$")
+ANSWER_LINE = re.compile(r"^A(\d*)\s*:\s*(.*)$")
+SEPARATOR_LINE = re.compile(r"^-{3,}\s*$")
+
+
+def faq_id(question):
+    normalized = " ".join(question.lower().split())
+    return "faq-" + hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+def parse_faq_lines(lines):
+    #yields {'number', 'question', 'answer'}; text before the first question (title, intro) is skipped
+    number = None
+    field = None
+    question, answer = [], []
+
+    def pair():
+        if question and answer:
+            return {'number': number, 'question': "\n".join(question).strip(), 'answer': "\n".join(answer).strip()}
+
+    for line in lines:
+        line = line.rstrip("\n")
+        q = QUESTION_LINE.match(line)
+        a = ANSWER_LINE.match(line) if field == 'question' else None
+
+        if q or SEPARATOR_LINE.match(line):
+            record = pair()
+            if record:
+                yield record
+            number, field, question, answer = None, None, [], []
+            if q:
+                number = int(q.group(1)) if q.group(1) else None
+                field = 'question'
+                question.append(q.group(2))
+        elif a:
+            field = 'answer'
+            answer.append(a.group(2))
+        elif field == 'question':
+            question.append(line)
+        elif field == 'answer':
+            answer.append(line)
+
+    record = pair()
+    if record:
+        yield record
+
+
+def parse_faq_file(path):
+    with open(path, encoding='utf-8') as f:
+        yield from parse_faq_lines(f)
+
+
+def parse_faq_json(path):
+    #bedrock_faqs.json: [{"question", "answer"}, ...] in FAQ order
+    with open(path) as f:
+        for number, item in enumerate(json.load(f), start=1):
+            yield {'number': number, 'question': item['question'].strip(), 'answer': item['answer'].strip()}
+
+
+def faq_records(paths, topic=TOPIC):
+    #yields {'id', 'question', 'answer', 'metadata'} from every source; repeated questions are skipped
+    seen = set()
+    for path in paths:
+        if path.endswith('.json'):
+            pairs = parse_faq_json(path)
+        else:
+            pairs = parse_faq_file(path)
+
+        source = os.path.basename(path)
+        for pair in pairs:
+            record_id = faq_id(pair['question'])
+            if record_id in seen:
+                continue
+            seen.add(record_id)
+            metadata = {'source': source, 'topic': topic, 'faq_id': record_id}
+            if pair['number'] is not None:
+                metadata['faq_number'] = pair['number']
+            yield {'id': record_id, 'question': pair['question'], 'answer': pair['answer'], 'metadata': metadata}
+
+
+def faq_document(record):
+    #same "question\nanswer" layout serialize_faqs_embeddings uses for bedrock_faqs_collection
+    return record['question'] + "\n" + record['answer']
+
+
+def faq_items(records):
+    for record in records:
+        document = faq_document(record)
+        yield {'id': record['id'], 'document': document, 'metadata': record['metadata'], 'input': document}
+
+
+def write_kb_documents(records, directory):
+    #one text file + metadata sidecar per record; files of records that no longer exist are removed
+    os.makedirs(directory, exist_ok=True)
+    written = set()
+    for record in records:
+        name = record['id'] + ".txt"
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            f.write(f"Q: {record['question']}\n\nA: {record['answer']}\n")
+        with open(os.path.join(directory, name + ".metadata.json"), 'w', encoding='utf-8') as f:
+            json.dump({'metadataAttributes': record['metadata']}, f, ensure_ascii=False)
+        written.update((name, name + ".metadata.json"))
+
+    for name in os.listdir(directory):
+        if name.startswith("faq-") and name not in written:
+            os.remove(os.path.join(directory, name))
+
+    return len(written) // 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse FAQ text into one record per question and answer")
+    parser.add_argument('paths', nargs='*', default=list(DEFAULT_SOURCES), help="FAQ .txt files or bedrock_faqs.json")
+    parser.add_argument('--topic', default=TOPIC)
+    parser.add_argument('--kb-dir', help="write <id>.txt + <id>.txt.metadata.json files for the Knowledge Base bucket here")
+    parser.add_argument('--output', help="write prefetch_embeddings items as JSON lines here")
+    parser.add_argument('--embed', metavar='STORE', help="embed the records into this embedding store (see prefetch_embeddings.py)")
+    args = parser.parse_args()
+
+    records = list(faq_records(args.paths, topic=args.topic))
+    answers = [len(record['answer']) for record in records]
+    print(f"{len(records)} FAQ records from {len(args.paths)} sources, "
+          f"answers {min(answers, default=0)}-{max(answers, default=0)} characters")
+
+    if args.kb_dir:
+        count = write_kb_documents(records, args.kb_dir)
+        print(f"Wrote {count} documents with metadata to {args.kb_dir}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for item in faq_items(records):
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        print(f"Wrote {args.output}")
+
+    if args.embed:
+        from embedding_store import store_name
+        from prefetch_embeddings import EMBEDDING_DIMENSIONS, prefetch_embeddings
+        output_name = store_name(args.embed, EMBEDDING_DIMENSIONS)
+        prefetch_embeddings(list(faq_items(records)), output_name)
+        print(f"Saved {output_name}.npy and {output_name}.meta.json to disk!")
+
+
+if __name__ == "__main__":
+    main()
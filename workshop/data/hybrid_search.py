@@ -0,0 +1,132 @@
+import math, re
+from collections import Counter, defaultdict
+import numpy as np
+from similarity import normalize_rows
+from vector_index import matches_where, open_index
+
+#Hybrid retrieval: BM25 keyword ranking fused with vector ranking
+#
+#Embeddings are good at paraphrases but weak at exact terms: a question about "PrivateLink" or
+#"InvokeModel" can rank a generic paragraph above the one that names the term. BM25 scores exact
+#term matches (rarer terms count more, long documents are normalised). The two rankings are combined
+#with reciprocal rank fusion (RRF):
+#
+#    score(doc) = sum over rankings of weight / (RRF_K + rank)
+#
+#RRF only uses ranks, so cosine similarities and BM25 scores never need to be put on the same scale.
+#HybridIndex.query has the same arguments and result layout as a Chroma collection, including
+#where={...} metadata filters (e.g. {'topic': 'bedrock'} or {'name': 'Amazon Athena'}).
+
+TOKEN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+CANDIDATES_PER_RANKING = 20 #how deep each ranking goes before fusing
+
+
+def tokenize(text):
+    #keeps model/API ids such as "titan-embed-text-v2" together, and also indexes their parts
+    tokens = []
+    for token in TOKEN.findall(text.lower()):
+        tokens.append(token)
+        parts = re.split(r"[-_.]", token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+
+    def __init__(self, documents, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list) #term -> [(document index, term frequency)]
+        self.lengths = np.zeros(len(documents), dtype=np.float32)
+
+        for i, document in enumerate(documents):
+            counts = Counter(tokenize(document))
+            self.lengths[i] = sum(counts.values())
+            for term, frequency in counts.items():
+                self.postings[term].append((i, frequency))
+
+        self.average_length = float(self.lengths.mean()) if len(documents) else 0.0
+        self.idf = {
+            term: math.log(1 + (len(documents) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def scores(self, query):
+        #BM25 score for every document; only documents that share a term with the query are touched
+        scores = np.zeros(len(self.lengths), dtype=np.float32)
+        for term in set(tokenize(query)):
+            for i, frequency in self.postings.get(term, ()):
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.average_length)
+                scores[i] += self.idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+        return scores
+
+    def search(self, query, k, candidates=None):
+        scores = self.scores(query)
+        pool = candidates if candidates is not None else np.arange(len(scores))
+        pool = pool[scores[pool] > 0]
+        order = np.argsort(-scores[pool], kind='stable')[:k]
+        return pool[order], scores[pool[order]]
+
+
+def reciprocal_rank_fusion(rankings, weights=None, k=RRF_K):
+    #rankings: lists of document indexes, best first; returns [(index, fused score)], best first
+    weights = weights or [1.0] * len(rankings)
+    fused = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        for rank, index in enumerate(ranking, start=1):
+            fused[int(index)] += weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridIndex:
+
+    def __init__(self, vector_index, vector_weight=1.0, keyword_weight=1.0):
+        self.vector_index = vector_index
+        self.name = vector_index.name
+        self.ids = vector_index.ids
+        self.documents = vector_index.documents
+        self.metadatas = vector_index.metadatas
+        self.bm25 = BM25Index(self.documents)
+        self.weights = [vector_weight, keyword_weight]
+
+    def count(self):
+        return len(self.ids)
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=10, where=None, include=None):
+        if query_texts is None:
+            raise ValueError("hybrid search needs query_texts for the keyword ranking")
+        if query_embeddings is None:
+            query_embeddings = self.vector_index.embedding_function(query_texts)
+
+        candidates = None
+        if where:
+            candidates = np.array([i for i, m in enumerate(self.metadatas) if matches_where(m, where)], dtype=np.int64)
+
+        depth = max(CANDIDATES_PER_RANKING, n_results)
+        results = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+
+        for text, vector in zip(query_texts, normalize_rows(query_embeddings)):
+            if candidates is not None and len(candidates) == 0:
+                fused = []
+            else:
+                vector_ranking = self.vector_index.search(vector[None, :], depth, candidates)[0][0]
+                keyword_ranking, _ = self.bm25.search(text, depth, candidates)
+                fused = reciprocal_rank_fusion([vector_ranking, keyword_ranking], self.weights)[:n_results]
+
+            results['ids'].append([self.ids[i] for i, _ in fused])
+            results['documents'].append([self.documents[i] for i, _ in fused])
+            results['metadatas'].append([self.metadatas[i] for i, _ in fused])
+            #fused scores are not distances; 1 - score keeps "smaller is closer" for callers that sort
+            results['distances'].append([1.0 - score for _, score in fused])
+
+        return results
+
+
+def open_hybrid_index(collection_name, embedding_function=None, mode='flat', dimensions=None, quantization=None, **kwargs):
+    vector_index = open_index(collection_name, mode=mode, embedding_function=embedding_function,
+                              dimensions=dimensions, quantization=quantization)
+    return HybridIndex(vector_index, **kwargs)
@@ -1,5 +1,7 @@
 import boto3, json
 import chromadb
+from collection_loader import DEFAULT_BATCH_SIZE, load_collection
+from embedding_store import open_store
 
 #startup script to populate vector db
 
@@ -10,25 +12,15 @@ def get_multimodal_embeddings_collection(collection_name):
     return index
 
 
-def initialize_collection(collection_name, source_json_file):
+def initialize_collection(collection_name, store_name, batch_size=DEFAULT_BATCH_SIZE, mode='incremental'):
     
     collection = get_multimodal_embeddings_collection(collection_name)
     
-    if collection.count() == 0:
-        
-        row_count = 0
-        
-        with open(source_json_file) as json_file:
-            source_json = json.load(json_file)
-            
-            for item in source_json:
-                row_count = row_count + 1
-                collection.add(
-                    ids=[str(item['id'])],
-                    documents=[item['document']],
-                    metadatas=[item['metadata']],
-                    embeddings=[item['embedding']]
-                )
+    #memory-mapped binary store; converted once from the legacy *_with_embeddings.json if needed
+    store = open_store(store_name)
+    
+    #batched writes; incremental mode only writes rows that are new or changed since the last run
+    load_collection(collection, store, batch_size=batch_size, mode=mode)
     
     print(f"Initialized collection {collection_name}")
     
@@ -36,6 +28,6 @@ def initialize_collection(collection_name, source_json_file):
 
 
 
-initialize_collection('images_collection', 'images_with_embeddings.json')
+initialize_collection('images_collection', 'images_with_embeddings')
 
 
@@ -1,88 +1,219 @@
-import boto3, json
+import boto3, json, os, random, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from dedup import deduplicate_items, print_report
+from embedding_cache import cached, get_cache
+from embedding_store import save_items, store_name, store_paths
 
 #Load directory/csv/json-process and store metadata, docs, ids, and embeddings
 
+MODEL_ID = "amazon.titan-embed-text-v2:0"
+#Titan v2 output size: 1024 (default), 512 or 256. Smaller vectors are cheaper to store and search;
+#reduced stores are written as <name>.d<dimensions> (see embedding_store.py and quantization_report.py)
+EMBEDDING_DIMENSIONS = int(os.environ.get("EMBEDDING_DIMENSIONS", "1024"))
+MAX_WORKERS = 8 #concurrent Titan requests; lower this if you see many throttles
+MAX_ATTEMPTS = 8 #attempts per item before giving up
+BASE_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 20.0
+PROGRESS_EVERY = 25 #print a progress line every N items
+#DEDUP_THRESHOLD=0.8 collapses near-duplicate inputs before embedding (see dedup.py); 0 keeps every item
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", "0"))
+
+RETRYABLE_ERRORS = {'ThrottlingException', 'ServiceUnavailableException', 'ModelNotReadyException', 'InternalServerException'}
+
+#one client shared by every worker thread; boto3 clients are thread-safe and keep a connection pool.
+#botocore retries are turned off because run_with_backoff below retries with a shared cooldown instead.
+bedrock = boto3.Session().client(
+    service_name='bedrock-runtime',
+    config=Config(max_pool_connections=MAX_WORKERS, retries={'mode': 'standard', 'max_attempts': 1})
+)
+
+#when any worker is throttled, every worker waits until this time before sending the next request
+throttle_lock = threading.Lock()
+throttle_until = 0.0
+
 
 def get_text_embedding(text):
-    session = boto3.Session()
-    bedrock = session.client(service_name='bedrock-runtime') #creates a Bedrock client
-    
     response = bedrock.invoke_model(
-        body=json.dumps({ "inputText": text }), 
-        modelId="amazon.titan-embed-text-v2:0", 
+        body=json.dumps({ "inputText": text, "dimensions": EMBEDDING_DIMENSIONS, "normalize": True }),
+        modelId=MODEL_ID,
         accept="application/json",
         contentType="application/json"
     )
-    
+
     response_body = json.loads(response['body'].read())
     return response_body['embedding']
-    
+
+
+#texts that were embedded before (by any script) are served from the shared embedding cache
+get_cached_text_embedding = cached(MODEL_ID, get_text_embedding, dimensions=EMBEDDING_DIMENSIONS, normalize=True)
+
+
+def wait_for_cooldown():
+    delay = throttle_until - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def run_with_backoff(fn, *args):
+    #exponential backoff with full jitter; a throttle also pauses the other workers
+    global throttle_until
+
+    for attempt in range(MAX_ATTEMPTS):
+        wait_for_cooldown()
+        try:
+            return fn(*args), attempt
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code not in RETRYABLE_ERRORS or attempt == MAX_ATTEMPTS - 1:
+                raise
+            delay = random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt))
+            with throttle_lock:
+                throttle_until = max(throttle_until, time.monotonic() + delay)
+
+
+def load_checkpoint(checkpoint_file):
+    #checkpoint is JSON lines of {"id": ..., "embedding": [...]}, one per finished item
+    #returns (done, good_bytes); good_bytes is where the last complete line ends
+    done = {}
+    good_bytes = 0
+
+    if os.path.exists(checkpoint_file):
+        with open(checkpoint_file, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break #last line was cut off by a crash; everything before it is good
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    break
+                done[record['id']] = record['embedding']
+                good_bytes += len(line)
+
+    return done, good_bytes
+
+
+def open_checkpoint(checkpoint_file, good_bytes):
+    #drop a partial last line before appending, otherwise the next record is glued onto it
+    checkpoint = open(checkpoint_file, 'a')
+    checkpoint.truncate(good_bytes)
+    return checkpoint
+
+
+def prefetch_embeddings(items, output_name, embed_fn=get_cached_text_embedding, max_workers=MAX_WORKERS, dtype='float32',
+                        dedup_threshold=DEDUP_THRESHOLD):
+    #items: list of {'id', 'document', 'metadata', 'input'}; 'input' is what gets embedded
+    #output_name is an embedding store name (see embedding_store.py)
+    if dedup_threshold:
+        items, report = deduplicate_items(items, dedup_threshold, EMBEDDING_DIMENSIONS)
+        print_report(report)
+
+    checkpoint_file = os.path.splitext(store_paths(output_name)[0])[0] + ".checkpoint.jsonl"
+    embeddings, good_bytes = load_checkpoint(checkpoint_file)
+
+    pending = [item for item in items if item['id'] not in embeddings]
+    if embeddings:
+        print(f"Resuming from {checkpoint_file}: {len(embeddings)} done, {len(pending)} to go")
+
+    write_lock = threading.Lock()
+    completed = 0
+    retries = 0
+    failed = []
+    start_time = time.perf_counter()
+
+    with open_checkpoint(checkpoint_file, good_bytes) as checkpoint, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_with_backoff, embed_fn, item['input']): item for item in pending}
+
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                embedding, attempts = future.result()
+            except Exception as e:
+                failed.append(item['id'])
+                print(f"Failed item {item['id']}: {e}")
+                continue
+
+            embeddings[item['id']] = embedding
+            retries += attempts
+            completed += 1
+            with write_lock:
+                checkpoint.write(json.dumps({'id': item['id'], 'embedding': embedding}) + "\n")
+                checkpoint.flush()
+
+            if completed % PROGRESS_EVERY == 0:
+                elapsed = time.perf_counter() - start_time
+                print(f"Processed {completed}/{len(pending)} items ({completed / elapsed:.1f} items/sec, {retries} retries)")
+
+    elapsed = time.perf_counter() - start_time
+    rate = completed / elapsed if elapsed > 0 else 0.0
+    print(f"Embedded {completed} items in {elapsed:.1f}s ({rate:.1f} items/sec, {retries} retries, {len(failed)} failed)")
+    get_cache().print_stats()
+
+    if failed:
+        #keep the checkpoint so the next run only retries the failed items
+        raise RuntimeError(f"{len(failed)} items failed; run again to resume from {checkpoint_file}")
+
+    processed_items = [
+        {
+            'id': item['id'],
+            'document': item['document'],
+            'metadata': item['metadata'],
+            'embedding': embeddings[item['id']]
+        }
+        for item in items
+    ]
+
+    save_items(output_name, processed_items, dtype=dtype)
+
+    os.remove(checkpoint_file)
+
+    return processed_items
+
 
 def serialize_services_embeddings():
-    
-    processed_items = []
-    row_count = 0
-    
-    with open('services.json') as json_file: 
+
+    with open('services.json') as json_file:
         services_json = json.load(json_file)
-        
-        for item in services_json:
-            row_count = row_count + 1
-            print(f"Processing item: {row_count}")
-            item_dict = {
-                'id': str(row_count),
-                'document': item['description'],
-                'metadata': {'name': item['name'], 'url': item['url'] },
-                'embedding': get_text_embedding(item['description'])
-            }
-            
-            processed_items.append(item_dict)
-            
-            #collection.add(
-            #    ids=[str(row_count)],
-            #    documents=[item['description']],
-            #    metadatas=[{'name': item['name'], 'url': item['url'] }])
-    
-    with open('services_with_embeddings.json', 'w') as json_file:
-        json.dump(processed_items, json_file)
-
-
-    print("Saved services_with_embeddings.json to disk!")
+
+    items = [
+        {
+            'id': str(row_count),
+            'document': item['description'],
+            'metadata': {'name': item['name'], 'url': item['url'] },
+            'input': item['description']
+        }
+        for row_count, item in enumerate(services_json, start=1)
+    ]
+
+    output_name = store_name('services_with_embeddings', EMBEDDING_DIMENSIONS)
+    prefetch_embeddings(items, output_name)
+
+    print(f"Saved {output_name}.npy and {output_name}.meta.json to disk!")
 
 
 def serialize_faqs_embeddings():
-    
-    processed_items = []
-    row_count = 0
-    
-    #with open('services.json') as json_file: 
+
     with open('bedrock_faqs.json') as json_file:
-        services_json = json.load(json_file)
-        
-        for item in services_json:
-            row_count = row_count + 1
-            print(f"Processing item: {row_count}")
-            item_dict = {
-                'id': str(row_count),
-                'document': item['question'] + "\n" + item['answer'],
-                'metadata': {'topic': 'bedrock' },
-                'embedding': get_text_embedding(item['question'] + "\n" + item['answer'])
-            }
-            
-            processed_items.append(item_dict)
-            
-            #collection.add(
-            #    ids=[str(row_count)],
-            #    documents=[item['description']],
-            #    metadatas=[{'name': item['name'], 'url': item['url'] }])
-    
-    with open('bedrock_faqs_with_embeddings.json', 'w') as json_file:
-        json.dump(processed_items, json_file)
-    
-    
-    print("Saved bedrock_faqs_with_embeddings.json to disk!")
-
-
-serialize_faqs_embeddings()
-
-serialize_services_embeddings()
+        faqs_json = json.load(json_file)
+
+    items = [
+        {
+            'id': str(row_count),
+            'document': item['question'] + "\n" + item['answer'],
+            'metadata': {'topic': 'bedrock' },
+            'input': item['question'] + "\n" + item['answer']
+        }
+        for row_count, item in enumerate(faqs_json, start=1)
+    ]
+
+    output_name = store_name('bedrock_faqs_with_embeddings', EMBEDDING_DIMENSIONS)
+    prefetch_embeddings(items, output_name)
+
+    print(f"Saved {output_name}.npy and {output_name}.meta.json to disk!")
+
+
+if __name__ == "__main__":
+    serialize_faqs_embeddings()
+
+    serialize_services_embeddings()
@@ -1,4 +1,6 @@
 import boto3, json, base64, os
+from embedding_cache import get_cache, multimodal_content
+from embedding_store import save_items
 
 
 #calls Amazon Bedrock to get a vector from either an image, text, or both
@@ -37,7 +39,12 @@ def get_vector_from_file(file_path):
     with open(file_path, "rb") as image_file:
         input_image_base64 = base64.b64encode(image_file.read()).decode('utf8')
     
-    vector = get_multimodal_vector(input_image_base64 = input_image_base64)
+    #the same image file is only sent to Bedrock once; later runs read the vector from the embedding cache
+    vector = get_cache().get_or_compute(
+        "amazon.titan-embed-image-v1",
+        multimodal_content(input_image_base64 = input_image_base64),
+        lambda _: get_multimodal_vector(input_image_base64 = input_image_base64)
+    )
     
     return vector
 
@@ -66,11 +73,12 @@ def serialize_image_embeddings():
         processed_items.append(item_dict)
     
     
-    with open('images_with_embeddings.json', 'w') as json_file:
-        json.dump(processed_items, json_file)
+    save_items('images_with_embeddings', processed_items)
+    
+    get_cache().print_stats()
     
     
-    print("Saved images_with_embeddings.json to disk!")
+    print("Saved images_with_embeddings.npy and images_with_embeddings.meta.json to disk!")
 
 
 
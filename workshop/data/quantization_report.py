@@ -0,0 +1,119 @@
+import argparse, json, os, time
+import numpy as np
+from embedding_store import DEFAULT_DIMENSIONS, open_store, store_name
+from similarity import normalize_rows, top_k_similar
+from vector_index import COLLECTION_STORES, DATA_DIR, RESCORE_FACTOR, VectorIndex
+
+#Memory, search latency and recall for reduced dimensions and quantized vectors
+#
+#Every setting is compared with exact float32 search over the full 1024-dimension store:
+#
+#  - dimensions 1024 / 512 / 256: uses the <store>.d<dimensions> stores written by
+#    EMBEDDING_DIMENSIONS=256 python prefetch_embeddings.py when they exist. Otherwise the 1024-dimension
+#    vectors are truncated and re-normalised, which only approximates what Titan v2 returns at that size
+#    (marked "truncated" in the report).
+#  - quantization float32 / int8 / binary, the last two with and without full-precision rescoring
+#
+#Queries are perturbed copies of corpus rows (the same rows at every dimension), so no Bedrock calls
+#are needed. recall@k is the share of the exact 1024-dimension float32 top k that a setting returns.
+#memory is what the first pass holds in RAM; rescoring reads k * rescore_factor full-precision rows.
+#
+#python quantization_report.py --store services_with_embeddings --k 4 --repeat-corpus 20 --output report.json
+
+DIMENSIONS = (1024, 512, 256)
+
+
+def load_space(base_name, dimensions, full):
+    #(vectors, source) for one dimension
+    name = store_name(base_name, dimensions)
+    matrix_path = os.path.join(DATA_DIR, name + ".npy")
+    if dimensions == DEFAULT_DIMENSIONS:
+        return full, 'store'
+    if os.path.exists(matrix_path):
+        return normalize_rows(open_store(os.path.join(DATA_DIR, name)).vectors()), 'store'
+    return normalize_rows(full[:, :dimensions]), 'truncated'
+
+
+def settings(rescore_factor):
+    #(quantization, rescore factor) pairs; float32 is exact at its dimension so it is never rescored
+    return [(None, 0), ('int8', 0), ('int8', rescore_factor), ('binary', 0), ('binary', rescore_factor)]
+
+
+def run_report(base_name, k=4, queries=200, repeat_corpus=1, noise=0.05, rescore_factor=RESCORE_FACTOR, dimensions=DIMENSIONS):
+    rng = np.random.default_rng(0)
+    full = normalize_rows(open_store(os.path.join(DATA_DIR, base_name)).vectors())
+
+    rows = rng.integers(0, len(full) * repeat_corpus, queries)
+    copy_noise = [rng.normal(0, noise, full.shape).astype(np.float32) for _ in range(repeat_corpus - 1)]
+    query_noise = rng.normal(0, noise, (queries, full.shape[1])).astype(np.float32)
+
+    def corpus_for(vectors):
+        #repeat_corpus > 1 tiles the corpus with noisy copies, the same copies at every dimension
+        if repeat_corpus == 1:
+            return vectors
+        d = vectors.shape[1]
+        return normalize_rows(np.vstack([vectors] + [vectors + extra[:, :d] for extra in copy_noise]))
+
+    def queries_for(corpus):
+        d = corpus.shape[1]
+        return normalize_rows(corpus[rows] + query_noise[:, :d])
+
+    full_corpus = corpus_for(full)
+    exact, _ = top_k_similar(queries_for(full_corpus), full_corpus, k=k, normalized=True)
+    ids = [str(i) for i in range(len(full_corpus))]
+
+    print(f"{base_name}: {len(full_corpus)} vectors, k={k}, {queries} queries, recall against 1024-d float32 exact search")
+    print(f"  {'dims':>5} {'source':10} {'vectors':8} {'rescore':>7} {'memory MB':>10} {'ms/query':>9} {'recall@' + str(k):>9}")
+
+    results = []
+    for d in dimensions:
+        vectors, source = load_space(base_name, d, full)
+        corpus = corpus_for(vectors)
+        query_vectors = queries_for(corpus)
+
+        for quantization, factor in settings(rescore_factor):
+            index = VectorIndex(corpus, ids, [''] * len(ids), [{}] * len(ids), quantization=quantization, rescore_factor=factor)
+
+            index.search(query_vectors[:1], k) #warm-up
+            start = time.perf_counter()
+            found = [index.search(q[None, :], k)[0][0] for q in query_vectors]
+            ms_per_query = (time.perf_counter() - start) / queries * 1000
+
+            recall = float(np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, exact)]))
+            result = {
+                'dimensions': d,
+                'source': source,
+                'quantization': quantization or 'float32',
+                'rescore_factor': factor,
+                'memory_bytes': int(index.memory_bytes()),
+                'ms_per_query': round(ms_per_query, 4),
+                f'recall@{k}': round(recall, 4),
+            }
+            results.append(result)
+            print(f"  {d:>5} {source:10} {result['quantization']:8} {factor or '-':>7} "
+                  f"{result['memory_bytes'] / 1e6:>10.3f} {ms_per_query:>9.3f} {recall:>9.3f}")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding dimensions and quantization")
+    parser.add_argument('--store', default='services_with_embeddings', help="embedding store or Chroma collection name")
+    parser.add_argument('--k', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--repeat-corpus', type=int, default=1, help="tile the corpus with noisy copies to test larger sizes")
+    parser.add_argument('--rescore-factor', type=int, default=RESCORE_FACTOR)
+    parser.add_argument('--output', help="write the results as JSON here")
+    args = parser.parse_args()
+
+    results = run_report(COLLECTION_STORES.get(args.store, args.store), k=args.k, queries=args.queries,
+                         repeat_corpus=args.repeat_corpus, rescore_factor=args.rescore_factor)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import os, threading
+import boto3
+
+#Process-wide registry of Bedrock clients, embedding functions and collections
+#
+#Streamlit re-runs the whole app script on every interaction, and the workshop libraries used to build a
+#new boto3.Session, embedding function and chromadb.PersistentClient on every call. The registry creates
+#each of them once per process and hands out the same object afterwards:
+#
+#  - bedrock clients: keyed by service name (boto3 clients are thread-safe)
+#  - embedding functions: keyed by model id
+#  - Chroma clients: keyed by absolute path; collections by (absolute path, collection name, index mode)
+#
+#invalidate() drops cached collections, e.g. after populate_collection.py reloaded the data.
+#
+#get_collection picks the index from VECTOR_INDEX unless vector_index is passed, so every workshop lib follows
+#the same switch: chroma (default), flat/ivf for the in-process index (vector_index.py) or hybrid (hybrid_search.py)
+#
+#The in-process indexes (flat/ivf/hybrid) also follow two environment variables:
+#  - EMBEDDING_DIMENSIONS: 256/512 opens the <store>.d<dimensions> stores written by prefetch_embeddings.py
+#    and embeds queries at the same size (Chroma collections always use 1024)
+#  - VECTOR_QUANTIZATION: int8 or binary keeps only compressed vectors in memory for the first pass
+#    and rescores the best candidates with the full-precision vectors (see vector_index.py)
+
+VECTOR_INDEX = os.environ.get("VECTOR_INDEX", "chroma")
+EMBEDDING_DIMENSIONS = int(os.environ.get("EMBEDDING_DIMENSIONS", "1024"))
+VECTOR_QUANTIZATION = os.environ.get("VECTOR_QUANTIZATION") or None
+
+_lock = threading.RLock()
+_entries = {}
+
+
+def get_or_create(key, factory):
+    #factory() runs at most once per key, even when several threads ask at the same time
+    entry = _entries.get(key)
+    if entry is not None:
+        return entry
+
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            entry = factory()
+            _entries[key] = entry
+        return entry
+
+
+def invalidate(path=None, collection_name=None):
+    #no arguments: drop everything; otherwise only the collections (and Chroma client) that match
+    with _lock:
+        if path is None and collection_name is None:
+            _entries.clear()
+            return
+
+        path = os.path.abspath(path) if path is not None else None
+        for key in list(_entries):
+            if key[0] == 'collection':
+                if (path is None or key[1] == path) and (collection_name is None or key[2] == collection_name):
+                    del _entries[key]
+            elif key[0] == 'chroma' and path is not None and collection_name is None and key[1] == path:
+                del _entries[key]
+
+
+def get_bedrock_client(service_name='bedrock-runtime'):
+    return get_or_create(('client', service_name), lambda: boto3.Session().client(service_name=service_name))
+
+
+def get_embedding_function(model_name="amazon.titan-embed-text-v2:0", dimensions=None):
+    #dimensions=None (or 1024) is the Chroma-compatible embedding function; 256/512 ask Titan v2 for smaller vectors
+    def create():
+        if dimensions and dimensions != 1024:
+            from embedding_cache import TitanTextEmbeddingFunction
+            return TitanTextEmbeddingFunction(get_bedrock_client('bedrock-runtime'), model_name, dimensions)
+
+        from embedding_cache import CachedAmazonBedrockEmbeddingFunction
+        return CachedAmazonBedrockEmbeddingFunction(session=boto3.Session(), model_name=model_name)
+
+    return get_or_create(('embedding_function', model_name, dimensions), create)
+
+
+def get_chroma_client(path):
+    def create():
+        import chromadb
+        return chromadb.PersistentClient(path=path)
+
+    path = os.path.abspath(path)
+    return get_or_create(('chroma', path), create)
+
+
+def get_collection(path, collection_name, model_name="amazon.titan-embed-text-v2:0", vector_index=None,
+                   dimensions=EMBEDDING_DIMENSIONS, quantization=VECTOR_QUANTIZATION):
+    #model_name=None opens the collection without an embedding function (queries pass query_embeddings)
+    #vector_index is 'chroma', 'flat'/'ivf' for the in-process index (vector_index.py),
+    #or 'hybrid' for BM25 + vector search (hybrid_search.py); None uses VECTOR_INDEX
+    #dimensions and quantization only apply to the in-process indexes
+    vector_index = vector_index or VECTOR_INDEX
+    if vector_index == "chroma" or not model_name:
+        dimensions = None #Chroma collections and the image store are always full size
+    if vector_index == "chroma":
+        quantization = None
+
+    def create():
+        embedding_function = get_embedding_function(model_name, dimensions) if model_name else None
+
+        if vector_index == "hybrid":
+            from hybrid_search import open_hybrid_index
+            return open_hybrid_index(collection_name, embedding_function=embedding_function,
+                                     dimensions=dimensions, quantization=quantization)
+
+        if vector_index != "chroma":
+            from vector_index import open_index
+            return open_index(collection_name, mode=vector_index, embedding_function=embedding_function,
+                              dimensions=dimensions, quantization=quantization)
+
+        client = get_chroma_client(path)
+        if embedding_function is None:
+            return client.get_collection(collection_name)
+        return client.get_collection(collection_name, embedding_function=embedding_function)
+
+    key = ('collection', os.path.abspath(path), collection_name, vector_index, model_name, dimensions, quantization)
+    return get_or_create(key, create)
@@ -0,0 +1,136 @@
+import sys, time
+import numpy as np
+
+#Matrix-based cosine similarity for embeddings
+#
+#Cosine similarity is a dot product of unit vectors, so we normalise every vector once and then
+#score a whole block of queries against the corpus with a single matrix multiplication.
+#argpartition picks the top k per row in O(n) and only those k are sorted.
+#
+#Both the queries and the corpus are processed in chunks, so the score matrix held in memory is at most
+#query_chunk x corpus_chunk, and the corpus can be a memory-mapped array (embedding_store.py)
+#that is larger than RAM.
+
+DEFAULT_QUERY_CHUNK = 1024
+DEFAULT_CORPUS_CHUNK = 65536
+
+
+def normalize_rows(matrix):
+    #float32 unit vectors; zero vectors stay zero instead of turning into NaN
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_rows(scores, k):
+    #(indices, scores) of the k highest scores in each row, highest first
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        indices = np.argpartition(scores, -k, axis=1)[:, -k:]
+    else:
+        indices = np.broadcast_to(np.arange(scores.shape[1]), scores.shape).copy()
+    top_scores = np.take_along_axis(scores, indices, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    return np.take_along_axis(indices, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def top_k_similar(queries, corpus, k=10, query_chunk=DEFAULT_QUERY_CHUNK, corpus_chunk=DEFAULT_CORPUS_CHUNK,
+                  normalized=False, exclude_self=False):
+    #returns (indices, scores), each of shape (len(queries), k), best match first
+    #normalized=True skips normalisation when both inputs are already unit vectors
+    #exclude_self=True is for all-pairs use (queries is corpus): row i never matches itself
+    queries = np.asarray(queries, dtype=np.float32) if normalized else normalize_rows(queries)
+    k = max(0, min(k, len(corpus) - (1 if exclude_self else 0)))
+
+    all_indices = np.empty((len(queries), k), dtype=np.int64)
+    all_scores = np.empty((len(queries), k), dtype=np.float32)
+    if k == 0:
+        return all_indices, all_scores #empty corpus: no matches rather than None
+
+    for q_start in range(0, len(queries), query_chunk):
+        query_block = queries[q_start:q_start + query_chunk]
+        best_indices = best_scores = None
+
+        for c_start in range(0, len(corpus), corpus_chunk):
+            corpus_block = corpus[c_start:c_start + corpus_chunk]
+            corpus_block = np.asarray(corpus_block, dtype=np.float32) if normalized else normalize_rows(corpus_block)
+
+            scores = query_block @ corpus_block.T
+
+            if exclude_self:
+                rows = np.arange(len(query_block))
+                columns = rows + q_start - c_start
+                inside = (columns >= 0) & (columns < len(corpus_block))
+                scores[rows[inside], columns[inside]] = -np.inf
+
+            indices, block_scores = top_k_rows(scores, k)
+            indices = indices + c_start
+
+            if best_indices is None:
+                best_indices, best_scores = indices, block_scores
+            else:
+                #merge this corpus chunk's top k with the running top k
+                merged_indices, merged_scores = top_k_rows(np.hstack([best_scores, block_scores]), k)
+                candidates = np.hstack([best_indices, indices])
+                best_indices = np.take_along_axis(candidates, merged_indices, axis=1)
+                best_scores = merged_scores
+
+        all_indices[q_start:q_start + len(query_block)] = best_indices
+        all_scores[q_start:q_start + len(query_block)] = best_scores
+
+    return all_indices, all_scores
+
+
+def all_pairs_top_k(embeddings, k=10, exclude_self=False, **kwargs):
+    #the k closest items for every item in the list
+    normalized = normalize_rows(embeddings)
+    return top_k_similar(normalized, normalized, k=k, normalized=True, exclude_self=exclude_self, **kwargs)
+
+
+def loop_all_pairs(embeddings):
+    #the original per-pair loop, kept as the benchmark baseline
+    from numpy import dot
+    from numpy.linalg import norm
+
+    results = []
+    for e1 in embeddings:
+        comparisons = [(j, dot(e1, e2) / (norm(e1) * norm(e2))) for j, e2 in enumerate(embeddings)]
+        comparisons.sort(key=lambda x: x[1], reverse=True)
+        results.append(comparisons)
+    return results
+
+
+LOOP_BENCHMARK_MAX = 500 #the per-pair loop takes minutes beyond this size
+
+
+def benchmark(sizes=(100, 250, 5000), dimensions=1024, k=10):
+    rng = np.random.default_rng(0)
+
+    for n in sizes:
+        embeddings = rng.standard_normal((n, dimensions)).astype(np.float32)
+
+        start = time.perf_counter()
+        indices, scores = all_pairs_top_k(embeddings, k=k)
+        matrix_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, chunked_scores = all_pairs_top_k(embeddings, k=k, query_chunk=256, corpus_chunk=1024)
+        chunked_seconds = time.perf_counter() - start
+        assert np.allclose(chunked_scores, scores, atol=1e-5) #block sizes change float rounding, not the ranking
+
+        line = f"n={n:5}: matrix {matrix_seconds * 1000:7.1f} ms, chunked {chunked_seconds * 1000:7.1f} ms"
+
+        if n <= LOOP_BENCHMARK_MAX:
+            start = time.perf_counter()
+            baseline = loop_all_pairs(embeddings.tolist())
+            loop_seconds = time.perf_counter() - start
+            agree = all([j for j, _ in baseline[i][:k]] == indices[i].tolist() for i in range(n))
+            line += f", loop {loop_seconds * 1000:9.1f} ms ({loop_seconds / matrix_seconds:.0f}x faster, same top {k}: {agree})"
+
+        print(line)
+
+
+if __name__ == "__main__":
+    #python similarity.py [n ...]
+    benchmark(sizes=[int(n) for n in sys.argv[1:]] or (100, 250, 5000))
@@ -0,0 +1,10 @@
+#shared setup for the workshop data script tests (from the repo root: python3 -m pytest workshop/data/tests)
+#the scripts import each other by module name because they are run from workshop/data
+import os, sys
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if DATA_DIR not in sys.path:
+    sys.path.insert(0, DATA_DIR)
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
@@ -0,0 +1,31 @@
+from io import StringIO
+from chunker import MAX_PIECE_CHARS, MODES, chunk_stream, estimate_tokens, fixed_chunks, read_pieces, text_pieces
+
+
+def test_text_without_whitespace_is_cut_into_bounded_pieces():
+    pieces = list(read_pieces(StringIO('漢' * 3000), block_size=100))
+
+    assert max(len(piece) for _, piece in pieces) <= MAX_PIECE_CHARS
+    assert ''.join(piece for _, piece in pieces) == '漢' * 3000
+    assert [offset for offset, _ in pieces] == [i * MAX_PIECE_CHARS for i in range(len(pieces))]
+
+
+def test_cjk_text_respects_max_tokens_in_every_mode():
+    for mode in MODES:
+        chunks = list(chunk_stream(StringIO('漢' * 3000), 'cjk.txt', mode=mode, max_tokens=200))
+        assert len(chunks) > 1
+        assert all(estimate_tokens(chunk['text']) <= 200 for chunk in chunks), mode
+
+
+def test_pieces_larger_than_max_tokens_are_hard_cut():
+    chunks = list(fixed_chunks(text_pieces('a' * 40), max_tokens=2, overlap_tokens=0))
+
+    assert [text for _, text, _ in chunks] == ['a' * 8] * 5
+    assert [offset for offset, _, _ in chunks] == [0, 8, 16, 24, 32]
+
+
+def test_english_words_are_not_split():
+    text = "Amazon Bedrock is a fully managed service. " * 50
+    chunks = list(chunk_stream(StringIO(text), 'en.txt', max_tokens=64))
+
+    assert all(chunk['text'].endswith(('.', 'service', 'managed', 'fully', 'a', 'is', 'Bedrock', 'Amazon')) for chunk in chunks)
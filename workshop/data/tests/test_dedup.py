@@ -0,0 +1,66 @@
+import json
+import numpy as np
+from dedup import Deduplicator, deduplicate, deduplicate_items, new_report, patch_aliases
+
+BASE = "amazon bedrock is a fully managed service that offers a choice of foundation models from leading ai companies"
+
+
+def record(record_id, text):
+    return {'id': record_id, 'document': text, 'metadata': {}}
+
+
+def test_canonical_records_stream_before_input_is_exhausted():
+    consumed = []
+
+    def records():
+        for record_id, text in [('a', BASE), ('b', BASE.upper()), ('c', "something else entirely about vector search")]:
+            consumed.append(record_id)
+            yield record(record_id, text)
+
+    aliases = {}
+    stream = deduplicate(records(), lambda r: r['document'], aliases=aliases)
+
+    assert next(stream)['id'] == 'a'
+    assert consumed == ['a']
+    assert [r['id'] for r in stream] == ['c']
+    assert aliases == {'a': ['b']}
+
+
+def test_near_duplicates_collapse_and_aliases_are_patched_in():
+    items = [
+        {'id': '1', 'document': BASE, 'metadata': {'topic': 'bedrock'}, 'input': BASE},
+        {'id': '2', 'document': BASE + " today", 'metadata': {}, 'input': BASE + " today"},
+    ]
+
+    canonical, report = deduplicate_items(items, threshold=0.7)
+
+    assert [item['id'] for item in canonical] == ['1']
+    assert canonical[0]['metadata'] == {'topic': 'bedrock', 'aliases': '2', 'duplicates': 1}
+    assert report['near_duplicates'] == 1 and report['canonical'] == 1
+
+
+def test_signature_keeps_values_above_32_bits():
+    signature = Deduplicator().signature(BASE)
+    assert signature.dtype == np.uint64
+    assert Deduplicator().signature("...") is None
+
+
+def test_texts_without_words_do_not_collapse_into_each_other():
+    report = new_report()
+    records = [record('a', "..."), record('b', "!!!"), record('c', "  ")]
+
+    canonical = list(deduplicate(records, lambda r: r['document'], report=report))
+
+    assert [r['id'] for r in canonical] == ['a', 'b', 'c']
+    assert report['near_duplicates'] == 0
+
+
+def test_patch_aliases_rewrites_streamed_output(tmp_path):
+    path = tmp_path / "unique.jsonl"
+    path.write_text(json.dumps(record('a', BASE)) + "\n" + json.dumps(record('c', "other")) + "\n")
+
+    patch_aliases(str(path), {'a': ['b', 'd']})
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert lines[0]['metadata'] == {'aliases': 'b,d', 'duplicates': 2}
+    assert lines[1]['metadata'] == {}
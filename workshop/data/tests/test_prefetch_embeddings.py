@@ -0,0 +1,65 @@
+import json
+import embedding_cache
+import prefetch_embeddings
+from embedding_store import load_store
+from prefetch_embeddings import load_checkpoint, open_checkpoint
+
+
+def write_checkpoint(path, records, partial=''):
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        f.write(partial)
+
+
+def test_load_checkpoint_stops_at_partial_line(tmp_path):
+    path = tmp_path / "store.checkpoint.jsonl"
+    write_checkpoint(path, [{'id': '1', 'embedding': [1.0]}, {'id': '2', 'embedding': [2.0]}], partial='{"id": "3", "embed')
+
+    done, good_bytes = load_checkpoint(str(path))
+
+    assert done == {'1': [1.0], '2': [2.0]}
+    assert good_bytes == len(path.read_bytes()) - len('{"id": "3", "embed')
+
+
+def test_load_checkpoint_drops_complete_json_without_newline(tmp_path):
+    path = tmp_path / "store.checkpoint.jsonl"
+    write_checkpoint(path, [{'id': '1', 'embedding': [1.0]}], partial=json.dumps({'id': '2', 'embedding': [2.0]}))
+
+    done, _ = load_checkpoint(str(path))
+
+    assert done == {'1': [1.0]}
+
+
+def test_resume_appends_after_last_good_line(tmp_path):
+    path = tmp_path / "store.checkpoint.jsonl"
+    write_checkpoint(path, [{'id': '1', 'embedding': [1.0]}], partial='{"id": "2", "emb')
+
+    done, good_bytes = load_checkpoint(str(path))
+    with open_checkpoint(str(path), good_bytes) as checkpoint:
+        checkpoint.write(json.dumps({'id': '2', 'embedding': [2.0]}) + "\n")
+
+    done, _ = load_checkpoint(str(path))
+    assert done == {'1': [1.0], '2': [2.0]}
+
+
+def test_prefetch_resumes_from_crashed_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, '_default_cache', embedding_cache.EmbeddingCache(path=str(tmp_path / "cache.sqlite3")))
+    output_name = str(tmp_path / "store")
+    write_checkpoint(tmp_path / "store.checkpoint.jsonl", [{'id': '1', 'embedding': [1.0, 0.0]}], partial='{"id": "2", "emb')
+
+    embedded = []
+
+    def fake_embed(text):
+        embedded.append(text)
+        return [0.0, 1.0]
+
+    items = [
+        {'id': str(i), 'document': f"doc {i}", 'metadata': {}, 'input': f"doc {i}"}
+        for i in range(1, 4)
+    ]
+    prefetch_embeddings.prefetch_embeddings(items, output_name, embed_fn=fake_embed, max_workers=2)
+
+    assert sorted(embedded) == ["doc 2", "doc 3"]
+    assert load_store(output_name).ids == ["1", "2", "3"]
+    assert not (tmp_path / "store.checkpoint.jsonl").exists()
@@ -0,0 +1,271 @@
+import os, sys, time
+import numpy as np
+from embedding_store import open_store, quantize, store_name
+from similarity import normalize_rows, top_k_rows, top_k_similar
+
+#In-process vector index over the *_with_embeddings stores, as a lightweight alternative to Chroma
+#
+#The workshop collections hold a few hundred vectors, so opening a chromadb.PersistentClient (SQLite,
+#HNSW segment files, telemetry) costs far more than the search itself. VectorIndex keeps the normalised
+#matrix in memory and answers collection.query(...) with the same result layout as Chroma, so
+#get_vector_search_results(collection, ...) works unchanged with either one.
+#
+#modes:
+#  - flat: exact search, one matrix multiplication against every vector
+#  - ivf: approximate search; vectors are grouped into clusters with k-means (inverted file index),
+#         and a query only scores the vectors in the nprobe clusters whose centroids are closest
+#
+#quantization (flat mode only):
+#  - int8: one byte per dimension plus a scale per row (4x smaller than float32)
+#  - binary: one sign bit per dimension (32x smaller); the first pass ranks by Hamming distance
+#  The compressed codes are scored first, then the best k * rescore_factor candidates are rescored with
+#  the full-precision vectors. Those are only read for the candidates, so when they come from a
+#  memory-mapped float32 store they stay on disk instead of in memory.
+#  numpy has no int8 matrix multiplication, so int8 saves memory here but not search time.
+#
+#distances are cosine distances (1 - cosine similarity); smaller is closer, as with Chroma.
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+#Chroma collection name -> embedding store written by the prefetch scripts
+COLLECTION_STORES = {
+    'bedrock_faqs_collection': 'bedrock_faqs_with_embeddings',
+    'services_collection': 'services_with_embeddings',
+    'images_collection': 'images_with_embeddings',
+}
+
+MODES = ('flat', 'ivf')
+QUANTIZATIONS = (None, 'int8', 'binary')
+KMEANS_ITERATIONS = 20
+RESCORE_FACTOR = 4 #full-precision rescoring of k * RESCORE_FACTOR candidates; 0 keeps the approximate ranking
+CODE_CHUNK = 65536 #rows of int8 codes decoded per matrix multiplication
+
+#set bits per byte, for Hamming distances on packed sign bits (numpy >= 2.0 has a native bitwise_count)
+POPCOUNT_TABLE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+popcount = getattr(np, 'bitwise_count', lambda bytes_: POPCOUNT_TABLE[bytes_])
+
+
+def kmeans(vectors, clusters, iterations=KMEANS_ITERATIONS, seed=0):
+    #spherical k-means on unit vectors: assign by highest dot product, centroids re-normalised
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)]
+
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(clusters):
+            members = vectors[assignments == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = normalize_rows(centroids)
+
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+def matches_where(metadata, where):
+    #equality filters, e.g. {'topic': 'bedrock'} or {'name': {'$in': [...]}}
+    for key, expected in where.items():
+        value = metadata.get(key)
+        if isinstance(expected, dict) and '$in' in expected:
+            if value not in expected['$in']:
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
+class VectorIndex:
+
+    def __init__(self, vectors, ids, documents, metadatas, mode='flat', embedding_function=None,
+                 nlist=None, nprobe=None, name=None, quantization=None, rescore_factor=RESCORE_FACTOR):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode: {mode} (expected one of {MODES})")
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization} (expected one of {QUANTIZATIONS})")
+        if quantization and mode != 'flat':
+            raise ValueError("quantization is only supported with mode='flat'")
+
+        self.name = name
+        self.mode = mode
+        self.embedding_function = embedding_function
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        vectors = np.asarray(vectors, dtype=np.float32) #no copy for a float32 memory-mapped store
+        self.dimension = vectors.shape[1]
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+
+        if quantization:
+            #quantized in chunks, so a memory-mapped store is never copied to memory as float32
+            self.full_vectors = vectors
+            self.vectors = None
+            chunks = [quantize(normalize_rows(vectors[start:start + CODE_CHUNK]), quantization)
+                      for start in range(0, len(vectors), CODE_CHUNK)]
+            self.codes = np.concatenate([codes for codes, _ in chunks])
+            self.scales = np.concatenate([scales for _, scales in chunks]) if quantization == 'int8' else None
+            return
+
+        self.vectors = normalize_rows(vectors)
+
+        if mode == 'ivf':
+            #~sqrt(n) clusters and a quarter of them probed is the usual starting point
+            self.nlist = nlist or max(1, int(np.sqrt(len(self.vectors))))
+            self.nprobe = nprobe or max(1, self.nlist // 4)
+            centroids, assignments = kmeans(self.vectors, self.nlist)
+            #duplicate vectors can leave clusters without members; they are dropped so every probe scores something
+            lists = [np.flatnonzero(assignments == c) for c in range(self.nlist)]
+            kept = [c for c, members in enumerate(lists) if len(members)]
+            self.centroids = centroids[kept]
+            self.lists = [lists[c] for c in kept]
+            self.nlist = len(kept)
+
+    def count(self):
+        return len(self.ids)
+
+    def memory_bytes(self):
+        #bytes held in memory for the first-pass search
+        if self.quantization:
+            return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+        return self.vectors.nbytes
+
+    def code_scores(self, query_vectors):
+        #approximate cosine similarities from the compressed codes, shape (queries, vectors)
+        scores = np.empty((len(query_vectors), len(self.codes)), dtype=np.float32)
+
+        if self.quantization == 'int8':
+            for start in range(0, len(self.codes), CODE_CHUNK):
+                codes = self.codes[start:start + CODE_CHUNK].astype(np.float32)
+                scores[:, start:start + len(codes)] = (query_vectors @ codes.T) * self.scales[start:start + len(codes)]
+            return scores
+
+        #binary: agreeing signs minus disagreeing signs, scaled to [-1, 1]
+        query_bits = np.packbits(np.asarray(query_vectors) > 0, axis=1)
+        for row, bits in enumerate(query_bits):
+            hamming = popcount(self.codes ^ bits).sum(axis=1, dtype=np.int32)
+            scores[row] = (self.dimension - 2.0 * hamming) / self.dimension
+        return scores
+
+    def rescore(self, query_vectors, pools, k):
+        #exact cosine similarities over each query's candidate rows, read from the full-precision vectors
+        all_indices, all_scores = [], []
+        for query, pool in zip(query_vectors, pools):
+            pool = np.sort(pool) #sorted reads are sequential on a memory-mapped store
+            indices, scores = top_k_similar(query[None, :], self.full_vectors[pool], k=k, normalized=False)
+            all_indices.append(pool[indices[0]])
+            all_scores.append(scores[0])
+        return all_indices, all_scores
+
+    def search(self, query_vectors, k, candidates=None):
+        #returns (indices, similarities) for normalised query vectors
+        if self.quantization:
+            if candidates is not None:
+                return self.rescore(query_vectors, [candidates] * len(query_vectors), k)
+            if not self.rescore_factor:
+                return top_k_rows(self.code_scores(query_vectors), k)
+            pools, _ = top_k_rows(self.code_scores(query_vectors), k * self.rescore_factor)
+            return self.rescore(query_vectors, pools, k)
+
+        if candidates is not None:
+            indices, scores = top_k_similar(query_vectors, self.vectors[candidates], k=k, normalized=True)
+            return candidates[indices], scores
+        if self.mode == 'flat':
+            return top_k_similar(query_vectors, self.vectors, k=k, normalized=True)
+
+        #nearest clusters first; past nprobe, keep probing until the pool holds at least k vectors
+        probes, _ = top_k_rows(query_vectors @ self.centroids.T, self.nlist)
+        all_indices, all_scores = [], []
+        for query, probe in zip(query_vectors, probes):
+            lists, size = [], 0
+            for c in probe:
+                if len(lists) >= self.nprobe and size >= k:
+                    break
+                lists.append(self.lists[c])
+                size += len(self.lists[c])
+            pool = np.concatenate(lists)
+            indices, scores = top_k_similar(query[None, :], self.vectors[pool], k=k, normalized=True)
+            all_indices.append(pool[indices[0]])
+            all_scores.append(scores[0])
+        return all_indices, all_scores
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=10, where=None, include=None):
+        #same arguments and result layout as chromadb Collection.query
+        if query_embeddings is None:
+            if self.embedding_function is None:
+                raise ValueError("query_texts needs an embedding_function")
+            query_embeddings = self.embedding_function(query_texts)
+
+        query_vectors = normalize_rows(query_embeddings)
+        if query_vectors.shape[1] != self.dimension:
+            raise ValueError(f"Query embeddings have {query_vectors.shape[1]} dimensions but {self.name} has "
+                             f"{self.dimension}; set EMBEDDING_DIMENSIONS to the size the store was written with")
+
+        candidates = None
+        if where:
+            #metadata filters restrict the search to matching rows (exact search over that subset)
+            candidates = np.array([i for i, m in enumerate(self.metadatas) if matches_where(m, where)], dtype=np.int64)
+            if len(candidates) == 0:
+                empty = [[] for _ in query_vectors]
+                return {'ids': empty, 'documents': empty, 'metadatas': empty, 'distances': empty}
+
+        indices, scores = self.search(query_vectors, n_results, candidates)
+
+        return {
+            'ids': [[self.ids[i] for i in row] for row in indices],
+            'documents': [[self.documents[i] for i in row] for row in indices],
+            'metadatas': [[self.metadatas[i] for i in row] for row in indices],
+            'distances': [[float(1 - s) for s in row] for row in scores],
+        }
+
+
+def open_index(collection_name, mode='flat', embedding_function=None, dimensions=None, **kwargs):
+    #collection_name is a Chroma collection name (see COLLECTION_STORES) or an embedding store name
+    #dimensions=256/512 opens the reduced-dimension store written by prefetch_embeddings.py
+    name = store_name(COLLECTION_STORES.get(collection_name, collection_name), dimensions)
+    store = open_store(os.path.join(DATA_DIR, name))
+    return VectorIndex(store.vectors(), store.ids, store.documents, store.metadatas, mode=mode,
+                       embedding_function=embedding_function, name=collection_name, **kwargs)
+
+
+def benchmark(name, k=4, queries=200, repeat_corpus=1, noise=0.05):
+    #recall@k and latency of ivf (for several nprobe values) against exact flat search
+    #queries are perturbed copies of corpus vectors; repeat_corpus > 1 tiles the corpus with noise
+    #to see how the modes scale past the workshop's few hundred vectors
+    rng = np.random.default_rng(0)
+    store = open_store(os.path.join(DATA_DIR, COLLECTION_STORES.get(name, name)))
+    base = normalize_rows(store.vectors())
+    corpus = np.vstack([base + rng.normal(0, noise, base.shape) for _ in range(repeat_corpus)]) if repeat_corpus > 1 else base
+
+    ids = [str(i) for i in range(len(corpus))]
+    documents = [''] * len(corpus)
+    metadatas = [{}] * len(corpus)
+
+    query_vectors = normalize_rows(corpus[rng.integers(0, len(corpus), queries)] + rng.normal(0, noise, (queries, corpus.shape[1])))
+
+    start = time.perf_counter()
+    flat = VectorIndex(corpus, ids, documents, metadatas, mode='flat')
+    print(f"{len(corpus)} vectors x {corpus.shape[1]} dims, k={k}, {queries} queries")
+    print(f"  flat build {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def timed(index):
+        start = time.perf_counter()
+        results = [index.search(q[None, :], k)[0][0] for q in query_vectors]
+        return results, (time.perf_counter() - start) / queries * 1000
+
+    exact, flat_ms = timed(flat)
+    print(f"  flat            recall@{k} 1.000  {flat_ms:.3f} ms/query")
+
+    start = time.perf_counter()
+    ivf = VectorIndex(corpus, ids, documents, metadatas, mode='ivf')
+    print(f"  ivf build {(time.perf_counter() - start) * 1000:.1f} ms (nlist={ivf.nlist})")
+
+    for nprobe in sorted({1, 2, max(1, ivf.nlist // 8), max(1, ivf.nlist // 4), max(1, ivf.nlist // 2)}):
+        ivf.nprobe = nprobe
+        approximate, ivf_ms = timed(ivf)
+        recall = np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approximate, exact)])
+        print(f"  ivf nprobe={nprobe:<4} recall@{k} {recall:.3f}  {ivf_ms:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    #python vector_index.py services_with_embeddings [repeat_corpus]
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else 'services_with_embeddings',
+              repeat_corpus=int(sys.argv[2]) if len(sys.argv) > 2 else 1)